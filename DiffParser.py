@@ -0,0 +1,219 @@
+import re
+from constants import *
+
+
+def parse_file_path(line: str):
+    """
+    This function extracts the path of the changed file from the '+++ b/<path>' line of a diff.
+    :param line: String. The '+++' line (without the line break).
+    :return: String. The path of the file.
+    """
+
+    path = line[len(GIT_DIFF_NEW_FILE_PREFIX):]
+    # Git quotes paths with special characters, and adds a tab after paths with spaces.
+    path = path.rstrip('\t')
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    return path[len(GIT_DIFF_NEW_FILE_PATH_PREFIX):] if path.startswith(GIT_DIFF_NEW_FILE_PATH_PREFIX) else path
+
+
+def glob_to_regex(glob: str):
+    """
+    This function translates a path glob to a regex, with the semantics of git's 'glob' pathspec magic: '*' and '?' do
+    not match a slash, and '**' matches any number of directories.
+    :param glob: String. The glob.
+    :return: String. The regex, which matches a whole path.
+    """
+
+    regex = ''
+    index = 0
+    while index < len(glob):
+        if glob.startswith('**/', index):
+            regex += '(?:.*/)?'
+            index += 3
+        elif glob.startswith('**', index):
+            regex += '.*'
+            index += 2
+        elif glob[index] == '*':
+            regex += '[^/]*'
+            index += 1
+        elif glob[index] == '?':
+            regex += '[^/]'
+            index += 1
+        else:
+            regex += re.escape(glob[index])
+            index += 1
+    return regex + '$'
+
+
+class DiffFilters:
+    def __init__(self, include_paths: list[str] = (), exclude_paths: list[str] = (), max_diff_size: int = 0):
+        """
+        Initialization method for the 'DiffFilters' class.
+        The filters decide which diffs are scanned. They are passed to git as pathspecs and options wherever possible,
+        so git does not even produce the diffs that are filtered out.
+        :param include_paths: List<String>. If not empty, only the files that match one of these globs are scanned.
+        A glob without a slash matches files in any directory (e.g. '*.min.js').
+        :param exclude_paths: List<String>. The files that match one of these globs (ignoring case) are not scanned.
+        :param max_diff_size: Integer. Files and diffs above this size in bytes are not scanned (0 for no limit).
+        """
+
+        self.include_paths: list[str] = [self.normalize_glob(glob) for glob in include_paths if glob]
+        # Binary files can not be scanned anyway, so git does not need to read them to find out that they are binary.
+        self.exclude_paths: list[str] = [self.normalize_glob(glob) for glob in exclude_paths if glob] + \
+            ['**/*.{0}'.format(extension) for extension in BINARY_FILE_EXTENSIONS]
+        self.max_diff_size: int = max_diff_size
+
+        self.include_regex: re.Pattern = re.compile('|'.join(glob_to_regex(glob) for glob in self.include_paths)) \
+            if self.include_paths else None
+        self.exclude_regex: re.Pattern = re.compile('|'.join(glob_to_regex(glob) for glob in self.exclude_paths),
+                                                    re.IGNORECASE)
+
+    @staticmethod
+    def normalize_glob(glob: str):
+        glob = glob.strip()
+        return glob if '/' in glob else '**/' + glob
+
+    def allows_path(self, file_path: str):
+        """
+        This function checks a path against the path filters, for diffs that do not come from git (e.g. from the api).
+        :param file_path: String. The path of the file.
+        :return: Boolean. True if the file should be scanned.
+        """
+
+        if self.include_regex and not self.include_regex.match(file_path):
+            return False
+        return not self.exclude_regex.match(file_path)
+
+    def allows_size(self, size: int):
+        return not self.max_diff_size or size <= self.max_diff_size
+
+    def git_command(self, command: str):
+        """
+        This function adds the filters to a git command that outputs diffs (e.g. 'git log -p').
+        :param command: String. The git command.
+        :return: List<String>. The arguments of the filtered command.
+        """
+
+        args = command.split(' ')
+        # Git treats files above the big file threshold as binary, so it does not diff them at all.
+        if self.max_diff_size:
+            args[1:1] = [GIT_CONFIG_OPTION, GIT_BIG_FILE_THRESHOLD_CONFIG.format(self.max_diff_size)]
+        args.append(GIT_PATHSPEC_SEPARATOR)
+        args += [GIT_PATHSPEC_INCLUDE_FORMAT.format(glob) for glob in self.include_paths]
+        args += [GIT_PATHSPEC_EXCLUDE_FORMAT.format(glob) for glob in self.exclude_paths]
+        # Older versions of git need a positive pathspec next to the excluding ones.
+        if not self.include_paths:
+            args.append(GIT_PATHSPEC_ALL)
+        return args
+
+
+def iter_added_lines(stream, skipped_blobs: list = None):
+    """
+    This function parses the output of a 'git log -p' command while it is being read, and yields every line that was
+    added in every hunk of every diff in it.
+    Only the current line is held in memory, so the memory usage does not depend on the size of the history.
+    :param stream: Iterable<Bytes>. The lines of the output of the git command (e.g. the stdout of the git process).
+    Already decoded lines (strings) are accepted too.
+    :param skipped_blobs: List. If specified, the hashes of the blobs of the binary diffs (which have no added lines)
+    are appended to it. Git prints the full hashes only with the '--full-index' option.
+    :return: Generator<Tuple>. A (commit hash, file path, line number, added line) tuple for every added line.
+    """
+
+    commit_hash = None
+    file_path = NULLED_FILE_PATH
+    blob_hash = None
+
+    # The number of lines that are left in the current hunk, as declared in its '@@' header. Counting them is the only
+    # reliable way to tell apart an added line that starts with '++' from the header of the next diff.
+    remaining_old_lines = 0
+    remaining_new_lines = 0
+    line_no = 0
+
+    for raw_line in stream:
+        line = raw_line.decode(UTF_8_ENCODING, errors='replace') if type(raw_line) == bytes else raw_line
+        line = line.rstrip('\n')
+
+        if remaining_old_lines > 0 or remaining_new_lines > 0:
+            if line.startswith('+'):
+                yield commit_hash, file_path, line_no, line[1:]
+                remaining_new_lines -= 1
+                line_no += 1
+                continue
+            if line.startswith('-'):
+                remaining_old_lines -= 1
+                continue
+            if line.startswith(' '):
+                remaining_old_lines -= 1
+                remaining_new_lines -= 1
+                line_no += 1
+                continue
+            if not line.startswith('\\'):
+                # The hunk is shorter than declared. Treat the current line as a header line.
+                remaining_old_lines = remaining_new_lines = 0
+
+        if line.startswith(GIT_LOG_COMMIT_PREFIX):
+            commit_hash = line.split(' ')[1]
+            file_path = NULLED_FILE_PATH
+        elif line.startswith(GIT_DIFF_HEADER_PREFIX):
+            file_path = NULLED_FILE_PATH
+            blob_hash = None
+        elif line.startswith(GIT_DIFF_INDEX_PREFIX):
+            blob_hash = line.split(' ')[1].split('..')[-1]
+        elif line.startswith(GIT_DIFF_BINARY_PREFIX):
+            if skipped_blobs is not None and blob_hash:
+                skipped_blobs.append(blob_hash)
+        elif line.startswith(GIT_DIFF_NEW_FILE_PREFIX):
+            file_path = parse_file_path(line)
+        elif line.startswith('@@'):
+            hunk_header = re.match(RE_HUNK_HEADER, line)
+            if hunk_header:
+                old_count, new_start, new_count = hunk_header.groups()
+                remaining_old_lines = int(old_count) if old_count is not None else 1
+                remaining_new_lines = int(new_count) if new_count is not None else 1
+                line_no = int(new_start)
+
+
+def iter_added_content(stream, skipped_blobs: list = None):
+    """
+    This function groups the added lines of a 'git log -p' output by diff, so each diff's added content can be scanned
+    as a whole. Only one diff is held in memory at a time.
+    :param stream: Iterable<Bytes>. The lines of the output of the git command.
+    :param skipped_blobs: List. If specified, the hashes of the blobs of the binary diffs are appended to it.
+    :return: Generator<Tuple>. A (commit hash, file path, added content) tuple for every diff with added content.
+    """
+
+    current_key = None
+    added_lines = []
+    for commit_hash, file_path, line_no, added_line in iter_added_lines(stream, skipped_blobs):
+        if (commit_hash, file_path) != current_key:
+            if added_lines:
+                yield current_key[0], current_key[1], '\n'.join(added_lines)
+            current_key = (commit_hash, file_path)
+            added_lines = []
+        added_lines.append(added_line)
+
+    if added_lines:
+        yield current_key[0], current_key[1], '\n'.join(added_lines)
+
+
+def iter_api_diff_lines(commit_hash: str, diffs: list[dict], filters: DiffFilters = None):
+    """
+    This function converts the diffs of a commit, as returned by the gitlab api, into the lines of a 'git log -p'
+    output, so they can be parsed by 'iter_added_lines'.
+    Like the 'git log' command of the tool, only added and modified files are kept.
+    :param commit_hash: String. The hash of the commit.
+    :param diffs: List<Dictionary>. The diffs of the commit.
+    :param filters: DiffFilters. If specified, only the files that pass its path filters are kept.
+    :return: Generator<String>. The lines.
+    """
+
+    yield GIT_LOG_COMMIT_PREFIX + commit_hash
+    for diff in diffs:
+        if diff.get(API_DIFF_DELETED_FILE) or diff.get(API_DIFF_RENAMED_FILE):
+            continue
+        if filters and not filters.allows_path(diff[API_DIFF_NEW_PATH]):
+            continue
+        yield GIT_DIFF_HEADER_PREFIX
+        yield GIT_DIFF_NEW_FILE_PREFIX + GIT_DIFF_NEW_FILE_PATH_PREFIX + diff[API_DIFF_NEW_PATH]
+        yield from diff[API_DIFF_CONTENT].split('\n')
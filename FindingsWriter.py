@@ -0,0 +1,277 @@
+import os
+import csv
+import json
+import time
+import queue
+import sqlite3
+import threading
+from ScanState import RunJournal
+from constants import *
+
+
+def split_location(location: str):
+    """
+    This function splits the location of a code secret into its parts.
+    :param location: String. The location, in the 'CODE_SECRET_LOCATION_FORMAT' format.
+    :return: Tuple. The url of the project, the hash of the commit and the path of the file.
+    """
+
+    project_url, tree_path = location.split(CODE_SECRET_LOCATION_FORMAT.format('', ''), 1)
+    commit_hash, file_path = tree_path.split('/', 1)
+    return project_url, commit_hash, file_path
+
+
+def open_findings_file(path: str, offsets: dict, kind: str, **kwargs):
+    """
+    This function opens an output file of findings for writing.
+    :param path: String. The path of the file.
+    :param offsets: Dictionary. If specified, the run is resumed: the file is kept up to the offset of its kind (the
+    size it had when the findings were last flushed), and the findings are appended to it.
+    :param kind: String. The kind of the findings in the file.
+    :return: File. The open file.
+    """
+
+    if offsets is None:
+        return open(path, MODE_WRITE, encoding=UTF_8_ENCODING, **kwargs)
+    file = open(path, MODE_APPEND, encoding=UTF_8_ENCODING, **kwargs)
+    file.truncate(offsets.get(kind, 0))
+    file.seek(0, os.SEEK_END)
+    return file
+
+
+class FileSink:
+    def __init__(self, output_path: str, file_names: dict, offsets: dict = None, **kwargs):
+        """
+        Initialization method for the 'FileSink' class.
+        The base of the sinks that write every kind of findings to its own file.
+        :param output_path: String. The output directory of the run.
+        :param file_names: Dictionary. The names of the files, by the kinds of findings that will be written to them.
+        :param offsets: Dictionary. If specified, the run is resumed, and the files are kept up to these offsets.
+        :param kwargs: The other arguments of 'open' (e.g. 'newline').
+        """
+
+        self.files: dict = {kind: open_findings_file(os.path.join(output_path, file_name), offsets, kind, **kwargs)
+                            for kind, file_name in file_names.items()}
+
+    def flush(self):
+        for file in self.files.values():
+            file.flush()
+
+    def offsets(self):
+        """
+        This function returns how much of every kind of findings was written so far. It is called right after a flush.
+        :return: Dictionary. The sizes of the files, by the kinds of their findings.
+        """
+
+        return {kind: os.fstat(file.fileno()).st_size for kind, file in self.files.items()}
+
+    def close(self):
+        for file in self.files.values():
+            file.flush()
+            os.fsync(file.fileno())
+            file.close()
+
+
+class CsvSink(FileSink):
+    def __init__(self, output_path: str, kinds: list[str], offsets: dict = None):
+        """
+        Initialization method for the 'CsvSink' class.
+        The sink writes every kind of findings to its own csv file, with a header row.
+        :param output_path: String. The output directory of the run.
+        :param kinds: List<String>. The kinds of findings that will be written ('code' and/or 'cicd').
+        :param offsets: Dictionary. If specified, the run is resumed, and the files are kept up to these offsets.
+        """
+
+        super().__init__(output_path, {kind: FINDINGS_FILE_NAMES[kind] for kind in kinds}, offsets, newline='')
+        self.writers: dict = {}
+        for kind, file in self.files.items():
+            self.writers[kind] = csv.writer(file)
+            if not file.tell():
+                self.writers[kind].writerow(FINDINGS_COLUMNS_HEADERS[kind])
+
+    def write(self, kind: str, rows: list[list]):
+        self.writers[kind].writerows(rows)
+
+
+class JsonlSink(FileSink):
+    def __init__(self, output_path: str, kinds: list[str], offsets: dict = None):
+        """
+        Initialization method for the 'JsonlSink' class.
+        The sink writes every kind of findings to its own file, as a json object (keyed by the column headers) per line.
+        :param output_path: String. The output directory of the run.
+        :param kinds: List<String>. The kinds of findings that will be written ('code' and/or 'cicd').
+        :param offsets: Dictionary. If specified, the run is resumed, and the files are kept up to these offsets.
+        """
+
+        super().__init__(output_path, {kind: os.path.splitext(FINDINGS_FILE_NAMES[kind])[0] + JSONL_FILE_EXTENSION
+                                       for kind in kinds}, offsets)
+
+    def write(self, kind: str, rows: list[list]):
+        headers = FINDINGS_COLUMNS_HEADERS[kind]
+        self.files[kind].writelines(json.dumps(dict(zip(headers, row))) + '\n' for row in rows)
+
+
+class SqliteSink:
+    def __init__(self, output_path: str, kinds: list[str], offsets: dict = None):
+        """
+        Initialization method for the 'SqliteSink' class.
+        The sink writes all the findings to a single sqlite database, with indexes that make it easy to query the
+        findings of a project, a category or a commit.
+        :param output_path: String. The output directory of the run.
+        :param kinds: List<String>. The kinds of findings that will be written. All the tables are always created.
+        :param offsets: Dictionary. If specified, the run is resumed, and the tables are kept up to these row ids.
+        """
+
+        self.connection: sqlite3.Connection = sqlite3.connect(os.path.join(output_path, FINDINGS_DB_FILE_NAME_DEFAULT),
+                                                              check_same_thread=False)
+        self.connection.execute(SQL_ENABLE_WAL)
+        self.connection.execute(SQL_SYNCHRONOUS_NORMAL)
+        for statement in SQL_CREATE_FINDINGS_TABLES:
+            self.connection.execute(statement)
+        if offsets is not None:
+            for kind, table_name in FINDINGS_TABLE_NAMES.items():
+                self.connection.execute(SQL_DELETE_FINDINGS_AFTER_FORMAT.format(table_name), (offsets.get(kind, 0),))
+        self.connection.commit()
+
+    def write(self, kind: str, rows: list[list]):
+        if kind == FINDINGS_KIND_CODE:
+            self.connection.executemany(SQL_INSERT_CODE_SECRET, [
+                (*split_location(location), category, sub_category, location, times_found)
+                for category, sub_category, location, times_found in rows])
+        else:
+            self.connection.executemany(SQL_INSERT_CICD_VARIABLE, rows)
+
+    def flush(self):
+        self.connection.commit()
+
+    def offsets(self):
+        return {kind: self.connection.execute(SQL_SELECT_MAX_ROWID_FORMAT.format(table_name)).fetchone()[0] or 0
+                for kind, table_name in FINDINGS_TABLE_NAMES.items()}
+
+    def close(self):
+        self.connection.commit()
+        # Move the write-ahead log into the database file, and sync it to the disk.
+        self.connection.execute(SQL_CHECKPOINT_WAL)
+        self.connection.close()
+
+
+FINDINGS_SINKS = {
+    FINDINGS_SINK_CSV: CsvSink,
+    FINDINGS_SINK_JSONL: JsonlSink,
+    FINDINGS_SINK_SQLITE: SqliteSink,
+}
+
+
+class FindingsWriter:
+    def __init__(self, output_path: str, sink_names: list[str], kinds: list[str], journal: RunJournal = None,
+                 offsets: dict = None):
+        """
+        Initialization method for the 'FindingsWriter' class.
+        The writer writes the findings to the output sinks in a background thread, so the stages of the tool never wait
+        for the disk. The findings are flushed in groups: once 'MAX_SECRETS_BEFORE_SAVING_DEFAULT' of them are pending,
+        or 'FINDINGS_FLUSH_SECONDS_DEFAULT' seconds after the last flush.
+        :param output_path: String. The output directory of the run.
+        :param sink_names: List<String>. The names of the sinks to write to (e.g. 'csv', 'jsonl', 'sqlite').
+        :param kinds: List<String>. The kinds of findings that will be written ('code' and/or 'cicd').
+        :param journal: RunJournal. If specified, the records of the progress of the run are written to it after every
+        flush, together with the offsets of the sinks.
+        :param offsets: Dictionary. If specified, the run is resumed: the offsets of every sink (by its name) that were
+        last written to the journal. The findings that were written after them are dropped.
+        """
+
+        self.sinks: dict = {sink_name: FINDINGS_SINKS[sink_name](
+            output_path, kinds, None if offsets is None else offsets.get(sink_name, {})) for sink_name in sink_names}
+        self.journal: RunJournal = journal
+        self.offsets: dict = offsets or {}
+        self.queue: queue.Queue = queue.Queue()
+        self.thread: threading.Thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put(self, kind: str, rows: list[list], record: tuple = None):
+        """
+        This function hands findings over to the writer. It never blocks.
+        :param kind: String. The kind of the findings ('code' or 'cicd').
+        :param rows: List<List>. The findings, as rows of the columns of their kind.
+        :param record: Tuple. An optional (kind, value) record for the journal, that is written only once the findings
+        are flushed (e.g. that the project of the findings is done).
+        :return: None
+        """
+
+        if record is not None and self.journal is None:
+            record = None
+        if rows or record is not None:
+            self.queue.put((kind, rows, record))
+
+    def put_record(self, record: tuple):
+        self.put(None, [], record)
+
+    def flush_sinks(self, records: list[tuple]):
+        """
+        This function flushes the sinks, and then writes the pending records to the journal, with the offsets that the
+        sinks were flushed up to.
+        :param records: List<Tuple>. The pending records of the journal.
+        :return: None
+        """
+
+        for sink in self.sinks.values():
+            sink.flush()
+        if self.journal is None:
+            return
+        try:
+            for sink_name, sink in self.sinks.items():
+                self.offsets[sink_name] = {**self.offsets.get(sink_name, {}), **sink.offsets()}
+            self.journal.write(records, self.offsets)
+        except (OSError, sqlite3.Error) as e:
+            print(FINDINGS_WRITE_ERROR.format(type(self.journal).__name__, e))
+
+    def run(self):
+        """
+        This function is the loop of the background thread. It runs until 'close' is called.
+        :return: None
+        """
+
+        pending_rows = 0
+        pending_records = []
+        last_flush_time = time.monotonic()
+        while True:
+            pending = pending_rows + len(pending_records)
+            timeout = last_flush_time + FINDINGS_FLUSH_SECONDS_DEFAULT - time.monotonic() if pending else None
+            try:
+                item = self.queue.get(timeout=max(0.0, timeout) if timeout is not None else None)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+
+            if item:
+                kind, rows, record = item
+                for sink in self.sinks.values() if rows else ():
+                    try:
+                        sink.write(kind, rows)
+                    except (OSError, sqlite3.Error) as e:
+                        print(FINDINGS_WRITE_ERROR.format(type(sink).__name__, e))
+                pending_rows += len(rows)
+                if record is not None:
+                    pending_records.append(record)
+
+            pending = pending_rows + len(pending_records)
+            if pending >= MAX_SECRETS_BEFORE_SAVING_DEFAULT or \
+                    (pending and time.monotonic() - last_flush_time >= FINDINGS_FLUSH_SECONDS_DEFAULT):
+                self.flush_sinks(pending_records)
+                pending_rows = 0
+                pending_records = []
+                last_flush_time = time.monotonic()
+
+        if pending_records:
+            self.flush_sinks(pending_records)
+        for sink in self.sinks.values():
+            sink.close()
+
+    def close(self):
+        """
+        This function writes all the pending findings, syncs the sinks to the disk and closes them.
+        :return: None
+        """
+
+        self.queue.put(None)
+        self.thread.join()
@@ -0,0 +1,267 @@
+import re
+import time
+import random
+import asyncio
+import email.utils
+import aiohttp
+from constants import *
+from Metrics import metrics
+
+
+class GitlabResponse:
+    def __init__(self, status: int, headers: dict, data):
+        """
+        Initialization method for the 'GitlabResponse' class.
+        :param status: Integer. The HTTP status code of the response.
+        :param headers: Dictionary. The headers of the response (case-insensitive).
+        :param data: The parsed json body of the response, or None if the body is not a valid json.
+        """
+
+        self.status: int = status
+        self.headers: dict = headers
+        self.data = data
+
+    @property
+    def ok(self):
+        return self.status == 200
+
+    @property
+    def next_url(self):
+        # The URL of the next page in keyset pagination, or None if this is the last page.
+        link = re.search(RE_LINK_HEADER_NEXT_URL, self.headers.get(API_LINK_HEADER, ''))
+        return link.group(1) if link else None
+
+
+def parse_retry_after(value: str):
+    """
+    This function parses the value of a 'Retry-After' header.
+    :param value: String. The value of the header: a number of seconds or an HTTP date.
+    :return: Float. The number of seconds to wait, or None if the value is invalid.
+    """
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    def __init__(self, max_in_flight: int, verbose: bool = False):
+        """
+        Initialization method for the 'AdaptiveLimiter' class.
+        The limiter decides how many requests may be in flight at the same time, like the congestion window of TCP:
+        the limit grows while the requests succeed (doubling at first, then by one request per round trip), and is
+        halved when the instance throttles a request. It never grows above 'max_in_flight'.
+        :param max_in_flight: Integer. The maximal number of requests that are sent at the same time.
+        :param verbose: Boolean. Indicates if we should print status messages or not.
+        """
+
+        self.max_in_flight: int = max_in_flight
+        self.verbose: bool = verbose
+
+        self.concurrency: float = min(max_in_flight, HTTP_INITIAL_REQUESTS_IN_FLIGHT)
+        self.slow_start: bool = True
+        self.in_flight: int = 0
+
+        # The loop time of the last decrease of the limit. A request that was sent before it can not decrease the limit
+        # again, so a burst of throttled responses halves the limit only once.
+        self.decrease_time: float = 0.0
+        # The loop time until which no new requests are sent (e.g. until the rate limit of the instance is reset).
+        self.resume_time: float = 0.0
+
+        self.condition: asyncio.Condition = asyncio.Condition()
+
+    async def acquire(self):
+        """
+        This function waits until another request may be sent.
+        :return: Float. The loop time the request is sent at. It must be passed to 'release'.
+        """
+
+        loop = asyncio.get_running_loop()
+        async with self.condition:
+            while True:
+                delay = self.resume_time - loop.time()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.in_flight < int(self.concurrency):
+                    break
+                else:
+                    await self.condition.wait()
+            self.in_flight += 1
+        return loop.time()
+
+    async def release(self, sent_time: float, throttled: bool):
+        """
+        This function updates the limit after a response was received, and lets the waiting requests go.
+        :param sent_time: Float. The loop time the request was sent at, as returned by 'acquire'.
+        :param throttled: Boolean. Indicates if the instance throttled the request.
+        :return: None
+        """
+
+        async with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                metrics.inc(METRIC_API_THROTTLED)
+                if sent_time >= self.decrease_time:
+                    self.concurrency = max(1.0, self.concurrency / 2)
+                    self.slow_start = False
+                    self.decrease_time = asyncio.get_running_loop().time()
+                    if self.verbose:
+                        print(HTTP_THROTTLED_VERBOSE.format(int(self.concurrency)))
+            elif self.slow_start:
+                self.concurrency = min(self.max_in_flight, self.concurrency + 1)
+            else:
+                self.concurrency = min(self.max_in_flight, self.concurrency + 1 / self.concurrency)
+            metrics.set(METRIC_API_REQUESTS_IN_FLIGHT, self.in_flight)
+            metrics.set(METRIC_API_CONCURRENCY_LIMIT, int(self.concurrency))
+            self.condition.notify_all()
+
+    async def pause(self, seconds: float):
+        """
+        This function stops sending new requests for a while. The requests that are in flight are not affected.
+        :param seconds: Float. The number of seconds to pause for.
+        :return: None
+        """
+
+        async with self.condition:
+            self.resume_time = max(self.resume_time, asyncio.get_running_loop().time() + seconds)
+            self.condition.notify_all()
+
+    async def apply_rate_limit_headers(self, headers: dict):
+        """
+        This function pauses the requests when the rate limit headers of a response tell that the requests that are
+        already in flight will use up the rest of the current rate limit window.
+        :param headers: Dictionary. The headers of the response.
+        :return: None
+        """
+
+        try:
+            remaining = int(headers[API_RATE_LIMIT_REMAINING_HEADER])
+            reset_time = int(headers[API_RATE_LIMIT_RESET_HEADER])
+        except (KeyError, ValueError):
+            return
+        if remaining <= self.in_flight:
+            await self.pause(min(max(0.0, reset_time - time.time()), HTTP_BACKOFF_MAX_SECONDS))
+
+
+class GitlabClient:
+    def __init__(self, instance: str, private_token: str, verify_ssl: bool, max_in_flight: int, verbose: bool = False):
+        """
+        Initialization method for the 'GitlabClient' class.
+        The client sends all the requests to the gitlab api of an instance over a single pool of keep-alive connections.
+        The number of requests that are in flight at the same time adapts to the rate limits of the instance, and
+        throttled or failed requests are retried. It must be used as an async context manager, inside the event loop
+        that sends the requests.
+        :param instance: String. The URL of the gitlab instance.
+        :param private_token: String. The private token of the user. It is sent in a header of every request.
+        :param verify_ssl: Boolean. Indicates if we should verify the SSL certificate of the instance.
+        :param max_in_flight: Integer. The maximal number of requests that are sent at the same time.
+        :param verbose: Boolean. Indicates if we should print status messages or not.
+        """
+
+        self.instance: str = instance
+        self.private_token: str = private_token
+        self.verify_ssl: bool = verify_ssl
+        self.max_in_flight: int = max_in_flight
+        self.verbose: bool = verbose
+
+        self.session: aiohttp.ClientSession = None
+        self.limiter: AdaptiveLimiter = None
+
+    async def __aenter__(self):
+        # The connector keeps the connections alive between requests, up to the limit of requests in flight.
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, ssl=None if self.verify_ssl else False)
+        self.session = aiohttp.ClientSession(connector=connector, headers={PRIVATE_TOKEN_HEADER: self.private_token},
+                                             timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS))
+        self.limiter = AdaptiveLimiter(max_in_flight=self.max_in_flight, verbose=self.verbose)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.session.close()
+
+    async def send(self, url: str):
+        """
+        This function sends a single GET request to the gitlab api, once the limiter allows it.
+        :param url: String. The full URL of the request.
+        :return: Tuple. The response (connection errors are returned as a response with the status 0), and the error
+        of the connection (None if there was a response).
+        """
+
+        sent_time = await self.limiter.acquire()
+        response = GitlabResponse(status=0, headers={}, data=None)
+        error = None
+        try:
+            async with self.session.get(url) as r:
+                try:
+                    data = await r.json(content_type=None)
+                except ValueError:
+                    data = None
+                response = GitlabResponse(status=r.status, headers=r.headers.copy(), data=data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = e
+        finally:
+            metrics.inc(METRIC_API_REQUESTS, status=response.status)
+            metrics.observe(METRIC_API_REQUEST_SECONDS, asyncio.get_running_loop().time() - sent_time)
+            await self.limiter.release(sent_time, throttled=response.status in HTTP_THROTTLED_STATUSES)
+        await self.limiter.apply_rate_limit_headers(response.headers)
+        return response, error
+
+    async def get(self, url: str):
+        """
+        This function sends a GET request to the gitlab api. Throttled requests, server errors and connection errors are
+        retried with an exponential backoff (or after the time the instance asks for).
+        :param url: String. The full URL of the request.
+        :return: GitlabResponse. The response. Connection errors are returned as a response with the status 0.
+        """
+
+        for attempt in range(HTTP_MAX_RETRIES_DEFAULT + 1):
+            response, error = await self.send(url)
+            if response.status not in HTTP_RETRY_STATUSES:
+                return response
+            if attempt == HTTP_MAX_RETRIES_DEFAULT:
+                break
+            metrics.inc(METRIC_API_RETRIES)
+
+            # Wait for the time the instance asks for, or back off exponentially (with jitter, so the waiting requests
+            # are not sent again all at once).
+            delay = parse_retry_after(response.headers.get(API_RETRY_AFTER_HEADER, ''))
+            if delay is None:
+                delay = random.uniform(0, min(HTTP_BACKOFF_MAX_SECONDS, HTTP_BACKOFF_BASE_SECONDS * 2 ** attempt))
+            delay = min(delay, HTTP_BACKOFF_MAX_SECONDS)
+
+            # A throttled request means that the whole client is too fast, so all the requests wait.
+            if response.status in HTTP_THROTTLED_STATUSES:
+                await self.limiter.pause(delay)
+            await asyncio.sleep(delay)
+
+        print(HTTP_REQUEST_ERROR.format(url.split('?')[0], error or HTTP_STATUS_ERROR.format(response.status)))
+        return response
+
+    async def get_all_pages(self, url_format: str, *args, denied_ok: bool = False):
+        """
+        This function gets all the pages of a paginated api, one after the other, by following the next page header.
+        :param url_format: String. The format of the URL of the api. Its last field is the page number.
+        :param args: The values of the other fields of the URL format.
+        :param denied_ok: Boolean. Indicates if an api that the user is not allowed to get has no items, instead of
+        failing.
+        :return: List. The items of all the pages, or None if one of the pages could not be retrieved.
+        """
+
+        items = []
+        page = 1
+        while page:
+            r = await self.get(url_format.format(*args, page))
+            if denied_ok and r.status in HTTP_DENIED_STATUSES:
+                return items
+            if not r.ok or type(r.data) != list:
+                return None
+            items += r.data
+            page = int(r.headers.get(API_NEXT_PAGE_HEADER) or 0)
+        return items
@@ -1,49 +1,54 @@
-import stat
-import time
-import threading
-import urllib3
-import csv
+import asyncio
 import os
+import socket
 import shutil
+import time
 import datetime
-import tomli
-from Project import *
-
-
-urllib3.disable_warnings()
-
-
-def on_error_deleting_clone_path(func, path, exc_info):
-    """
-    This function is responsible for trying once again to delete a git clone before raising an error
-    :param func:
-    :param path:
-    :param exc_info:
-    :return:
-    """
-    try:
-        os.chmod(path, stat.S_IWRITE)
-        os.unlink(path)
-    except FileNotFoundError:
-        pass
-    except PermissionError:
-        print('Some permission error. Giving it one more chance after sleeping for five seconds')
-        time.sleep(5)
-        shutil.rmtree(path)
+import functools
+import heapq
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from ScanWorker import *
+from FindingsWriter import *
+from WorkQueue import *
+from Metrics import *
 
 
 class GitlabInstance:
     def __init__(self, username: str, private_token: str, instance: str, mode: str, threads_count: int,
-                 verify_ssl: bool, save_projects: bool, verbose: bool, patterns_path: str, output: str):
+                 max_requests: int, scan_workers_count: int, verify_ssl: bool, save_projects: bool, verbose: bool,
+                 patterns_path: str, output: str, incremental: bool = False, include_paths: str = '',
+                 exclude_paths: str = '', max_diff_size_kb: int = 0, scan_engine: str = SCAN_ENGINE_DEFAULT,
+                 resume: str = '', delta: bool = False, coordinator: str = '', worker: str = ''):
         """
         Initialization function for the 'GitlabInstance' class.
         :param instance: String. The URL of the gitlab instance.
-        :param threads_count: Integer. The number of threads to use in getting the projects and the cicd secrets.
+        :param threads_count: Integer. The number of pages to request at the same time when enumerating the projects.
+        :param max_requests: Integer. The maximal number of requests to the gitlab api that are in flight at the same
+        time.
+        :param scan_workers_count: Integer. The number of processes that clone and scan projects at the same time.
         :param verify_ssl: Boolean. Indicates if we need to use SSL when interacting with the gitlab api of the current
         instance.
         :param patterns_path: String. The path to the toml file which contains the regex patterns to find the secrets in
         the code of the projects.
         :param output: String. The path to the directory that will contain the outputs for each run
+        :param incremental: Boolean. Indicates if we should scan only the commits that were not scanned in previous
+        runs.
+        :param include_paths: String. Comma separated path globs. If not empty, only the files that match one of them
+        are scanned.
+        :param exclude_paths: String. Comma separated path globs. The files that match one of them are not scanned.
+        :param max_diff_size_kb: Integer. Files and diffs above this size in KB are not scanned (0 for no limit).
+        :param scan_engine: String. Defines how the clones of the projects are scanned: by the diffs of their commits
+        ('diff'), or by their unique blobs ('blob').
+        :param resume: String. The output directory of an interrupted run to resume. The projects that it enumerated
+        are not enumerated again, and the work it had finished is skipped.
+        :param delta: Boolean. Indicates if we should enumerate (and pass on to the next stages) only the projects with
+        activity since the previous enumeration of the instance.
+        :param coordinator: String. The path of a work queue. If specified, the enumerated projects are added to it
+        instead of being scanned, and the secrets that the workers report are merged into the output of the run.
+        :param worker: String. The path of a work queue. If specified, nothing is enumerated: the projects are leased
+        from the queue, scanned, and their secrets are reported back to it.
         """
 
         # Gitlab specifics.
@@ -67,6 +72,27 @@ class GitlabInstance:
         if not self.mode:
             raise INVALID_MODE_ERROR
 
+        # The work queue that shares the code scanning of the run between the workers, on one node or on many. The
+        # coordinator fills it with the enumerated projects (and extracts the cicd variables itself), and the workers
+        # only scan them.
+        if coordinator and worker:
+            raise WORK_ROLE_CONFLICT_ERROR
+        self.work_role: str = WORK_ROLE_COORDINATOR if coordinator else WORK_ROLE_WORKER if worker else ''
+        if self.work_role == WORK_ROLE_WORKER:
+            self.mode = MODE_CODE_SECRETS
+        self.work_queue_path: str = coordinator or worker
+        self.work_queue: WorkQueue = None
+        self.worker_id: str = WORKER_ID_FORMAT.format(socket.gethostname(), os.getpid())
+        self.work_lease_seconds: float = WORK_LEASE_SECONDS_DEFAULT
+        self.work_poll_seconds: float = WORK_QUEUE_POLL_SECONDS_DEFAULT
+        # The ids of the projects that the worker leased and did not report yet, the ids of the projects that the
+        # coordinator added to the queue, and the sequence number of the last report that the coordinator merged.
+        self.leased_ids: set[int] = set()
+        self.queued_ids: set[int] = set()
+        self.merged_sequence: int = 0
+        # Set whenever the worker gives up a lease, so it leases the next project right away.
+        self.lease_freed: asyncio.Event = None
+
         # File system specifics.
         self.cwd: str = os.getcwd()
 
@@ -76,32 +102,143 @@ class GitlabInstance:
         else:
             self.results_root_directory: str = output
 
-        # Define the output directory for the current run. The name of this directory will be the current time.
-        self.output_path: str = os.path.join(self.results_root_directory,
-                                             datetime.datetime.now().strftime('%Y%m%d-%H%M%S'))
+        # Define the output directory for the current run. The name of this directory will be the current time, unless
+        # an interrupted run is resumed in its own directory.
+        if resume:
+            self.output_path: str = resume
+        else:
+            self.output_path: str = os.path.join(self.results_root_directory,
+                                                 datetime.datetime.now().strftime('%Y%m%d-%H%M%S'))
+            # Many workers may start at the same second on the same node.
+            if self.work_role == WORK_ROLE_WORKER:
+                self.output_path = WORKER_OUTPUT_FOLDER_FORMAT.format(self.output_path, self.worker_id)
+
+        # The journal of the progress of the run. It is written to the output directory, so the run can be resumed if it
+        # is interrupted. The journal of a resumed run tells which work is already done.
+        self.journal_path: str = os.path.join(self.output_path, JOURNAL_FILE_NAME_DEFAULT)
+        self.journal: RunJournal = None
+        self.journal_state: dict = {}
+        self.resume: bool = bool(resume)
+        if self.resume:
+            if not os.path.isfile(self.journal_path):
+                raise RESUME_JOURNAL_NOT_FOUND_ERROR
+            self.journal = RunJournal(self.journal_path)
+            self.journal_state = self.journal.get_state()
+            if self.journal_state.get(JOURNAL_STATE_INSTANCE) != self.instance:
+                raise RESUME_INSTANCE_MISMATCH_ERROR
 
-        # The name of the temp folder to create when cloning a project
+        # The name of the temp folder to create when cloning a project. Every scanning process clones into its own
+        # subdirectory of this folder. The folder is created in the scratch directory (e.g. a tmpfs mount), if the
+        # client had specified one.
         self.temp_folder: str = TEMP_FOLDER_NAME_DEFAULT
-        self.clone_path: str = os.path.join(self.cwd, self.temp_folder)
+        self.clone_path: str = os.path.join(SCRATCH_PATH_DEFAULT or self.cwd, self.temp_folder)
+        # The runs that share a work queue may share a node too, so every one of them clones into a folder of its own.
+        if self.work_role:
+            self.clone_path = os.path.join(self.clone_path, self.worker_id)
 
-        # Make sure that the path that the projects will be cloned to does not exist. If it exists, we will run into an
-        # error.
+        # Make sure that the path that the projects will be cloned to does not exist. If it exists, it contains
+        # leftovers of a previous run.
         if os.path.isdir(self.clone_path):
             shutil.rmtree(self.clone_path, onerror=on_error_deleting_clone_path)
 
-        self.threads: list[threading.Thread] = []
         self.threads_counter: int = threads_count
+        self.max_requests: int = max_requests
+        self.scan_workers_counter: int = scan_workers_count if scan_workers_count > 0 else os.cpu_count()
+
+        # The optional cache of bare mirrors of the projects. Projects that are already cached are fetched instead of
+        # cloned.
+        self.mirror_cache: MirrorCache = None
+        if MIRROR_CACHE_PATH_DEFAULT:
+            self.mirror_cache = MirrorCache(cache_path=MIRROR_CACHE_PATH_DEFAULT, instance=self.instance,
+                                            max_size_mb=MIRROR_CACHE_MAX_SIZE_MB_DEFAULT, verbose=verbose)
+
+        # The state store of the tips that were scanned in previous runs. It lives in the results root directory, so all
+        # the runs share it. It is opened when the scanning starts.
+        self.incremental: bool = incremental
+        self.scan_state_path: str = os.path.join(self.results_root_directory, SCAN_STATE_FILE_NAME_DEFAULT)
+        self.scan_state: ScanState = None
+
+        # The catalog of the projects that were enumerated in all the runs. It lives in the results root directory too.
+        # In a delta run, only the projects with activity since the previous enumeration are requested, with this query.
+        self.catalog_path: str = os.path.join(self.results_root_directory, CATALOG_FILE_NAME_DEFAULT)
+        self.catalog: ProjectCatalog = None
+        self.delta: bool = delta
+        self.projects_query: str = ''
+
+        # The run-wide index of the scanned commits, so commits that are shared by forks are scanned only once. It lives
+        # in the temp folder and is created when the scanning starts.
+        self.deduplicate_commits: bool = DEDUPLICATE_COMMITS_DEFAULT
+        self.commit_index: CommitIndex = None
+
+        # Defines how the code of the projects is scanned: by cloning them, through the gitlab api, or automatically
+        # (through the api for small projects).
+        self.scan_method: str = SCAN_METHOD_DEFAULT.lower()
+        if self.scan_method not in (SCAN_METHOD_AUTO, SCAN_METHOD_CLONE, SCAN_METHOD_API):
+            raise INVALID_SCAN_METHOD_ERROR
+        self.scan_engine: str = scan_engine.lower()
+        if self.scan_engine not in SCAN_ENGINES:
+            raise INVALID_SCAN_ENGINE_ERROR
         self.pages_counter: int = 0
 
-        self.response: list[dict] = []
+        # The projects with at least this many commits to scan are scanned in partitions by all the scanning processes,
+        # so a single huge project does not keep one process busy long after the others are done (0 to never split).
+        self.partition_min_commits: int = PARTITION_MIN_COMMITS_DEFAULT
+
+        # Defines how the projects are cloned. Bare clones do not write (and later delete) a working tree that nothing
+        # reads. The blob engine can also skip the download of the blobs above the size cap.
+        self.clone_mode: str = CLONE_MODE_DEFAULT.lower()
+        if self.clone_mode not in CLONE_MODES:
+            raise INVALID_CLONE_MODE_ERROR
+        self.clone_blob_filter: bool = CLONE_BLOB_FILTER_DEFAULT
+
+        # The enumerated projects are scanned in this order (e.g. the biggest repositories first, so they do not start
+        # last and keep the run waiting for them). Up to 'self.scan_schedule_window' enumerated projects are ordered at
+        # a time.
+        self.scan_order: str = SCAN_ORDER_DEFAULT.lower()
+        if self.scan_order not in SCAN_ORDERS:
+            raise INVALID_SCAN_ORDER_ERROR
+        self.scan_schedule_window: int = max(1, SCAN_SCHEDULE_WINDOW_DEFAULT)
 
-        self.ids: list[int] = []
-        self.projects: list[Project] = []
+        # Empty repositories are never scanned. Archived projects, and projects without activity since the specified
+        # date, are not scanned if the client had specified it.
+        self.skip_archived: bool = SKIP_ARCHIVED_DEFAULT
+        self.last_activity_after: float = None
+        if LAST_ACTIVITY_AFTER_DEFAULT:
+            try:
+                self.last_activity_after = parse_api_time(LAST_ACTIVITY_AFTER_DEFAULT)
+            except ValueError:
+                raise INVALID_LAST_ACTIVITY_AFTER_ERROR
+
+        # The ids of the groups whose cicd variables were extracted (or are being extracted), of the groups whose cicd
+        # variables could not be extracted, and of the projects whose cicd variables were extracted by the run that is
+        # resumed. The projects whose cicd variables could not be extracted are kept by their ids.
+        self.cicd_group_ids: set[int] = self.journal.get_done_groups() if self.resume else set()
+        self.cicd_failed_group_ids: set[int] = set()
+        self.cicd_done_ids: set[int] = set()
+        self.cicd_failed_projects: dict[int, Project] = {}
+
+        # The queues of the stages that the enumerated projects are passed on to, by the names of the stages.
+        self.stage_queues: dict[str, asyncio.Queue] = {}
+
+        self.ids: set[int] = set()
         self.projects_counter: int = 0
+        # Indicates if a page of the projects could not be retrieved, so the enumeration is not complete.
+        self.enumeration_failed: bool = False
+        # The file that the urls of the projects are saved to while they are enumerated, if the client had specified it.
+        self.projects_file = None
 
-        self.secrets: list = []
+        # The background writer of the findings to the output sinks. It is started when the stages start.
+        self.findings_sinks: list[str] = FINDINGS_SINKS_DEFAULT
+        if any(sink_name not in FINDINGS_SINKS for sink_name in self.findings_sinks):
+            raise INVALID_FINDINGS_SINK_ERROR
+        self.findings_writer: FindingsWriter = None
 
-        self.patterns: dict = {}
+        # The ids of the projects that were handed to the scanning pool and not scanned yet, and the number of projects
+        # that may still be handed to it before it catches up.
+        self.pending_ids: set[int] = set()
+        self.scan_slots: asyncio.Semaphore = None
+
+        self.patterns: PatternSet = PatternSet()
         if patterns_path == PATTERNS_PATH_DEFAULT:
             self.patterns_path: str = os.path.join(self.cwd, PATTERNS_PATH_DEFAULT)
         else:
@@ -109,10 +246,23 @@ class GitlabInstance:
         if not os.path.isfile(self.patterns_path):
             raise PATTERNS_FILE_NOT_FOUND_ERROR
 
+        # The filters of the scanned diffs. Git applies them while it produces the diffs.
+        self.filters: DiffFilters = DiffFilters(include_paths=include_paths.split(','),
+                                                exclude_paths=exclude_paths.split(','),
+                                                max_diff_size=max_diff_size_kb * BYTES_IN_KB)
+
         self.save_projects: bool = save_projects
 
         self.verbose: bool = verbose
 
+        # The time the run started at, for the stats of the run.
+        self.start_time: float = time.monotonic()
+
+        # What all the enumerated projects have in common.
+        self.project_context: ProjectContext = ProjectContext(instance=self.instance, verify_ssl=self.verify_ssl,
+                                                              patterns=self.patterns, verbose=self.verbose,
+                                                              filters=self.filters)
+
     def caller(self):
         """
         This function is responsible for calling the different functions in the 'GitlabInstance' class, based on the
@@ -122,238 +272,776 @@ class GitlabInstance:
 
         # Create the output directory, if it does not already exist.
         os.makedirs(self.output_path, exist_ok=True)
+        if not self.journal:
+            self.journal = RunJournal(self.journal_path)
+        self.catalog = ProjectCatalog(catalog_path=self.catalog_path, instance=self.instance)
+        if self.work_role:
+            self.work_queue = WorkQueue(queue_path=self.work_queue_path, instance=self.instance)
 
-        # Enumerate all the projects. That should happen in any mode.
-        self.enum_projects()
+        try:
+            asyncio.run(self.run_stages())
+        finally:
+            self.journal.close()
+            self.catalog.close()
+            if self.work_queue:
+                self.work_queue.close()
 
-        # Do the operations that the client had specified in the 'mode' argument.
-        if MODE_ALL in self.mode:
-            self.extract_all_cicd_secrets()
-            self.extract_code_secrets()
-        else:
-            if MODE_CICD_VARIABLES in self.mode:
-                self.extract_all_cicd_secrets()
-            if MODE_CODE_SECRETS in self.mode:
-                self.extract_code_secrets()
+    async def run_stages(self):
+        """
+        This function runs the stages of the tool as a pipeline: the enumeration of the projects (which should happen in
+        any mode) feeds the stages that the client had specified in the 'mode' argument through bounded queues, so
+        every project moves on to its cicd variables and to its code scanning as soon as its page of projects arrives.
+        A worker of a work queue runs only the code scanning, on the projects that it leases from the queue.
+        :return: None
+        """
 
-    def enum_projects_at_page(self, page: int):
+        findings_kinds = []
+        async with self.create_client() as client:
+            stages = []
+            if MODE_ALL in self.mode or MODE_CICD_VARIABLES in self.mode:
+                cicd_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE_DEFAULT)
+                self.stage_queues[STAGE_NAME_CICD] = cicd_queue
+                stages.append(self.extract_all_cicd_secrets(client, cicd_queue))
+                findings_kinds.append(FINDINGS_KIND_CICD)
+            if MODE_ALL in self.mode or MODE_CODE_SECRETS in self.mode:
+                scan_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE_DEFAULT)
+                self.stage_queues[STAGE_NAME_CODE] = scan_queue
+                if self.work_role == WORK_ROLE_COORDINATOR:
+                    stages.append(self.coordinate_code_secrets(scan_queue))
+                else:
+                    stages.append(self.extract_code_secrets(scan_queue))
+                # The secrets of a worker are written by the coordinator.
+                if self.work_role != WORK_ROLE_WORKER:
+                    findings_kinds.append(FINDINGS_KIND_CODE)
+
+            # A worker does not enumerate the projects, it leases them from the work queue instead.
+            if self.work_role == WORK_ROLE_WORKER:
+                stages.append(self.lease_projects(self.stage_queues[STAGE_NAME_CODE]))
+            else:
+                stages.append(self.enum_projects(client))
+
+            # The findings that were written after the last record of the journal are dropped, because the work that
+            # they came from is done again.
+            offsets = self.journal_state.get(JOURNAL_STATE_FINDINGS_OFFSETS, {}) if self.resume else None
+            self.findings_writer = FindingsWriter(output_path=self.output_path, sink_names=self.findings_sinks,
+                                                  kinds=findings_kinds, journal=self.journal, offsets=offsets)
+            if not self.resume:
+                self.findings_writer.put_record((JOURNAL_RECORD_STATE, (JOURNAL_STATE_INSTANCE, self.instance)))
+            stats_task = asyncio.ensure_future(self.report_stats())
+            try:
+                await asyncio.gather(*stages)
+            finally:
+                stats_task.cancel()
+                # Write the remaining findings and sync the output files to the disk.
+                self.findings_writer.close()
+                self.write_stats(final=True)
+
+    def write_stats(self, final: bool = False):
         """
-        This function sends a request to gitlab's api in order to get all the projects in the current page.
-        Furthermore, this funtion then create a 'Project' class instance for each project found, and appends it
-        to the 'self.projects' list
-        :param page: Integer. The number of the current page.
+        This function writes the metrics of the run so far to the stats files in the output directory, with the current
+        state of the stages.
+        :param final: Boolean. Indicates if the run is over. A summary of the run is written too.
         :return: None
         """
 
+        metrics.set(METRIC_UPTIME_SECONDS, time.monotonic() - self.start_time)
+        for stage_name, queue in self.stage_queues.items():
+            metrics.set(METRIC_QUEUE_SIZE, queue.qsize(), stage=stage_name)
+        metrics.set(METRIC_SCAN_BACKLOG, len(self.pending_ids))
+        try:
+            write_stats_files(self.output_path, metrics)
+            if final:
+                summary_path = os.path.join(self.output_path, SUMMARY_FILE_NAME_DEFAULT)
+                write_file_atomically(summary_path, metrics.summary())
+                verbose_print(STATS_SUMMARY_VERBOSE.format(summary_path), self.verbose)
+        except OSError as e:
+            print(FINDINGS_WRITE_ERROR.format(STATS_FILE_NAME_DEFAULT, e))
+
+    async def report_stats(self):
+        """
+        This function rewrites the stats files every 'STATS_INTERVAL_SECONDS_DEFAULT' seconds, until it is cancelled.
+        :return: None
+        """
+
+        while True:
+            await asyncio.sleep(STATS_INTERVAL_SECONDS_DEFAULT)
+            self.write_stats()
+
+    def create_client(self):
+        """
+        This function creates the client that sends the requests to the gitlab api of the current instance.
+        :return: GitlabClient. The client. It must be entered (with 'async with') inside the event loop that uses it.
+        """
+
+        return GitlabClient(instance=self.instance, private_token=self.private_token, verify_ssl=self.verify_ssl,
+                            max_in_flight=self.max_requests, verbose=self.verbose)
+
+    async def enum_projects_at_page(self, client: GitlabClient, url: str):
+        """
+        This function sends a request to gitlab's api in order to get all the projects in the current page.
+        Furthermore, this funtion then create a 'Project' class instance for each project found, and passes it on to
+        the next stages. The projects are not kept after that, so the memory usage does not depend on their number.
+        :param client: GitlabClient. The client to send the request with.
+        :param url: String. The URL of the current page.
+        :return: GitlabResponse. The response of the page.
+        """
+
         # response is a list that contains json objects. Each json is a project.
-        self.response = requests.get(PROJECTS_API_URL_FORMAT.format(self.instance, self.private_token, page + 1),
-                                     verify=self.verify_ssl).json()
+        r = await client.get(url)
+        if not r.ok or type(r.data) != list:
+            print(ENUM_PROJECTS_PAGE_ERROR.format(url.split('?')[0], r.status))
+            self.enumeration_failed = True
+            return r
+
+        catalog_rows = []
 
         # Avoid duplications by:
-        # 1. Saving each new project's id in the 'self.ids' list.
+        # 1. Saving each new project's id in the 'self.ids' set.
         # 2. Before creating new Project instance for the current project, check that it's id is not already present
-        # in the 'self.ids' list (indicates that this project is new).
-        for project in self.response:
+        # in the 'self.ids' set (indicates that this project is new).
+        for project in r.data:
             if project['id'] not in self.ids:
                 # Remove the ".git" extention from the project url if it exists.
                 curr_url = project['http_url_to_repo']
                 curr_url = curr_url[:-4] if curr_url.endswith('.git') else curr_url
 
-                # Create a 'Project' instance for the current project and append it to the 'self.projects' list.
-                new_project = Project(proj_name=curr_url, proj_id=project['id'], instance=self.instance,
-                                      verify_ssl=self.verify_ssl, patterns=self.patterns, verbose=self.verbose)
-                self.projects.append(new_project)
-                self.ids.append(project['id'])
+                # Create a 'Project' instance for the current project.
+                namespace = project.get(API_PROJECT_NAMESPACE) or {}
+                is_group = namespace.get(API_NAMESPACE_KIND) == API_NAMESPACE_KIND_GROUP
+                group_id = namespace.get('id') if is_group else None
+                # The statistics are returned only to users with the reporter role (or above) in the project.
+                statistics = project.get(API_PROJECT_STATISTICS) or {}
+                new_project = Project(proj_name=curr_url, proj_id=project['id'], context=self.project_context,
+                                      group_id=group_id,
+                                      repository_size=statistics.get(API_STATISTICS_REPOSITORY_SIZE),
+                                      last_activity=parse_api_time(project.get(API_PROJECT_LAST_ACTIVITY_AT)),
+                                      empty_repo=bool(project.get(API_PROJECT_EMPTY_REPO)),
+                                      archived=bool(project.get(API_PROJECT_ARCHIVED)))
+                self.ids.add(project['id'])
+
+                if self.projects_file:
+                    self.projects_file.write(curr_url + '\n')
 
-    def enum_projects(self):
+                metrics.inc(METRIC_PROJECTS_ENUMERATED)
+                project_row = (project['id'], curr_url, group_id, new_project.repository_size,
+                               new_project.last_activity, new_project.empty_repo, new_project.archived)
+                self.findings_writer.put_record((JOURNAL_RECORD_PROJECT, project_row))
+                catalog_rows.append(project_row)
+
+                await self.pass_on_project(new_project)
+
+        if self.catalog and catalog_rows:
+            self.catalog.add_projects(catalog_rows)
+
+        # Update the number of pages and projects discovered so far.
+        self.pages_counter += 1
+        self.projects_counter = len(self.ids)
+        verbose_print(ENUM_PROJECTS_STATUS_VERBOSE.format(self.pages_counter, self.projects_counter), self.verbose)
+        return r
+
+    async def pass_on_project(self, project: Project, done_stages: tuple = ()):
+        """
+        This function passes an enumerated project on to the next stages. A full queue holds the enumeration back until
+        its stage catches up.
+        :param project: Project. The project.
+        :param done_stages: Tuple<String>. The names of the stages that are already done with the project.
+        :return: None
+        """
+
+        for stage_name, queue in self.stage_queues.items():
+            if stage_name not in done_stages:
+                await queue.put(project)
+
+    async def replay_journal_projects(self):
+        """
+        This function passes the projects that the resumed run had enumerated on to the stages that are not done with
+        them yet. The projects are read from the journal, so they are not requested again.
+        :return: None
+        """
+
+        cicd_done_counter = 0
+        scanned_counter = 0
+        for proj_id, proj_name, group_id, repository_size, last_activity, empty_repo, archived, cicd_done, scanned in \
+                self.journal.iter_projects():
+            self.ids.add(proj_id)
+            if self.projects_file:
+                self.projects_file.write(proj_name + '\n')
+
+            # The variables of the groups of a project are extracted after its own variables, so its groups may still
+            # need to be extracted.
+            done_stages = []
+            if cicd_done:
+                self.cicd_done_ids.add(proj_id)
+                cicd_done_counter += 1
+                if group_id is None or group_id in self.cicd_group_ids:
+                    done_stages.append(STAGE_NAME_CICD)
+            if scanned:
+                scanned_counter += 1
+                done_stages.append(STAGE_NAME_CODE)
+
+            await self.pass_on_project(Project(proj_name=proj_name, proj_id=proj_id, context=self.project_context,
+                                               group_id=group_id, repository_size=repository_size,
+                                               last_activity=last_activity, empty_repo=bool(empty_repo),
+                                               archived=bool(archived)), tuple(done_stages))
+
+        self.projects_counter = len(self.ids)
+        verbose_print(RESUME_PROJECTS_VERBOSE.format(self.projects_counter, cicd_done_counter, scanned_counter),
+                      self.verbose)
+
+    async def enum_all_projects(self, client: GitlabClient):
+        """
+        This function requests all the pages of the projects.
+        If gitlab tells the total number of pages (it does for up to 10,000 projects), the rest of the pages are
+        requested at the same time. Otherwise, the pages are followed one after the other with keyset pagination, which
+        gitlab serves in a constant time per page, no matter how many projects there are.
+        :param client: GitlabClient. The client to send the requests with.
+        :return: None
+        """
+
+        r = await self.enum_projects_at_page(client,
+                                             PROJECTS_API_URL_FORMAT.format(self.instance, 1) + self.projects_query)
+        if not r.ok:
+            return
+
+        total_pages = int(r.headers.get(API_TOTAL_PAGES_HEADER) or 0)
+        if total_pages:
+            # 'self.threads_counter' workers share the remaining pages, so exactly the existing pages are requested.
+            pages = iter(range(2, total_pages + 1))
+
+            async def enum_pages_worker():
+                for page in pages:
+                    await self.enum_projects_at_page(
+                        client, PROJECTS_API_URL_FORMAT.format(self.instance, page) + self.projects_query)
+
+            await asyncio.gather(*(enum_pages_worker() for _ in range(self.threads_counter)))
+        else:
+            url = PROJECTS_KEYSET_API_URL_FORMAT.format(self.instance) + self.projects_query
+            while url:
+                url = (await self.enum_projects_at_page(client, url)).next_url
+
+    def set_delta_query(self):
+        """
+        This function limits the enumeration to the projects with activity since the previous complete enumeration of
+        the instance, if there was one.
+        :return: None
+        """
+
+        last_enumerated = self.catalog.get_last_enumerated()
+        if last_enumerated is None:
+            verbose_print(DELTA_NO_CATALOG_VERBOSE.format(self.instance), self.verbose)
+            return
+        last_activity_after = format_api_time(last_enumerated - DELTA_OVERLAP_SECONDS)
+        self.projects_query = PROJECTS_LAST_ACTIVITY_AFTER_QUERY.format(last_activity_after)
+        verbose_print(DELTA_ENUMERATION_VERBOSE.format(last_activity_after), self.verbose)
+
+    async def enum_projects(self, client: GitlabClient):
         """
         This function enumerates all the projects in the current gitlab instance
+        :param client: GitlabClient. The client to send the requests with.
         :return: None
         """
 
         verbose_print(ENUM_PROJECTS_START_VERBOSE.format(self.instance), self.verbose)
 
-        # While the gitlab api returns a list of projects, it means that there are more projects to enumerate.
-        # Once we enumerate all the gitlab projects, the response will be an empty array (b'[]').
-        self.response = [1, 2, 3]
-        while self.response:
-            # Get the next chunk of pages, create a thread for each page and start the thread.
-            # the size of each chunk of pages equals to the number of threads ('self.threads_counter').
-            for i in range(self.pages_counter, self.pages_counter + self.threads_counter):
-                curr_thread = threading.Thread(target=self.enum_projects_at_page, args=(i,))
-                self.threads.append(curr_thread)
-            for thread in self.threads:
-                thread.start()
-            for thread in self.threads:
-                thread.join()
-            self.threads.clear()
-            # Update the number of the current page.
-            self.pages_counter += self.threads_counter
-            # Update the number of projects discovered so far.
-            self.projects_counter = len(self.projects)
-            verbose_print(ENUM_PROJECTS_STATUS_VERBOSE.format(
-                self.threads_counter, self.pages_counter, self.projects_counter), self.verbose)
+        # Save the projects urls in the output directory while they are enumerated, if the client had specified it.
+        projects_urls_output_path = os.path.join(self.output_path, SAVE_PROJECTS_URLS_FILE_NAME_DEFAULT)
+        if self.save_projects:
+            self.projects_file = open(projects_urls_output_path, MODE_WRITE)
 
-        verbose_print(ENUM_PROJECTS_FINISH_VERBOSE.format(self.instance), self.verbose)
+        try:
+            if self.resume:
+                await self.replay_journal_projects()
+            if not self.journal_state.get(JOURNAL_STATE_ENUMERATION_DONE):
+                enumeration_time = time.time()
+                if self.delta and self.catalog:
+                    self.set_delta_query()
+                await self.enum_all_projects(client)
+                # A resumed run enumerates the projects again only if some of their pages could not be retrieved.
+                if not self.enumeration_failed:
+                    self.findings_writer.put_record((JOURNAL_RECORD_STATE, (JOURNAL_STATE_ENUMERATION_DONE, True)))
+                    if self.catalog:
+                        self.catalog.set_last_enumerated(enumeration_time)
+        finally:
+            if self.projects_file:
+                self.projects_file.close()
+            # Tell the next stages that there are no more projects.
+            for queue in self.stage_queues.values():
+                await queue.put(None)
 
-        # Save the projects urls in the output directory if the client had specified it.
+        verbose_print(ENUM_PROJECTS_FINISH_VERBOSE.format(self.instance), self.verbose)
         if self.save_projects:
-            projects_urls_output_path = os.path.join(self.output_path, SAVE_PROJECTS_URLS_FILE_NAME_DEFAULT)
-            with open(projects_urls_output_path, MODE_WRITE) as file:
-                for project in self.projects:
-                    file.write(project.proj_name + '\n')
-
             verbose_print(EXTRACT_PROJECTS_URLS_FINISH.format(projects_urls_output_path), self.verbose)
 
-    def extract_all_cicd_secrets(self):
+    def write_cicd_secrets(self, scope: str, owner_id, owner_url: str, cicd_secrets: list[tuple],
+                           record: tuple = None):
         """
-        This function is responsible to go through all the enumerated projects, and for each project, the function will
-        call it's 'get_cicd_variables' which returns the cicd variables of the current projects.
+        This function hands the cicd variables of a project, a group or the instance over to the findings writer, as
+        soon as they are retrieved.
+        :param scope: String. The scope of the variables ('project', 'group' or 'instance').
+        :param owner_id: Integer. The id of the project or the group (empty for the instance).
+        :param owner_url: String. The url of the project, the group or the instance.
+        :param cicd_secrets: List<Tuple>. A (name, value) tuple for every variable.
+        :param record: Tuple. The record of the journal that tells that the variables of the owner were extracted.
         :return: None
         """
 
-        verbose_print(EXTRACT_CICD_START_VERBOSE, self.verbose)
-        # Enumerate all the projects.
-        for i in range(0, self.projects_counter, self.threads_counter):
-            self.threads.clear()
-            # Create 'self.threads_counter' amount of threads each iteration.
-            for t in range(i, i + self.threads_counter):
-                # Make sure we didn't go higher than the amount of projects in the instance.
-                if t < self.projects_counter:
-                    curr_project = self.projects[t]
-                    # Create a thread to the current project's 'get_cicd_variables' method.
-                    curr_thread = threading.Thread(target=curr_project.get_cicd_variables, args=(self.private_token,))
-                    self.threads.append(curr_thread)
-            for curr_thread in self.threads:
-                curr_thread.start()
-            for curr_thread in self.threads:
-                curr_thread.join()
+        metrics.inc(METRIC_CICD_VARIABLES, len(cicd_secrets), scope=scope)
+        self.findings_writer.put(FINDINGS_KIND_CICD, [[scope, owner_id, owner_url, cicd_secret[0], cicd_secret[1]]
+                                                      for cicd_secret in cicd_secrets], record)
 
-        verbose_print(EXTRACT_CICD_FINISH_VERBOSE, self.verbose)
+    async def extract_project_cicd_secrets(self, client: GitlabClient, project: Project):
+        """
+        This function gets the cicd variables of a project. The projects whose variables could not be retrieved are not
+        recorded as done, so they are retrieved again (e.g. once all the projects are done).
+        :param client: GitlabClient. The client to send the requests with.
+        :param project: Project. The project.
+        :return: None
+        """
 
-        # Export the cicd variables.
-        self.export_cicd_secrets()
+        variables = await project.get_cicd_variables(client)
+        if variables is None:
+            self.cicd_failed_projects[project.proj_id] = project
+            print(PROJECT_CICD_ERROR.format(project.proj_name))
+            return
+        self.cicd_failed_projects.pop(project.proj_id, None)
+        self.write_cicd_secrets(CICD_SCOPE_PROJECT, project.proj_id, project.proj_name, variables,
+                                (JOURNAL_RECORD_CICD_DONE, project.proj_id))
 
-    def export_cicd_secrets(self):
+    async def extract_group_cicd_secrets(self, client: GitlabClient, group_id: int):
         """
-        This function is responsible to export collected cicd secrets into a csv file.
+        This function gets the cicd variables of a group and of all its parent groups. The variables of every group are
+        retrieved only once, no matter how many of its projects were enumerated. The groups that could not be retrieved
+        are not recorded as done, so they are retrieved again (e.g. once all the projects are done).
+        :param client: GitlabClient. The client to send the requests with.
+        :param group_id: Integer. The id of the group.
         :return: None
         """
 
-        verbose_print(EXPORT_CICD_START_VERBOSE, self.verbose)
+        while group_id is not None and group_id not in self.cicd_group_ids:
+            # The group is added right away, so the other workers do not retrieve it at the same time.
+            self.cicd_group_ids.add(group_id)
 
-        # Write to the output file all the current cicd variables.
-        cicd_vars_output_path = os.path.join(self.output_path, CICD_VARS_FILE_NAME_DEFAULT)
-        with open(cicd_vars_output_path, MODE_WRITE, encoding=UTF_8_ENCODING, newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(COLUMNS_HEADERS_CICD_VARIABLES)
-            for project in self.projects:
-                if project.cicd_secrets:
-                    for cicd_secret in project.cicd_secrets:
-                        writer.writerow([project.proj_id, project.proj_name, cicd_secret[0], cicd_secret[1]])
+            r = await client.get(GROUP_API_URL_FORMAT.format(self.instance, group_id))
+            if r.status in HTTP_DENIED_STATUSES:
+                self.findings_writer.put_record((JOURNAL_RECORD_GROUP, group_id))
+                return
+            # Users without the maintainer role can not list the variables, so the group simply has none for them.
+            variables = await client.get_all_pages(GROUP_VARIABLES_API_URL_FORMAT, self.instance, group_id,
+                                                   denied_ok=True) if r.ok and type(r.data) == dict else None
+            if variables is None:
+                self.cicd_group_ids.discard(group_id)
+                self.cicd_failed_group_ids.add(group_id)
+                print(GROUP_CICD_ERROR.format(group_id))
+                return
+            self.cicd_failed_group_ids.discard(group_id)
+            self.write_cicd_secrets(CICD_SCOPE_GROUP, group_id, r.data.get(API_GROUP_WEB_URL),
+                                    [(secret['key'], secret['value']) for secret in variables],
+                                    (JOURNAL_RECORD_GROUP, group_id))
 
-        verbose_print(EXPORT_CICD_FINISH_VERBOSE, self.verbose)
+            # Inherited variables come from all the ancestors of the group.
+            group_id = r.data.get(API_GROUP_PARENT_ID)
 
-    def load_patterns(self):
+    async def extract_all_cicd_secrets(self, client: GitlabClient, queue: asyncio.Queue):
         """
-        This function is used for loading all the possible regex patterns of the secrets to be found.
+        This function is responsible to go through all the enumerated projects, and for each project, the function will
+        call it's 'get_cicd_variables' which returns the cicd variables of the current projects. The variables of the
+        groups of the projects and of the instance itself are extracted too.
+        The variables are handed over to the findings writer while they are extracted.
+        :param client: GitlabClient. The client to send the requests with.
+        :param queue: asyncio.Queue. The queue of the enumerated projects. It ends with None.
         :return: None
         """
 
-        # Load the data of the toml file that contains the regex patterns for the secrets.
-        with open(self.patterns_path, 'rb') as file:
-            toml_dict = tomli.load(file)
+        verbose_print(EXTRACT_CICD_START_VERBOSE, self.verbose)
 
-        # Convert the toml into an easy-iteratable dictionary
-        for category_name, category_value in toml_dict.items():
-            for sub_category in category_value:
+        async def cicd_worker():
+            while (project := await queue.get()) is not None:
+                if project.proj_id not in self.cicd_done_ids:
+                    await self.extract_project_cicd_secrets(client, project)
+                await self.extract_group_cicd_secrets(client, project.group_id)
+            # Leave the end of the queue for the other workers.
+            await queue.put(None)
 
-                # Make sure that there is a description (sub_category_name) and at least one regex pattern for the
-                # current sub category
-                if PATTERNS_VALUE_SUB_CATEGORY_NAME not in sub_category.keys() or \
-                        PATTERNS_VALUE_REGEX not in sub_category.keys():
-                    print(PATTERNS_INCOMPLETE_PATTERN_IN_TOML_FILE)
-                    continue
+        async def instance_cicd_worker():
+            if self.journal_state.get(JOURNAL_STATE_INSTANCE_CICD_DONE):
+                return
+            # Only administrators can list the variables of the instance, so it simply has none for the other users.
+            variables = await client.get_all_pages(INSTANCE_VARIABLES_API_URL_FORMAT, self.instance, denied_ok=True)
+            if variables is None:
+                print(INSTANCE_CICD_ERROR.format(self.instance))
+                return
+            self.write_cicd_secrets(CICD_SCOPE_INSTANCE, '', self.instance,
+                                    [(secret['key'], secret['value']) for secret in variables],
+                                    (JOURNAL_RECORD_STATE, (JOURNAL_STATE_INSTANCE_CICD_DONE, True)))
 
-                # Get the regex/es of the current sub category
-                regex = sub_category[PATTERNS_VALUE_REGEX]
-
-                # Add the pattern/s to the keys of the 'self.patterns' dictionary and the metadata ('category_name',
-                # sub_category[PATTERNS_VALUE_SUB_CATEGORY_NAME]) to the value of this key (value type: list).
-                # If the regex (or one of the regexes we got in a list) is not of type 'str', it's an invalid regex and
-                # we should skip it and continue to the next iteration.
-                if type(regex) == str:
-                    self.patterns[regex] = [category_name, sub_category[PATTERNS_VALUE_SUB_CATEGORY_NAME]]
-                elif type(regex) == list:
-                    for r in regex:
-                        if type(r) != str:
-                            print(PATTERNS_INVALID_REGEX_IN_TOML_FILE.format(category_name, sub_category))
-                            continue
-                        self.patterns[r] = [category_name, sub_category[PATTERNS_VALUE_SUB_CATEGORY_NAME]]
-                else:
-                    print(PATTERNS_INVALID_REGEX_IN_TOML_FILE.format(category_name, sub_category))
-                    continue
+        await asyncio.gather(instance_cicd_worker(), *(cicd_worker() for _ in range(CICD_WORKERS_DEFAULT)))
+
+        # The projects and the groups that failed are retried once more. The ones that fail again are retried when the
+        # run is resumed.
+        failed_projects = list(self.cicd_failed_projects.values())
+        failed_group_ids = self.cicd_failed_group_ids - self.cicd_group_ids
+        await asyncio.gather(*(self.extract_project_cicd_secrets(client, project) for project in failed_projects),
+                             *(self.extract_group_cicd_secrets(client, group_id) for group_id in failed_group_ids))
+
+        verbose_print(EXTRACT_CICD_FINISH_VERBOSE, self.verbose)
+
+    def load_patterns(self):
+        """
+        This function is used for loading all the possible regex patterns of the secrets to be found, and compiling them
+        into the 'self.patterns' pattern set.
+        :return: None
+        """
 
-        # Delete the loaded toml content. We do not need it anymore because we got the dictionary representation of it
-        # in the previous step.
-        del toml_dict
+        self.patterns.load_toml(self.patterns_path)
 
         verbose_print(LOAD_PATTERNS_FINISH_VERBOSE.format(self.patterns_path), self.verbose)
+        verbose_print(LOAD_PATTERNS_SUMMARY_VERBOSE.format(
+            len(self.patterns), len(self.patterns) - len(self.patterns.unfiltered_rules)), self.verbose)
 
-    def write_code_secrets(self, secrets: list[list[str, str, str, int]]):
+    def collect_scan_result(self, proj_id: int, future: asyncio.Future):
         """
-        This function writes a list of secrets to a desired output file.
-        :param secrets: List<List>. A list containing a list of metadata
+        This function collects the result of a project as soon as the scanning pool is done with it.
+        :param proj_id: Integer. The id of the scanned project.
+        :param future: asyncio.Future. The future of the scan of the project.
         :return: None
         """
 
-        # Open the output file and append to it the current secrets.
-        with open(os.path.join(self.output_path, SECRETS_FILE_NAME_DEFAULT), MODE_APPEND, encoding=UTF_8_ENCODING,
-                  newline='') as file:
-            writer = csv.writer(file)
-            for secret_metadata in secrets:
-                writer.writerow(secret_metadata)
+        self.scan_slots.release()
+        self.pending_ids.discard(proj_id)
+        try:
+            code_secrets, mirror_size, tips, scanned, worker_metrics = future.result()
+        except Exception as e:
+            metrics.inc(METRIC_PROJECTS_SCAN_FAILED)
+            print(SCAN_PROJECT_ERROR.format(e))
+            if self.work_role == WORK_ROLE_WORKER:
+                self.release_work(proj_id)
+            return
+        metrics.merge(worker_metrics)
+        metrics.inc(METRIC_PROJECTS_SCANNED if scanned else METRIC_PROJECTS_SCAN_FAILED)
+        metrics.inc(METRIC_CODE_SECRETS, len(code_secrets))
+        if self.work_role == WORK_ROLE_WORKER:
+            # The secrets are reported to the work queue, and the coordinator writes them. A project that could not be
+            # scanned is left to the next attempt.
+            if scanned:
+                self.report_work_result(proj_id, code_secrets)
+            else:
+                self.release_work(proj_id)
+        else:
+            # A project that could not be scanned (e.g. its clone failed) keeps its previous time in the catalog.
+            if self.catalog and scanned:
+                self.catalog.set_last_scanned(proj_id, time.time())
+            # The project is recorded as scanned in the journal only once its secrets are flushed. A project that could
+            # not be scanned is not recorded, so it is scanned again when the run is resumed.
+            self.findings_writer.put(FINDINGS_KIND_CODE, code_secrets,
+                                     (JOURNAL_RECORD_SCANNED, proj_id) if scanned else None)
 
-    def extract_code_secrets(self):
+        # Remember the scanned tips, so the next run starts from them.
+        if self.scan_state and tips is not None:
+            self.scan_state.set_scanned_tips(proj_id, tips)
+
+        # Keep the mirrors cache below its size limit.
+        if mirror_size is not None:
+            self.mirror_cache.record_mirror(proj_id, mirror_size)
+            self.mirror_cache.evict(in_use_ids=self.pending_ids)
+
+    async def scan_project_in_pool(self, executor: ProcessPoolExecutor, proj: Project):
+        """
+        This function scans a project in the scanning pool. A project that is too big for a single process is scanned in
+        partitions, by all the processes of the pool.
+        :param executor: ProcessPoolExecutor. The scanning pool.
+        :param proj: Project. The project to scan.
+        :return: Tuple. The result of the scan, like the result of 'scan_project'.
+        """
+
+        loop = asyncio.get_running_loop()
+        code_secrets, mirror_size, tips, scanned, worker_metrics = await loop.run_in_executor(
+            executor, scan_project, proj.proj_name, proj.proj_id, self.instance, self.verify_ssl, self.verbose,
+            self.username, self.private_token, self.clone_path, self.mirror_cache,
+            self.scan_state.get_scanned_tips(proj.proj_id) if self.scan_state else (), self.commit_index,
+            self.scan_method, self.scan_engine, self.partition_min_commits, self.clone_mode, self.clone_blob_filter,
+            proj.repository_size)
+        if not isinstance(tips, ScanPartitions):
+            return code_secrets, mirror_size, tips, scanned, worker_metrics
+
+        # The partitions are queued behind the projects that are already in the pool, so the pool stays busy.
+        partitions = tips
+        partitions_count = max(1, min(self.scan_workers_counter * PARTITIONS_PER_WORKER,
+                                      partitions.commits_count // PARTITION_MIN_SIZE_COMMITS))
+        bounds = [partitions.commits_count * index // partitions_count for index in range(partitions_count + 1)]
+        verbose_print(SCAN_PARTITIONS_VERBOSE.format(proj.proj_name, partitions.commits_count, partitions_count),
+                      self.verbose)
+        worker_metrics.inc(METRIC_PARTITIONED_PROJECTS)
+        results = await asyncio.gather(*(loop.run_in_executor(
+            executor, scan_partition, proj.proj_name, proj.proj_id, self.instance, self.verify_ssl, self.verbose,
+            partitions, start, end) for start, end in zip(bounds, bounds[1:])), return_exceptions=True)
+
+        success = True
+        for result in results:
+            if isinstance(result, BaseException):
+                print(SCAN_PROJECT_ERROR.format(result))
+                success = False
+                continue
+            partition_secrets, partition_success, partition_metrics = result
+            code_secrets += partition_secrets
+            success = success and partition_success
+            worker_metrics.merge(partition_metrics)
+
+        # The commits of a partially scanned project are not recorded, so they are scanned again in other projects.
+        code_secrets, finish_metrics = await loop.run_in_executor(
+            executor, finish_partitioned_scan, proj.proj_name, proj.proj_id, self.instance, self.verify_ssl,
+            self.verbose, partitions, code_secrets, self.commit_index if success else None)
+        worker_metrics.merge(finish_metrics)
+        return code_secrets, partitions.mirror_size, partitions.tips if success else None, success, worker_metrics
+
+    def scan_skip_reason(self, proj: Project):
+        """
+        This function decides if a project should not be scanned, without cloning it.
+        :param proj: Project. The project.
+        :return: String. The reason to skip the project ('empty', 'archived' or 'inactive'), or None to scan it.
         """
-        This function iterates a given projects list 'projects_urls' and checks for secrets in all the commits of each
-        one of them. Each url in the list must be a project that was scanned with the tool in the 'enum_projects'
-        method.
-        :param projects_urls: A list that contains URLs to gitlab projects
+
+        if proj.empty_repo:
+            return SKIP_REASON_EMPTY
+        if proj.archived and self.skip_archived:
+            return SKIP_REASON_ARCHIVED
+        if self.last_activity_after and proj.last_activity is not None and \
+                proj.last_activity < self.last_activity_after:
+            return SKIP_REASON_INACTIVE
+        return None
+
+    def scan_priority(self, proj: Project):
+        """
+        This function returns the key that the projects that wait for the scanning pool are ordered by. The projects
+        with the smallest keys are scanned first.
+        :param proj: Project. The project.
+        :return: Float. The key.
+        """
+
+        # The repositories with an unknown size are scanned after the ones that are known to be big.
+        if self.scan_order == SCAN_ORDER_SIZE:
+            return -(proj.repository_size or 0)
+        if self.scan_order == SCAN_ORDER_ACTIVITY:
+            return -(proj.last_activity or 0)
+        return 0
+
+    async def extract_code_secrets(self, queue: asyncio.Queue):
+        """
+        This function takes the enumerated projects out of a queue and checks for secrets in all the commits of each one
+        of them, in a pool of processes.
+        :param queue: asyncio.Queue. The queue of the enumerated projects. It ends with None.
         :return: None
         """
 
         verbose_print(EXTRACT_CODE_SECRETS_START_VERBOSE, self.verbose)
 
-        # Prepare the output file with column headers
-        self.write_code_secrets([COLUMNS_HEADERS_CODE_SECRETS])
-
         # Load all the secrets regex patterns.
         self.load_patterns()
 
-        secrets_to_write = []
-        # For every project, clone it and call it's 'inspect_code' method.
-        for i, proj in enumerate(self.projects):
-            proj.clone_project(self.username, self.private_token, self.temp_folder)
-            os.chdir(self.clone_path)
+        # Clone and scan the projects in a pool of processes. Each process clones into its own scratch directory and
+        # runs git in it, so the processes do not depend on the current working directory.
+        os.makedirs(self.clone_path, exist_ok=True)
+        if self.mirror_cache:
+            self.mirror_cache.load_index()
+        if self.incremental:
+            self.scan_state = ScanState(state_path=self.scan_state_path, instance=self.instance)
+        if self.deduplicate_commits:
+            self.commit_index = CommitIndex(index_path=os.path.join(self.clone_path, COMMIT_INDEX_FILE_NAME))
 
-            proj.inspect_code()
+        # The processes are not forked from this process, because it runs the threads of the event loop. A fork server
+        # starts them from a clean process instead, where it is available.
+        mp_context = multiprocessing.get_context(MULTIPROCESSING_FORKSERVER) \
+            if MULTIPROCESSING_FORKSERVER in multiprocessing.get_all_start_methods() else None
 
-            # If secrets were found, add them to the secrets list.
-            if proj.code_secrets:
-                secrets_to_write += proj.code_secrets
+        # Only a few projects wait for a free process at a time, so the queue of the enumerated projects holds the rest.
+        self.scan_slots = asyncio.Semaphore(self.scan_workers_counter * PIPELINE_SCAN_BACKLOG_PER_WORKER)
+        futures = set()
+        # The enumerated projects that wait for a free process, ordered by 'scan_priority'. The counter keeps the order
+        # of the api between projects with the same key.
+        scheduled = []
+        counter = itertools.count()
+        enumeration_done = False
+        with ProcessPoolExecutor(max_workers=self.scan_workers_counter, mp_context=mp_context,
+                                 initializer=init_scan_worker, initargs=(self.patterns, self.filters)) as executor:
+            while True:
+                await self.scan_slots.acquire()
 
-            # If the number of secrets is equal or greater than 'MAX_SECRETS_BEFORE_SAVING_DEFAULT', save the secrets
-            # to the desired output file.
-            if len(secrets_to_write) >= MAX_SECRETS_BEFORE_SAVING_DEFAULT:
-                self.write_code_secrets(secrets_to_write)
-                secrets_to_write.clear()
-            os.chdir(self.cwd)
+                # Take in all the projects that were enumerated while the pool was busy, so the next project to scan is
+                # chosen among them. Wait for a project only if none is scheduled.
+                while not enumeration_done and len(scheduled) < self.scan_schedule_window and \
+                        not (scheduled and queue.empty()):
+                    if (proj := await queue.get()) is None:
+                        enumeration_done = True
+                    elif skip_reason := self.scan_skip_reason(proj):
+                        metrics.inc(METRIC_PROJECTS_SKIPPED, reason=skip_reason)
+                        verbose_print(SKIP_PROJECT_SCAN_VERBOSE.format(proj.proj_name, skip_reason), self.verbose)
+                        if self.work_role == WORK_ROLE_WORKER:
+                            self.report_work_result(proj.proj_id, [])
+                    else:
+                        heapq.heappush(scheduled, (self.scan_priority(proj), next(counter), proj))
+                if not scheduled:
+                    self.scan_slots.release()
+                    break
+                proj = heapq.heappop(scheduled)[2]
 
-            shutil.rmtree(self.clone_path, onerror=on_error_deleting_clone_path)
+                # The ids of the projects that were not scanned yet. Their mirrors must not be evicted.
+                self.pending_ids.add(proj.proj_id)
+                future = asyncio.ensure_future(self.scan_project_in_pool(executor, proj))
+
+                # Collect the secrets of every project as soon as it is scanned.
+                future.add_done_callback(functools.partial(self.collect_scan_result, proj.proj_id))
+                futures.add(future)
+                future.add_done_callback(futures.discard)
+
+            if futures:
+                await asyncio.wait(futures)
+
+        if self.commit_index:
+            self.commit_index.close()
+        shutil.rmtree(self.clone_path, onerror=on_error_deleting_clone_path)
+        if self.scan_state:
+            self.scan_state.close()
+
+        verbose_print(EXTRACT_CODE_SECRETS_FINISH_VERBOSE, self.verbose)
+
+    def report_work_result(self, proj_id: int, code_secrets: list[list]):
+        """
+        This function reports the secrets of a leased project to the work queue, so the coordinator merges them.
+        :param proj_id: Integer. The id of the project.
+        :param code_secrets: List<List>. The code secrets that were found in the project.
+        :return: None
+        """
+
+        self.leased_ids.discard(proj_id)
+        self.lease_freed.set()
+        if not self.work_queue.complete(self.worker_id, proj_id, code_secrets):
+            verbose_print(WORK_LEASE_LOST_VERBOSE.format(proj_id), self.verbose)
+
+    def release_work(self, proj_id: int):
+        """
+        This function gives the lease of a project that could not be scanned back to the work queue, so another worker
+        (or this one) tries it again, until it runs out of attempts.
+        :param proj_id: Integer. The id of the project.
+        :return: None
+        """
+
+        self.leased_ids.discard(proj_id)
+        self.lease_freed.set()
+        self.work_queue.release(self.worker_id, proj_id)
+
+    async def renew_leases(self):
+        """
+        This function renews the leases of the projects that the worker did not report yet, a few times per lease, so
+        they do not expire while the projects wait for the scanning pool or are scanned. It runs until it is cancelled.
+        :return: None
+        """
+
+        while True:
+            await asyncio.sleep(self.work_lease_seconds / WORK_LEASE_RENEWALS_PER_LEASE)
+            if self.leased_ids:
+                self.work_queue.renew(self.worker_id, list(self.leased_ids), self.work_lease_seconds)
+
+    async def lease_projects(self, queue: asyncio.Queue):
+        """
+        This function leases projects from the work queue and passes them on to the code scanning, instead of the
+        enumeration. The worker holds only as many leases as the scanning pool has slots, so the other workers get
+        the rest of the projects. It runs until the coordinator had added all the projects and none of them is left.
+        :param queue: asyncio.Queue. The queue of the code scanning. It ends with None.
+        :return: None
+        """
+
+        verbose_print(WORKER_START_VERBOSE.format(self.work_queue_path, self.worker_id), self.verbose)
+        self.lease_freed = asyncio.Event()
+        renew_task = asyncio.ensure_future(self.renew_leases())
+        try:
+            while True:
+                count = self.scan_workers_counter * PIPELINE_SCAN_BACKLOG_PER_WORKER - len(self.leased_ids)
+                if count <= 0:
+                    await self.lease_freed.wait()
+                    self.lease_freed.clear()
+                    continue
+                rows = self.work_queue.lease(self.worker_id, count, self.work_lease_seconds)
+                for proj_id, proj_name, group_id, repository_size, last_activity, empty_repo, archived in rows:
+                    self.leased_ids.add(proj_id)
+                    self.ids.add(proj_id)
+                    await queue.put(Project(proj_name=proj_name, proj_id=proj_id, context=self.project_context,
+                                            group_id=group_id, repository_size=repository_size,
+                                            last_activity=last_activity, empty_repo=bool(empty_repo),
+                                            archived=bool(archived)))
+                self.projects_counter = len(self.ids)
+                if rows:
+                    continue
+                # The leases of this worker are unfinished work too, so the loop goes on until they are reported.
+                if not self.work_queue.has_unfinished_work():
+                    break
+                await asyncio.sleep(self.work_poll_seconds)
+        finally:
+            renew_task.cancel()
+            await queue.put(None)
+
+    def merge_work_results(self):
+        """
+        This function writes the secrets that the workers reported since the last merge to the output of the run. Only
+        the projects that this run added to the queue are merged.
+        :return: None
+        """
+
+        for sequence, proj_id, code_secrets in self.work_queue.iter_completed(self.merged_sequence):
+            self.merged_sequence = sequence
+            if proj_id not in self.queued_ids:
+                continue
+            metrics.inc(METRIC_PROJECTS_SCANNED)
+            metrics.inc(METRIC_CODE_SECRETS, len(code_secrets))
+            if self.catalog:
+                self.catalog.set_last_scanned(proj_id, time.time())
+            # The project is recorded as scanned in the journal only once its secrets are flushed.
+            self.findings_writer.put(FINDINGS_KIND_CODE, code_secrets, (JOURNAL_RECORD_SCANNED, proj_id))
+
+    async def coordinate_code_secrets(self, queue: asyncio.Queue):
+        """
+        This function takes the enumerated projects out of a queue and adds them to the work queue in batches, instead
+        of scanning them. It then waits for the workers to scan them, and merges the secrets that they report.
+        :param queue: asyncio.Queue. The queue of the enumerated projects. It ends with None.
+        :return: None
+        """
+
+        verbose_print(EXTRACT_CODE_SECRETS_START_VERBOSE, self.verbose)
+
+        # The workers wait for more projects until the queue is marked as filled again. The projects of a previous run
+        # are removed, unless it is the run that is resumed.
+        self.work_queue.set_filled(False)
+        if not self.resume:
+            self.work_queue.clear()
+        batch = []
+        while True:
+            proj = await queue.get()
+            if proj is not None:
+                if skip_reason := self.scan_skip_reason(proj):
+                    metrics.inc(METRIC_PROJECTS_SKIPPED, reason=skip_reason)
+                    verbose_print(SKIP_PROJECT_SCAN_VERBOSE.format(proj.proj_name, skip_reason), self.verbose)
+                else:
+                    self.queued_ids.add(proj.proj_id)
+                    batch.append((proj.proj_id, proj.proj_name, proj.group_id, proj.repository_size,
+                                  proj.last_activity, proj.empty_repo, proj.archived))
+
+            # Hand the batch to the workers once it is full, or whenever the enumeration has nothing more for now.
+            if batch and (proj is None or len(batch) >= WORK_QUEUE_BATCH_SIZE or queue.empty()):
+                self.work_queue.add_projects(batch)
+                batch = []
+                self.merge_work_results()
+            if proj is None:
+                break
+
+        self.work_queue.set_filled(True)
+        verbose_print(WORK_QUEUE_FILLED_VERBOSE, self.verbose)
+        while True:
+            # Checked before the merge, so the reports of the last projects are merged too.
+            finished = not self.work_queue.has_unfinished_work()
+            self.merge_work_results()
+            if finished:
+                break
+            await asyncio.sleep(self.work_poll_seconds)
 
-        # Write the remained secrets to the desired output file.
-        self.write_code_secrets(secrets_to_write)
-        secrets_to_write.clear()
+        # The projects that failed in every attempt were never reported.
+        metrics.inc(METRIC_PROJECTS_SCAN_FAILED, len(self.work_queue.get_failed() & self.queued_ids))
 
         verbose_print(EXTRACT_CODE_SECRETS_FINISH_VERBOSE, self.verbose)
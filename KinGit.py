@@ -14,6 +14,12 @@ def main():
                         help=INSTANCE_PARAM_ARGPARSE[2], type=str, required=True)
     parser.add_argument(THREADS_PARAM_ARGPARSE[0], THREADS_PARAM_ARGPARSE[1],
                         help=THREADS_PARAM_ARGPARSE[2], type=int, required=False, default=NUMBER_OF_THREADS_DEFAULT)
+    parser.add_argument(MAX_REQUESTS_PARAM_ARGPARSE[0], MAX_REQUESTS_PARAM_ARGPARSE[1],
+                        help=MAX_REQUESTS_PARAM_ARGPARSE[2], type=int, required=False,
+                        default=MAX_REQUESTS_IN_FLIGHT_DEFAULT)
+    parser.add_argument(SCAN_WORKERS_PARAM_ARGPARSE[0], SCAN_WORKERS_PARAM_ARGPARSE[1],
+                        help=SCAN_WORKERS_PARAM_ARGPARSE[2], type=int, required=False,
+                        default=NUMBER_OF_SCAN_WORKERS_DEFAULT)
     parser.add_argument(PATTERNS_PARAM_ARGPARSE[0], PATTERNS_PARAM_ARGPARSE[1],
                         help=PATTERNS_PARAM_ARGPARSE[2], type=str, required=False, default=PATTERNS_PATH_DEFAULT)
     parser.add_argument(MODE_PARAM_ARGPARSE[0], MODE_PARAM_ARGPARSE[1],
@@ -23,15 +29,41 @@ def main():
     parser.add_argument(EXPORT_PROJECTS_PARAM_ARGPARSE[0], EXPORT_PROJECTS_PARAM_ARGPARSE[1],
                         help=EXPORT_PROJECTS_PARAM_ARGPARSE[2], required=False, action=STORE_TRUE_ARGPARSE,
                         default=False)
+    parser.add_argument(INCREMENTAL_PARAM_ARGPARSE[0], INCREMENTAL_PARAM_ARGPARSE[1],
+                        help=INCREMENTAL_PARAM_ARGPARSE[2], required=False, action=STORE_TRUE_ARGPARSE,
+                        default=INCREMENTAL_SCAN_DEFAULT)
+    parser.add_argument(INCLUDE_PATHS_PARAM_ARGPARSE[0], INCLUDE_PATHS_PARAM_ARGPARSE[1],
+                        help=INCLUDE_PATHS_PARAM_ARGPARSE[2], type=str, required=False, default=INCLUDE_PATHS_DEFAULT)
+    parser.add_argument(EXCLUDE_PATHS_PARAM_ARGPARSE[0], EXCLUDE_PATHS_PARAM_ARGPARSE[1],
+                        help=EXCLUDE_PATHS_PARAM_ARGPARSE[2], type=str, required=False, default=EXCLUDE_PATHS_DEFAULT)
+    parser.add_argument(MAX_DIFF_SIZE_PARAM_ARGPARSE[0], MAX_DIFF_SIZE_PARAM_ARGPARSE[1],
+                        help=MAX_DIFF_SIZE_PARAM_ARGPARSE[2], type=int, required=False,
+                        default=MAX_DIFF_SIZE_KB_DEFAULT)
+    parser.add_argument(ENGINE_PARAM_ARGPARSE[0], ENGINE_PARAM_ARGPARSE[1],
+                        help=ENGINE_PARAM_ARGPARSE[2], type=str, required=False, default=SCAN_ENGINE_DEFAULT,
+                        choices=SCAN_ENGINES)
+    parser.add_argument(DELTA_PARAM_ARGPARSE[0], DELTA_PARAM_ARGPARSE[1],
+                        help=DELTA_PARAM_ARGPARSE[2], required=False, action=STORE_TRUE_ARGPARSE, default=False)
+    parser.add_argument(RESUME_PARAM_ARGPARSE[0], RESUME_PARAM_ARGPARSE[1],
+                        help=RESUME_PARAM_ARGPARSE[2], type=str, required=False, default='')
+    parser.add_argument(COORDINATOR_PARAM_ARGPARSE[0], COORDINATOR_PARAM_ARGPARSE[1],
+                        help=COORDINATOR_PARAM_ARGPARSE[2], type=str, required=False, default='')
+    parser.add_argument(WORKER_PARAM_ARGPARSE[0], WORKER_PARAM_ARGPARSE[1],
+                        help=WORKER_PARAM_ARGPARSE[2], type=str, required=False, default='')
     parser.add_argument(VERBOSE_PARAM_ARGPARSE[0], VERBOSE_PARAM_ARGPARSE[1],
                         help=VERBOSE_PARAM_ARGPARSE[2], required=False, action=STORE_TRUE_ARGPARSE, default=False)
 
     args = parser.parse_args()
 
     local_instance = GitlabInstance(username=args.username, private_token=args.key, instance=args.instance,
-                                    mode=args.mode, threads_count=args.threads, verify_ssl=args.ssl_verify,
+                                    mode=args.mode, threads_count=args.threads, max_requests=args.max_requests,
+                                    scan_workers_count=args.scan_workers, verify_ssl=args.ssl_verify,
                                     save_projects=args.export_projects, verbose=args.verbose,
-                                    patterns_path=args.patterns, output=OUTPUT_FOLDER_PATH_DEFAULT)
+                                    patterns_path=args.patterns, output=OUTPUT_FOLDER_PATH_DEFAULT,
+                                    incremental=args.incremental, include_paths=args.include_paths,
+                                    exclude_paths=args.exclude_paths, max_diff_size_kb=args.max_diff_size,
+                                    scan_engine=args.engine, resume=args.resume,
+                                    delta=args.delta, coordinator=args.coordinator, worker=args.worker)
     local_instance.caller()
 
 
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import bisect
+import contextlib
+from constants import *
+
+
+def labels_key(labels: dict):
+    # The labels of a metric, in a hashable (and picklable) form.
+    return tuple(sorted(labels.items()))
+
+
+def metric_key(name: str, **labels):
+    # The key of a metric in the dictionaries of 'Metrics'. Hot paths compute it once and update the dictionaries
+    # directly.
+    return name, labels_key(labels)
+
+
+def format_labels(key: tuple, extra: tuple = ()):
+    """
+    This function formats the labels of a metric as prometheus does (e.g. '{status="200"}').
+    :param key: Tuple. The labels of the metric, as returned by 'labels_key'.
+    :param extra: Tuple. More (name, value) labels to add (e.g. the upper bound of a histogram bucket).
+    :return: String. The formatted labels. Empty if there are no labels.
+    """
+
+    labels = ['{0}="{1}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+              for name, value in key + extra]
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def format_bound(bound: float):
+    # Json has no infinity, so the last bucket is named like in prometheus.
+    return '+Inf' if bound == float('inf') else bound
+
+
+class Histogram:
+    def __init__(self):
+        """
+        Initialization method for the 'Histogram' class.
+        The histogram counts observations in the fixed buckets of 'METRICS_HISTOGRAM_BUCKETS', so observing a value and
+        merging histograms of different processes take a constant time.
+        """
+
+        # The last bucket counts the observations above the largest bound.
+        self.buckets: list[int] = [0] * (len(METRICS_HISTOGRAM_BUCKETS) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(METRICS_HISTOGRAM_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for index, count in enumerate(other.buckets):
+            self.buckets[index] += count
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q: float):
+        """
+        This function estimates a quantile of the observations, as the upper bound of the bucket it falls in.
+        :param q: Float. The quantile (e.g. 0.5 for the median).
+        :return: Float. The estimate, or None if there are no observations (inf if it is above the largest bound).
+        """
+
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(METRICS_HISTOGRAM_BUCKETS + (float('inf'),), self.buckets):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    def __init__(self):
+        """
+        Initialization method for the 'Metrics' class.
+        The class holds the counters, the gauges and the timing histograms of a process. Updating them is a dictionary
+        lookup and an addition, so they are always collected. The scanning processes send theirs to the main process
+        (see 'take'), which merges them into its own and writes them to the stats files of the run.
+        """
+
+        self.counters: dict[tuple, float] = {}
+        self.gauges: dict[tuple, float] = {}
+        self.histograms: dict[tuple, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, labels_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        self.gauges[(name, labels_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, labels_key(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        """
+        This function measures the time of a block of code (used with 'with') into a histogram.
+        :param name: String. The name of the histogram.
+        :param labels: The labels of the histogram.
+        :return: None
+        """
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time, **labels)
+
+    def counter_value(self, name: str, **labels):
+        return self.counters.get((name, labels_key(labels)), 0)
+
+    def counters_total(self, name: str):
+        # The sum of a counter over all of its labels.
+        return sum(value for (counter_name, _), value in self.counters.items() if counter_name == name)
+
+    def take(self):
+        """
+        This function returns the metrics that were collected so far and starts collecting from zero. The scanning
+        processes send the result to the main process with every scanned project.
+        :return: Metrics. The collected metrics.
+        """
+
+        taken = Metrics()
+        taken.counters, self.counters = self.counters, {}
+        taken.gauges, self.gauges = self.gauges, {}
+        taken.histograms, self.histograms = self.histograms, {}
+        return taken
+
+    def merge(self, other):
+        """
+        This function adds the metrics of another process to the current ones.
+        :param other: Metrics. The metrics to add. Their gauges are ignored, since they describe the other process.
+        :return: None
+        """
+
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, histogram in other.histograms.items():
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].merge(histogram)
+
+    def to_json(self):
+        """
+        This function converts the metrics to a json serializable dictionary.
+        :return: Dictionary. Every metric name is mapped to a list of its labels and values.
+        """
+
+        data = {}
+        for (name, key), value in sorted(self.counters.items()) + sorted(self.gauges.items()):
+            data.setdefault(name, []).append({'labels': dict(key), 'value': value})
+        for (name, key), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            data.setdefault(name, []).append({
+                'labels': dict(key), 'count': histogram.count, 'sum': histogram.sum,
+                'p50': format_bound(histogram.quantile(0.5)), 'p99': format_bound(histogram.quantile(0.99)),
+                'buckets': dict(zip([str(bound) for bound in METRICS_HISTOGRAM_BUCKETS] + ['+Inf'],
+                                    histogram.buckets))})
+        return data
+
+    def to_prometheus(self):
+        """
+        This function formats the metrics in the prometheus text format (e.g. for the textfile collector of the node
+        exporter).
+        :return: String. The formatted metrics.
+        """
+
+        lines = []
+        for metric_type, values in (('counter', self.counters), ('gauge', self.gauges)):
+            last_name = None
+            for (name, key), value in sorted(values.items()):
+                if name != last_name:
+                    lines.append('# TYPE {0}{1} {2}'.format(METRICS_PREFIX, name, metric_type))
+                    last_name = name
+                lines.append('{0}{1}{2} {3}'.format(METRICS_PREFIX, name, format_labels(key), value))
+
+        last_name = None
+        for (name, key), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            if name != last_name:
+                lines.append('# TYPE {0}{1} histogram'.format(METRICS_PREFIX, name))
+                last_name = name
+            # The buckets of prometheus are cumulative.
+            cumulative = 0
+            for bound, count in zip([str(bound) for bound in METRICS_HISTOGRAM_BUCKETS] + ['+Inf'], histogram.buckets):
+                cumulative += count
+                lines.append('{0}{1}_bucket{2} {3}'.format(METRICS_PREFIX, name, format_labels(key, (('le', bound),)),
+                                                           cumulative))
+            lines.append('{0}{1}_sum{2} {3}'.format(METRICS_PREFIX, name, format_labels(key), histogram.sum))
+            lines.append('{0}{1}_count{2} {3}'.format(METRICS_PREFIX, name, format_labels(key), histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """
+        This function formats the main metrics of the run for people.
+        :return: String. The summary.
+        """
+
+        lines = ['Projects: {0} enumerated, {1} scanned, {2} not scanned (empty, archived or inactive), {3} failed to '
+                 'scan'.format(int(self.counters_total(METRIC_PROJECTS_ENUMERATED)),
+                               int(self.counters_total(METRIC_PROJECTS_SCANNED)),
+                               int(self.counters_total(METRIC_PROJECTS_SKIPPED)),
+                               int(self.counters_total(METRIC_PROJECTS_SCAN_FAILED))),
+                 'Findings: {0} code secrets, {1} CICD variables'.format(
+                     int(self.counters_total(METRIC_CODE_SECRETS)), int(self.counters_total(METRIC_CICD_VARIABLES))),
+                 'API: {0} requests, {1} throttled, {2} retried'.format(
+                     int(self.counters_total(METRIC_API_REQUESTS)), int(self.counters_total(METRIC_API_THROTTLED)),
+                     int(self.counters_total(METRIC_API_RETRIES))),
+                 'Scanned: {0:.1f} MB in {1} diffs and {2} blobs, {3:.1f} MB cloned'.format(
+                     self.counters_total(METRIC_SCANNED_BYTES) / BYTES_IN_MB,
+                     int(self.counters_total(METRIC_SCANNED_DIFFS)), int(self.counters_total(METRIC_SCANNED_BLOBS)),
+                     self.counters_total(METRIC_CLONE_BYTES) / BYTES_IN_MB),
+                 'Skipped: {0:.1f} MB binary, {1:.1f} MB over the size cap'.format(
+                     self.counter_value(METRIC_SKIPPED_BYTES, reason=SKIP_REASON_BINARY) / BYTES_IN_MB,
+                     self.counter_value(METRIC_SKIPPED_BYTES, reason=SKIP_REASON_SIZE) / BYTES_IN_MB)]
+
+        # Where the time went. The times of the scanning processes overlap, so they add up to more than the run.
+        lines.append('Time:')
+        for name in (METRIC_API_REQUEST_SECONDS, METRIC_CLONE_SECONDS, METRIC_FETCH_SECONDS,
+                     METRIC_GIT_LOG_PARSE_SECONDS, METRIC_BLOB_READ_SECONDS, METRIC_API_DIFFS_SECONDS,
+                     METRIC_PROJECT_SCAN_SECONDS, METRIC_PARTITION_SCAN_SECONDS):
+            histograms = [histogram for (histogram_name, _), histogram in self.histograms.items()
+                          if histogram_name == name]
+            if histograms:
+                total = Histogram()
+                for histogram in histograms:
+                    total.merge(histogram)
+                lines.append('\t{0}: {1:.1f} s in total, {2} times, p50 <= {3} s, p99 <= {4} s'.format(
+                    name, total.sum, total.count, total.quantile(0.5), total.quantile(0.99)))
+        lines.append('\t{0}: {1:.1f} s in total'.format(METRIC_PATTERN_MATCH_SECONDS,
+                                                        self.counters_total(METRIC_PATTERN_MATCH_SECONDS)))
+
+        # The patterns that took the most time to match.
+        pattern_times = sorted(((value, dict(key)[METRIC_LABEL_PATTERN]) for (name, key), value in self.counters.items()
+                                if name == METRIC_PATTERN_MATCH_SECONDS), reverse=True)[:METRICS_SUMMARY_TOP_PATTERNS]
+        if pattern_times:
+            lines.append('Slowest patterns:')
+            for seconds, pattern in pattern_times:
+                lines.append('\t{0:.3f} s, {1} evaluations, {2} hits: {3}'.format(
+                    seconds, int(self.counter_value(METRIC_PATTERN_EVALUATIONS, pattern=pattern)),
+                    int(self.counter_value(METRIC_PATTERN_HITS, pattern=pattern)), pattern))
+        return '\n'.join(lines) + '\n'
+
+
+def write_file_atomically(path: str, content: str):
+    """
+    This function replaces the content of a file at once, so readers (e.g. a prometheus collector) never see a half
+    written file.
+    :param path: String. The path of the file.
+    :param content: String. The new content.
+    :return: None
+    """
+
+    temp_path = path + TEMP_FILE_SUFFIX
+    with open(temp_path, MODE_WRITE, encoding=UTF_8_ENCODING) as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+
+def write_stats_files(output_path: str, stats: Metrics):
+    """
+    This function writes the metrics of the run to the stats files in its output directory.
+    :param output_path: String. The output directory of the run.
+    :param stats: Metrics. The metrics.
+    :return: None
+    """
+
+    write_file_atomically(os.path.join(output_path, STATS_FILE_NAME_DEFAULT), json.dumps(stats.to_json(), indent=4))
+    write_file_atomically(os.path.join(output_path, METRICS_FILE_NAME_DEFAULT), stats.to_prometheus())
+
+
+# The metrics of the current process.
+metrics: Metrics = Metrics()
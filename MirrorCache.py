@@ -0,0 +1,153 @@
+import os
+import time
+import shutil
+from Project import *
+
+
+def get_directory_size(path: str):
+    """
+    This function calculates the total size of the files in a directory.
+    :param path: String. The path of the directory.
+    :return: Integer. The size in bytes.
+    """
+
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for file_name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, file_name))
+            except OSError:
+                # The file was deleted while walking (e.g. git replaced a pack file).
+                pass
+    return size
+
+
+class MirrorCache:
+    def __init__(self, cache_path: str, instance: str, max_size_mb: int, verbose: bool):
+        """
+        Initialization method for the 'MirrorCache' class.
+        The cache keeps a bare clone of every scanned project on disk, keyed by the project id, so later runs only fetch
+        the commits that were pushed since the previous run instead of cloning the whole project again.
+        :param cache_path: String. The directory that contains the cached mirrors.
+        :param instance: String. The URL of the gitlab instance. A cache holds the mirrors of a single instance, since
+        the ids of the projects of different instances collide.
+        :param max_size_mb: Integer. The maximal total size of the cache in MB. The least recently scanned mirrors are
+        evicted when the cache grows above it.
+        :param verbose: Boolean. Indicates if we should print status messages or not.
+        """
+
+        self.cache_path: str = os.path.abspath(cache_path)
+        self.max_size: int = max_size_mb * BYTES_IN_MB
+        self.verbose: bool = verbose
+
+        # The index of the cache: maps the id of every cached project to the time its mirror was last scanned and the
+        # size of the mirror. It is loaded by 'load_index' and kept up to date by 'record_mirror', so evicting does not
+        # need to walk the whole cache.
+        self.mirrors: dict[int, tuple[float, int]] = {}
+        self.total_size: int = 0
+
+        os.makedirs(self.cache_path, exist_ok=True)
+
+        # The first run that uses the cache claims it for its instance.
+        instance_path = os.path.join(self.cache_path, MIRROR_CACHE_INSTANCE_FILE_NAME)
+        if not os.path.isfile(instance_path):
+            with open(instance_path, MODE_WRITE, encoding=UTF_8_ENCODING) as instance_file:
+                instance_file.write(instance)
+        with open(instance_path, encoding=UTF_8_ENCODING) as instance_file:
+            if instance_file.read() != instance:
+                raise MIRROR_CACHE_INSTANCE_MISMATCH_ERROR
+
+    def __getstate__(self):
+        # The scanning processes only update mirrors, so the index of the cache is not sent to them with every project.
+        state = self.__dict__.copy()
+        state['mirrors'] = {}
+        return state
+
+    def load_index(self):
+        """
+        This function builds the index of the cache out of the mirrors that are on the disk.
+        :return: None
+        """
+
+        self.mirrors.clear()
+        for name in os.listdir(self.cache_path):
+            mirror_path = os.path.join(self.cache_path, name)
+            proj_id = name[:-len(MIRROR_DIRECTORY_NAME_FORMAT.format(''))]
+            if not os.path.isdir(mirror_path) or not proj_id.isdigit():
+                continue
+            self.mirrors[int(proj_id)] = (os.path.getmtime(mirror_path), get_directory_size(mirror_path))
+        self.total_size = sum(size for last_scanned, size in self.mirrors.values())
+
+    def record_mirror(self, proj_id: int, size: int):
+        """
+        This function updates the index of the cache after the mirror of a project was scanned.
+        :param proj_id: Integer. The id of the project.
+        :param size: Integer. The size of the mirror in bytes.
+        :return: None
+        """
+
+        if proj_id in self.mirrors:
+            self.total_size -= self.mirrors[proj_id][1]
+        self.mirrors[proj_id] = (time.time(), size)
+        self.total_size += size
+
+    def get_mirror_path(self, proj_id: int):
+        """
+        This function returns the path of the cached mirror of a project.
+        :param proj_id: Integer. The id of the project.
+        :return: String. The path of the mirror.
+        """
+
+        return os.path.join(self.cache_path, MIRROR_DIRECTORY_NAME_FORMAT.format(proj_id))
+
+    def update_mirror(self, project: Project, username: str, private_token: str):
+        """
+        This function brings the cached mirror of a project up to date. If the project is not cached yet, or its mirror
+        can not be fetched into, it is cloned again.
+        The mirror is marked as the most recently scanned one.
+        :param project: Project. The project to update the mirror of.
+        :param username: String. The username to clone with.
+        :param private_token: String. The private token of the user.
+        :return: String. The path of the updated mirror, or None if the project could not be cloned.
+        """
+
+        mirror_path = self.get_mirror_path(project.proj_id)
+
+        updated = False
+        if os.path.isdir(mirror_path):
+            updated = project.fetch_project(username, private_token, mirror_path)
+            if not updated:
+                shutil.rmtree(mirror_path, onerror=on_error_deleting_clone_path)
+        if not updated:
+            updated = project.clone_project(username, private_token, mirror_path, bare=True)
+
+        if not updated:
+            return None
+
+        # The modification time of the mirror directory is the time it was last scanned.
+        os.utime(mirror_path)
+        return mirror_path
+
+    def evict(self, in_use_ids: set = frozenset()):
+        """
+        This function deletes the least recently scanned mirrors until the total size of the cache is below its limit.
+        :param in_use_ids: Set<Integer>. The ids of the projects that are being scanned right now. Their mirrors are
+        never evicted.
+        :return: None
+        """
+
+        if self.total_size <= self.max_size:
+            return
+
+        # Evict the least recently scanned mirrors first.
+        for proj_id, (last_scanned, size) in sorted(self.mirrors.items(), key=lambda mirror: mirror[1]):
+            if self.total_size <= self.max_size:
+                break
+            if proj_id in in_use_ids:
+                continue
+            verbose_print(EVICT_MIRROR_VERBOSE.format(proj_id, size // BYTES_IN_MB), self.verbose)
+            mirror_path = self.get_mirror_path(proj_id)
+            if os.path.isdir(mirror_path):
+                shutil.rmtree(mirror_path, onerror=on_error_deleting_clone_path)
+            del self.mirrors[proj_id]
+            self.total_size -= size
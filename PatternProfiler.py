@@ -0,0 +1,275 @@
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import subprocess
+import multiprocessing
+from PatternSet import *
+from DiffParser import DiffFilters, iter_added_content
+
+
+def build_adversarial_inputs(keyword: str, size: int):
+    """
+    This function builds inputs that make badly written regexes backtrack: long runs of the characters that the rules
+    accept around their keywords, with nothing that completes a match.
+    :param keyword: String. A keyword of the rule, so the input passes the keywords prefilter like real content would.
+    :param size: Integer. The length of every input.
+    :return: Dictionary. The inputs, by their names.
+    """
+
+    def repeat(text: str):
+        return (text * (size // max(1, len(text)) + 1))[:size]
+
+    rng = random.Random(size)
+    minified = ''.join(rng.choice(PROFILER_MINIFIED_TOKENS) for _ in range(size // 4))[:size]
+    return {
+        'repeated-keyword': repeat(keyword + ' '),
+        'keyword-spaces': keyword + repeat(' \t'),
+        'keyword-filler': keyword + repeat('a-_. 0'),
+        'keyword-quotes': keyword + repeat(' \'"|'),
+        'keyword-assignments': repeat(keyword + ' = '),
+        'keyword-letters': keyword + repeat('a'),
+        'keyword-token': keyword + '=' + repeat('a1B2'),
+        'minified-line': minified,
+        'spaces': repeat(' '),
+    }
+
+
+def read_repository_corpus(repository_path: str, max_bytes: int):
+    """
+    This function reads the content that the commits of a repository added, like 'inspect_code' does.
+    :param repository_path: String. The path of the repository.
+    :param max_bytes: Integer. The maximal number of bytes to read.
+    :return: List<String>. The added content of every diff.
+    """
+
+    corpus = []
+    corpus_size = 0
+    r = subprocess.Popen(DiffFilters().git_command(GIT_GET_ALL_PROJECT_HISTORY), stdin=subprocess.DEVNULL,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, shell=False, cwd=repository_path)
+    with r.stdout:
+        for commit_hash, file_path, added_content in iter_added_content(r.stdout):
+            corpus.append(added_content)
+            corpus_size += len(added_content)
+            if corpus_size >= max_bytes:
+                break
+    r.kill()
+    r.wait()
+    return corpus
+
+
+def time_findall(compiled: re.Pattern, texts: list[str]):
+    # The best of a few repetitions, so the noise of the machine does not look like backtracking.
+    best = None
+    for _ in range(PROFILER_REPETITIONS):
+        start_time = time.perf_counter()
+        for text in texts:
+            compiled.findall(text)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def profile_rule(rule: PatternRule, corpus: list[str], connection):
+    """
+    This function measures how the time of matching a rule grows with the size of the adversarial inputs, and how
+    long it takes to match it against the corpus. It runs in its own process, so a rule that backtracks forever can be
+    stopped.
+    :param rule: PatternRule. The rule to profile.
+    :param corpus: List<String>. The sample content (may be empty).
+    :param connection: multiprocessing.connection.Connection. The results are sent through it, one at a time, so the
+    results that were measured before a timeout are not lost. The input that is about to be matched is sent first,
+    without a time.
+    :return: None
+    """
+
+    keyword = min(rule.keywords, key=len) if rule.keywords else PROFILER_DEFAULT_KEYWORD
+    for size in PROFILER_INPUT_SIZES:
+        for input_name, text in build_adversarial_inputs(keyword, size).items():
+            # Tell which input is being matched, in case the rule never finishes matching it.
+            connection.send((input_name, size, None))
+            connection.send((input_name, size, time_findall(rule.compiled, [text])))
+    if corpus:
+        connection.send((PROFILER_CORPUS_INPUT_NAME, sum(map(len, corpus)), None))
+        connection.send((PROFILER_CORPUS_INPUT_NAME, sum(map(len, corpus)), time_findall(rule.compiled, corpus)))
+    connection.close()
+
+
+class RuleProfile:
+    def __init__(self, rule: PatternRule):
+        """
+        Initialization method for the 'RuleProfile' class.
+        :param rule: PatternRule. The profiled rule.
+        """
+
+        self.rule: PatternRule = rule
+        # The seconds it took to match the rule, by the name and the size of the input.
+        self.timings: dict[str, dict[int, float]] = {}
+        self.corpus_seconds: float = None
+        self.corpus_bytes: int = 0
+        self.timed_out: bool = False
+        # The name and the size of the input that the rule is being matched against.
+        self.current_input: tuple = ('-', 0)
+
+    def add_timing(self, input_name: str, size: int, seconds: float):
+        if seconds is None:
+            self.current_input = (input_name, size)
+        elif input_name == PROFILER_CORPUS_INPUT_NAME:
+            self.corpus_bytes, self.corpus_seconds = size, seconds
+        else:
+            self.timings.setdefault(input_name, {})[size] = seconds
+
+    def growth(self, input_name: str):
+        """
+        This function estimates how the time of matching the rule grows with the size of an input, as the exponent 'k'
+        in 'time ~ size ** k' between the smallest and the largest sizes (1 is linear, 2 is quadratic).
+        :param input_name: String. The name of the input.
+        :return: Float. The exponent, or None if it could not be measured.
+        """
+
+        timings = self.timings.get(input_name, {})
+        sizes = sorted(timings)
+        if len(sizes) < 2:
+            return None
+        small, large = sizes[0], sizes[-1]
+        # Timings below the resolution of the clock say nothing about the growth.
+        small_seconds = max(timings[small], PROFILER_MIN_MEASURABLE_SECONDS)
+        large_seconds = max(timings[large], PROFILER_MIN_MEASURABLE_SECONDS)
+        return math.log(large_seconds / small_seconds) / math.log(large / small)
+
+    @property
+    def worst_input(self):
+        # The input that took the longest to match at the largest size.
+        largest = max(PROFILER_INPUT_SIZES)
+        return max(self.timings, key=lambda input_name: self.timings[input_name].get(largest, 0), default=None)
+
+    @property
+    def worst_seconds(self):
+        largest = max(PROFILER_INPUT_SIZES)
+        return max((timings.get(largest, 0) for timings in self.timings.values()), default=0)
+
+    @property
+    def super_linear_inputs(self):
+        # The inputs whose matching time grows faster than the input, and is long enough to matter.
+        return [input_name for input_name, timings in self.timings.items()
+                if (self.growth(input_name) or 0) > PROFILER_SUPER_LINEAR_EXPONENT and
+                max(timings.values()) > PROFILER_MIN_FLAGGED_SECONDS]
+
+    @property
+    def flagged(self):
+        return self.timed_out or bool(self.super_linear_inputs)
+
+
+def profile_patterns(patterns: PatternSet, corpus: list[str], timeout_seconds: float):
+    """
+    This function profiles all the rules of a pattern set, one after the other, so they do not compete for the CPU.
+    :param patterns: PatternSet. The rules to profile.
+    :param corpus: List<String>. The sample content (may be empty).
+    :param timeout_seconds: Float. The time after which the profiling of a rule is stopped and the rule is flagged.
+    :return: List<RuleProfile>. The profiles of the rules.
+    """
+
+    # Forking is the fastest way to start a process per rule, and the corpus is not copied to it.
+    mp_context = multiprocessing.get_context(MULTIPROCESSING_FORK) \
+        if MULTIPROCESSING_FORK in multiprocessing.get_all_start_methods() else multiprocessing.get_context()
+
+    profiles = []
+    for rule in patterns.rules.values():
+        profile = RuleProfile(rule)
+        receiver, sender = mp_context.Pipe(duplex=False)
+        process = mp_context.Process(target=profile_rule, args=(rule, corpus, sender), daemon=True)
+        process.start()
+        sender.close()
+
+        deadline = time.monotonic() + timeout_seconds
+        while True:
+            if not receiver.poll(max(0.0, deadline - time.monotonic())):
+                profile.timed_out = time.monotonic() >= deadline
+                break
+            try:
+                profile.add_timing(*receiver.recv())
+            except EOFError:
+                break
+
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+        profiles.append(profile)
+    return profiles
+
+
+def format_profiles(profiles: list[RuleProfile], top: int):
+    """
+    This function formats the results of the profiling.
+    :param profiles: List<RuleProfile>. The profiles of the rules.
+    :param top: Integer. The number of the slowest rules to show.
+    :return: String. The report.
+    """
+
+    lines = [PROFILER_SLOWEST_RULES_TITLE.format(top, max(PROFILER_INPUT_SIZES))]
+    slowest = sorted(profiles, key=lambda profile: (profile.timed_out, profile.worst_seconds), reverse=True)[:top]
+    for profile in slowest:
+        corpus_speed = '{0:.1f}'.format(profile.corpus_bytes / BYTES_IN_MB / profile.corpus_seconds) \
+            if profile.corpus_seconds else '-'
+        worst_input = profile.current_input[0] if profile.timed_out else profile.worst_input or '-'
+        lines.append(PROFILER_RULE_LINE_FORMAT.format(
+            PROFILER_TIMEOUT_SECONDS_TEXT if profile.timed_out else '{0:.4f}'.format(profile.worst_seconds),
+            worst_input, corpus_speed, profile.rule.category, profile.rule.sub_category))
+
+    flagged = [profile for profile in profiles if profile.flagged]
+    lines.append('')
+    if not flagged:
+        lines.append(PROFILER_NO_FLAGGED_RULES)
+    else:
+        lines.append(PROFILER_FLAGGED_RULES_TITLE.format(len(flagged)))
+        for profile in flagged:
+            lines.append(PROFILER_FLAGGED_RULE_FORMAT.format(profile.rule.category, profile.rule.sub_category,
+                                                             profile.rule.regex))
+            if profile.timed_out:
+                lines.append(PROFILER_TIMED_OUT_FORMAT.format(*profile.current_input))
+            for input_name in profile.super_linear_inputs:
+                timings = profile.timings[input_name]
+                lines.append(PROFILER_GROWTH_FORMAT.format(
+                    input_name, profile.growth(input_name),
+                    ', '.join('{0}: {1:.4f} s'.format(size, seconds) for size, seconds in sorted(timings.items()))))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=PROFILER_DESCRIPTION_ARGPARSE)
+    parser.add_argument(PATTERNS_PARAM_ARGPARSE[0], PATTERNS_PARAM_ARGPARSE[1],
+                        help=PATTERNS_PARAM_ARGPARSE[2], type=str, required=False, default=PATTERNS_PATH_DEFAULT)
+    parser.add_argument(PROFILER_REPOSITORY_PARAM_ARGPARSE[0], PROFILER_REPOSITORY_PARAM_ARGPARSE[1],
+                        help=PROFILER_REPOSITORY_PARAM_ARGPARSE[2], type=str, required=False, default=None)
+    parser.add_argument(PROFILER_TOP_PARAM_ARGPARSE[0], PROFILER_TOP_PARAM_ARGPARSE[1],
+                        help=PROFILER_TOP_PARAM_ARGPARSE[2], type=int, required=False, default=PROFILER_TOP_DEFAULT)
+    parser.add_argument(PROFILER_TIMEOUT_PARAM_ARGPARSE[0], PROFILER_TIMEOUT_PARAM_ARGPARSE[1],
+                        help=PROFILER_TIMEOUT_PARAM_ARGPARSE[2], type=float, required=False,
+                        default=PROFILER_RULE_TIMEOUT_SECONDS_DEFAULT)
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.patterns):
+        raise PATTERNS_FILE_NOT_FOUND_ERROR
+
+    # The patterns are loaded exactly like they are loaded for a scan, so the same rules are profiled.
+    patterns = PatternSet()
+    patterns.load_toml(args.patterns)
+
+    corpus = []
+    if args.repository:
+        corpus = read_repository_corpus(args.repository, PROFILER_CORPUS_MAX_MB * BYTES_IN_MB)
+        print(PROFILER_CORPUS_LOADED.format(len(corpus), sum(map(len, corpus)) / BYTES_IN_MB, args.repository))
+
+    print(PROFILER_START.format(len(patterns), args.patterns))
+    profiles = profile_patterns(patterns, corpus, args.timeout)
+    print(format_profiles(profiles, args.top))
+
+    # A non-zero exit code fails the checks of a custom rule pack before it is deployed.
+    sys.exit(1 if any(profile.flagged for profile in profiles) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+import re
+import time
+import tomli
+from constants import *
+from Metrics import metrics, metric_key
+
+try:
+    # Python 3.11 and above.
+    import re._parser as sre_parse
+    from re._constants import LITERAL, SUBPATTERN, BRANCH, MAX_REPEAT, MIN_REPEAT
+except ImportError:
+    import sre_parse
+    from sre_constants import LITERAL, SUBPATTERN, BRANCH, MAX_REPEAT, MIN_REPEAT
+
+
+def best_keywords(candidates: list[set]):
+    """
+    This function picks the most selective set of keywords out of a list of candidate sets. A set is as selective as
+    its shortest keyword, so the set with the longest shortest keyword wins (and the smaller set wins a tie).
+    :param candidates: List<Set>. Sets of keywords. At least one keyword of every set must be present in any match.
+    :return: Set. The most selective set, or None if there are no candidates.
+    """
+
+    best = None
+    for candidate in candidates:
+        if not candidate:
+            continue
+        if best is None or (min(map(len, candidate)), -len(candidate)) > (min(map(len, best)), -len(best)):
+            best = candidate
+    return best
+
+
+def leading_literal(parsed):
+    """
+    This function returns the literal characters that a parsed regex starts with.
+    :param parsed: The output of 'sre_parse.parse' (or one of its sub patterns).
+    :return: String. The leading literal. Empty if the regex does not start with a literal.
+    """
+
+    literal = ''
+    for op, value in parsed:
+        if op != LITERAL:
+            break
+        literal += chr(value)
+    return literal
+
+
+def extract_required_keywords(parsed):
+    """
+    This function walks a parsed regex and finds a set of literals such that every string matched by the regex
+    contains at least one of them. For example, '(?:atlassian|confluence|jira)[a-z]{4}' gives
+    {'atlassian', 'confluence', 'jira'}.
+    :param parsed: The output of 'sre_parse.parse' (or one of its sub patterns).
+    :return: Set. The lower-cased required literals, or None if no literal is required.
+    """
+
+    candidates = []
+    run = ''
+    for op, value in parsed:
+        if op == LITERAL:
+            run += chr(value)
+            continue
+
+        # Anything that is not a literal ends the current run of literal characters.
+        prefix = run
+        if run:
+            candidates.append({run.lower()})
+            run = ''
+
+        if op == SUBPATTERN:
+            candidates.append(extract_required_keywords(value[-1]))
+        elif op == BRANCH:
+            # Every branch must contribute keywords, otherwise a match may contain none of them.
+            branches = [extract_required_keywords(branch) for branch in value[1]]
+            if all(branches):
+                candidates.append(set().union(*branches))
+            # The regex parser moves the common prefix of the branches out of them (e.g. 'AKIA|ASIA' becomes
+            # 'A(?:KIA|SIA)'), so glue it back to the leading literal of every branch.
+            leading = [leading_literal(branch) for branch in value[1]]
+            if prefix and all(leading):
+                candidates.append({(prefix + literal).lower() for literal in leading})
+        elif op in (MAX_REPEAT, MIN_REPEAT) and value[0] >= 1:
+            candidates.append(extract_required_keywords(value[2]))
+    if run:
+        candidates.append({run.lower()})
+
+    return best_keywords(candidates)
+
+
+def build_trie_regex(keywords: set):
+    """
+    This function builds a single regex out of a set of keywords, shaped like a trie (e.g. 'ab(?:c|d)' instead of
+    'abc|abd'), so the regex engine checks every position in the text once instead of once per keyword.
+    :param keywords: Set. The keywords to match.
+    :return: String. The regex that matches the longest keyword starting at a given position.
+    """
+
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def node_to_regex(node: dict):
+        alternatives = [re.escape(char) + node_to_regex(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        regex = alternatives[0] if len(alternatives) == 1 else '(?:{0})'.format('|'.join(alternatives))
+        # A keyword ends at this node, so the rest of the path is optional. The '?' is greedy, so longer keywords are
+        # preferred.
+        if '' in node:
+            regex = '(?:{0})?'.format(regex)
+        return regex
+
+    return node_to_regex(trie)
+
+
+class PatternRule:
+    def __init__(self, regex: str, compiled: re.Pattern, category: str, sub_category: str, keywords: set):
+        """
+        Initialization method for the 'PatternRule' class.
+        :param regex: String. The regex of the rule, as written in the patterns file.
+        :param compiled: re.Pattern. The compiled regex.
+        :param category: String. The category of the secret (the toml table name).
+        :param sub_category: String. The description of the secret.
+        :param keywords: Set. Lower-cased literals, one of which must be present for the regex to match. An empty set
+        means that the rule has to be evaluated against every content.
+        """
+
+        self.regex: str = regex
+        self.compiled: re.Pattern = compiled
+        self.category: str = category
+        self.sub_category: str = sub_category
+        self.keywords: set = keywords
+
+        # The keys of the counters of the time it takes to match the rule, and of the number of its evaluations and
+        # hits.
+        label = '{0}: {1}'.format(category, sub_category)
+        self.metric_keys: tuple = tuple(metric_key(name, pattern=label) for name in (
+            METRIC_PATTERN_MATCH_SECONDS, METRIC_PATTERN_EVALUATIONS, METRIC_PATTERN_HITS))
+
+    @property
+    def metadata(self):
+        return [self.category, self.sub_category]
+
+
+class PatternSet:
+    def __init__(self):
+        """
+        Initialization method for the 'PatternSet' class.
+        The class holds all the compiled secrets' regex patterns, and a keywords prefilter that decides which of them
+        are worth evaluating against a given content.
+        """
+
+        # The rules, keyed by their regex in order to avoid scanning the same regex twice.
+        self.rules: dict[str, PatternRule] = {}
+
+        # Rules without keywords. They are evaluated against every content.
+        self.unfiltered_rules: list[PatternRule] = []
+
+        # Maps each keyword to the rules that require it.
+        self.rules_by_keyword: dict[str, list[PatternRule]] = {}
+
+        # Maps each keyword to all the keywords contained in it (including itself). When a keyword is found, all the
+        # keywords that it contains are found too.
+        self.keywords_closure: dict[str, set] = {}
+
+        self.prefilter: re.Pattern = None
+        self.prefilter_built: bool = False
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def add_rule(self, regex: str, category: str, sub_category: str, keywords: list = None):
+        """
+        This function compiles a regex pattern and adds it to the set.
+        :param regex: String. The regex pattern.
+        :param category: String. The category of the secret.
+        :param sub_category: String. The description of the secret.
+        :param keywords: List<String>. Optional keywords for the prefilter. If not specified, the keywords are
+        extracted from the regex itself.
+        :return: None. Raises 're.error' if the regex is invalid.
+        """
+
+        compiled = re.compile(regex)
+
+        if keywords:
+            keywords = {keyword.lower() for keyword in keywords}
+        else:
+            try:
+                keywords = extract_required_keywords(sre_parse.parse(regex)) or set()
+            except (re.error, TypeError, ValueError):
+                keywords = set()
+            # Very short keywords are present in almost every content, so they are not worth the prefilter.
+            if keywords and min(map(len, keywords)) < PATTERNS_MIN_KEYWORD_LENGTH:
+                keywords = set()
+
+        self.rules[regex] = PatternRule(regex=regex, compiled=compiled, category=category,
+                                        sub_category=sub_category, keywords=keywords)
+        self.prefilter_built = False
+
+    def load_toml(self, patterns_path: str):
+        """
+        This function loads all the regex patterns of the secrets from a toml file, and compiles them into the set.
+        Invalid patterns are reported and skipped.
+        :param patterns_path: String. The path to the toml file.
+        :return: None
+        """
+
+        # Load the data of the toml file that contains the regex patterns for the secrets.
+        with open(patterns_path, 'rb') as file:
+            toml_dict = tomli.load(file)
+
+        # Compile the toml into the current pattern set.
+        for category_name, category_value in toml_dict.items():
+            for sub_category in category_value:
+
+                # Make sure that there is a description (sub_category_name) and at least one regex pattern for the
+                # current sub category
+                if PATTERNS_VALUE_SUB_CATEGORY_NAME not in sub_category.keys() or \
+                        PATTERNS_VALUE_REGEX not in sub_category.keys():
+                    print(PATTERNS_INCOMPLETE_PATTERN_IN_TOML_FILE)
+                    continue
+
+                # Get the regex/es of the current sub category
+                regex = sub_category[PATTERNS_VALUE_REGEX]
+                if type(regex) == str:
+                    regex = [regex]
+                elif type(regex) != list:
+                    print(PATTERNS_INVALID_REGEX_IN_TOML_FILE.format(category_name, sub_category))
+                    continue
+
+                # Get the optional keywords of the current sub category. If they are missing, the pattern set extracts
+                # the keywords from the regex itself.
+                keywords = sub_category.get(PATTERNS_VALUE_KEYWORDS)
+                if type(keywords) == str:
+                    keywords = [keywords]
+                if keywords is not None and (type(keywords) != list or
+                                             any(type(keyword) != str or not keyword for keyword in keywords)):
+                    print(PATTERNS_INVALID_KEYWORDS_IN_TOML_FILE.format(category_name, sub_category))
+                    keywords = None
+
+                # Add the pattern/s to the current pattern set, together with the metadata ('category_name',
+                # sub_category[PATTERNS_VALUE_SUB_CATEGORY_NAME]).
+                # If the regex (or one of the regexes we got in a list) is not of type 'str' or can not be compiled,
+                # it's an invalid regex and we should skip it now, instead of failing on it for every scanned diff.
+                for r in regex:
+                    if type(r) != str:
+                        print(PATTERNS_INVALID_REGEX_IN_TOML_FILE.format(category_name, sub_category))
+                        continue
+                    try:
+                        self.add_rule(regex=r, category=category_name,
+                                      sub_category=sub_category[PATTERNS_VALUE_SUB_CATEGORY_NAME], keywords=keywords)
+                    except re.error as e:
+                        print(PATTERNS_UNCOMPILABLE_REGEX_IN_TOML_FILE.format(
+                            r, category_name, sub_category[PATTERNS_VALUE_SUB_CATEGORY_NAME], e))
+
+        # Build the keywords prefilter once, so the scanning only uses it.
+        self.build_prefilter()
+
+        # Delete the loaded toml content. We do not need it anymore because we got the compiled representation of it in
+        # the previous step.
+        del toml_dict
+
+    def build_prefilter(self):
+        """
+        This function builds the keywords prefilter out of the keywords of all the rules in the set.
+        :return: None
+        """
+
+        self.unfiltered_rules = []
+        self.rules_by_keyword = {}
+        for rule in self.rules.values():
+            if not rule.keywords:
+                self.unfiltered_rules.append(rule)
+            for keyword in rule.keywords:
+                self.rules_by_keyword.setdefault(keyword, []).append(rule)
+
+        keywords = self.rules_by_keyword.keys()
+        self.keywords_closure = {keyword: {k for k in keywords if k in keyword} for keyword in keywords}
+
+        # The lookahead lets the prefilter report a keyword at every position, even if it overlaps a keyword that was
+        # found in a previous position.
+        self.prefilter = re.compile('(?=({0}))'.format(build_trie_regex(set(keywords)))) if keywords else None
+        self.prefilter_built = True
+
+    def candidate_rules(self, content: str):
+        """
+        This function runs the keywords prefilter over a content and returns the rules that might match it.
+        :param content: String. The content to check.
+        :return: List<PatternRule>. The candidate rules, in the order they were added to the set.
+        """
+
+        if not self.prefilter_built:
+            self.build_prefilter()
+
+        candidates = set(self.unfiltered_rules)
+        if self.prefilter is not None:
+            found_keywords = set()
+            for keyword in {match.group(1) for match in self.prefilter.finditer(content.lower())}:
+                found_keywords |= self.keywords_closure[keyword]
+            for keyword in found_keywords:
+                candidates.update(self.rules_by_keyword[keyword])
+
+        return [rule for rule in self.rules.values() if rule in candidates]
+
+    def scan(self, content: str):
+        """
+        This function looks for secrets in a content.
+        :param content: String. The content to scan.
+        :return: List<Tuple>. A (rule, times found) tuple for each rule that matched the content.
+        """
+
+        results = []
+        counters = metrics.counters
+        for rule in self.candidate_rules(content):
+            start_time = time.perf_counter()
+            times_found = len(rule.compiled.findall(content))
+            seconds_key, evaluations_key, hits_key = rule.metric_keys
+            counters[seconds_key] = counters.get(seconds_key, 0) + time.perf_counter() - start_time
+            counters[evaluations_key] = counters.get(evaluations_key, 0) + 1
+            if times_found:
+                counters[hits_key] = counters.get(hits_key, 0) + 1
+                results.append((rule, times_found))
+        return results
@@ -1,8 +1,16 @@
+import os
+import stat
+import time
+import shutil
 import subprocess
-import requests
-import json
-import re
+import tempfile
+import asyncio
+import datetime
 from constants import *
+from PatternSet import PatternSet
+from GitlabClient import GitlabClient
+from Metrics import metrics
+from DiffParser import DiffFilters, iter_added_content, iter_api_diff_lines
 
 
 def verbose_print(message: str, verbose: bool):
@@ -18,74 +26,168 @@ def verbose_print(message: str, verbose: bool):
         print(message)
 
 
-def extract_added_content(diff: str):
+def on_error_deleting_clone_path(func, path, exc_info):
     """
-    This function gets commit diff data (which contains added and removed content) and extracts the added content
-    from it.
-    In addition, we also get the file which content was added to, for each time we find added content. This helps us
-    later in documenting where exactly in the commit the secret was found.
-    :param diff: String. A commit diff data.
+    This function is responsible for trying once again to delete a git clone before raising an error
+    :param func:
+    :param path:
+    :param exc_info:
     :return:
     """
+    try:
+        os.chmod(path, stat.S_IWRITE)
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        print('Some permission error. Giving it one more chance after sleeping for five seconds')
+        time.sleep(5)
+        shutil.rmtree(path)
 
-    # Split the diff into lines
-    lines = re.split('\\\\n', diff)
 
-    file_path = 'nulled_file_path'
-    start_line = None
+def parse_api_time(value: str):
+    """
+    This function parses a time that the gitlab api returned (e.g. '2024-01-31T12:00:00.000Z').
+    :param value: String. The time, in the ISO 8601 format. Times without a timezone are in UTC.
+    :return: Float. The time as a unix timestamp, or None if the value is empty.
+    """
+
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
 
-    for i, line in enumerate(lines):
-        if line.startswith('+++ '):
-            file_path = line[6:]
-        if line.startswith("@@"):
-            start_line = i + 1
-            break
+def format_api_time(timestamp: float):
+    """
+    This function formats a time for the gitlab api.
+    :param timestamp: Float. The time as a unix timestamp.
+    :return: String. The time, in the ISO 8601 format, in UTC.
+    """
 
-    added_content = []
-    for line in lines[start_line:]:
-        if line.startswith('+') and not line.startswith('+++'):
-            added_content.append(line[1:])
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime(API_TIME_FORMAT)
 
-    return file_path, '\\n'.join(added_content)
+
+class ProjectContext:
+    def __init__(self, instance: str, verify_ssl: bool, patterns: PatternSet, verbose: bool,
+                 filters: DiffFilters = None):
+        """
+        Initialization method for the 'ProjectContext' class.
+        The context holds everything that all the projects of an instance have in common, so every project only
+        references it instead of holding its own copy.
+        :param instance: String. The url to the gitlab instance in which the projects are in.
+        :param verify_ssl: Boolean. Indicates if we should or should not use ssl when interacting with the gitlab api.
+        :param patterns: PatternSet. Contains all the secrets' compiled regex patterns, and some metadata on each
+        secret.
+        :param verbose: Boolean. Indicates if we should print status messages or not.
+        :param filters: DiffFilters. The filters of the scanned diffs. Only the binary files are skipped by default.
+        """
+
+        self.instance: str = instance
+        self.verify_ssl: bool = verify_ssl
+        self.patterns: PatternSet = patterns
+        self.verbose: bool = verbose
+        self.filters: DiffFilters = filters or DiffFilters()
 
 
 class Project:
-    def __init__(self, proj_name: str, proj_id: int, instance: str, verify_ssl: bool, patterns: dict, verbose: bool):
+    # A project has no '__dict__', so the enumerated projects that are waiting in the queues of the stages stay small.
+    __slots__ = ('proj_name', 'proj_id', 'group_id', 'context', 'code_secrets', 'repository_size', 'last_activity',
+                 'empty_repo', 'archived')
+
+    def __init__(self, proj_name: str, proj_id: int, context: ProjectContext, group_id: int = None,
+                 repository_size: int = None, last_activity: float = None, empty_repo: bool = False,
+                 archived: bool = False):
         """
         Initialization method for the 'Project' class.
         :param proj_name: String. The url of the current gitlab project.
         :param proj_id: Integer. The id of the current project.
-        :param instance: String. The url to the gitlab instance in which this project is in.
-        :param verify_ssl: Boolean. Indicates if we should or should not use ssl when interacting with the gitlab api.
-        :param patterns: Dictionary. Contains all the secrets' regex patterns, and some metadata on each secret.
-        :param verbose: Boolean. Indicates if we should print status messages or not.
+        :param context: ProjectContext. The context that is shared by all the projects of the instance.
+        :param group_id: Integer. The id of the group that the project belongs to, or None if it belongs to a user.
+        :param repository_size: Integer. The size of the repository in bytes, or None if the api did not tell it.
+        :param last_activity: Float. The time of the last activity in the project (a unix timestamp), or None.
+        :param empty_repo: Boolean. Indicates if the repository of the project has no commits.
+        :param archived: Boolean. Indicates if the project is archived.
         """
 
         self.proj_name: str = proj_name
         self.proj_id: int = proj_id
-        self.instance: str = instance
-        self.verify_ssl: bool = verify_ssl
-        self.patterns: dict = patterns
-        self.verbose: bool = verbose
+        self.group_id: int = group_id
+        self.context: ProjectContext = context
+
+        # What the enumeration told about the repository. The scanning stage orders and filters the projects by it.
+        self.repository_size: int = repository_size
+        self.last_activity: float = last_activity
+        self.empty_repo: bool = empty_repo
+        self.archived: bool = archived
 
-        self.cicd_secrets: list[tuple] = []
+        # The secrets that were found in the code of the project. They are handed over to the findings writer as soon
+        # as the project is scanned.
         self.code_secrets: list[list[str, str, str, int]] = []
 
-    def get_cicd_variables(self, private_token):
+    @property
+    def instance(self):
+        return self.context.instance
+
+    @property
+    def verify_ssl(self):
+        return self.context.verify_ssl
+
+    @property
+    def patterns(self):
+        return self.context.patterns
+
+    @property
+    def verbose(self):
+        return self.context.verbose
+
+    @property
+    def filters(self):
+        return self.context.filters
+
+    async def get_cicd_variables(self, client: GitlabClient):
+        """
+        This function gets the cicd variables for the current Project instace, from all the pages of the variables api.
+        :param client: GitlabClient. The client to send the requests with.
+        :return: List<Tuple>. A (name, value) tuple for every variable, or None if they could not be retrieved.
+        """
+
+        # Get the cicd variables through gitlab apis. Users without the maintainer role can not list them, so the
+        # project simply has none for them.
+        variables = await client.get_all_pages(VARIABLES_API_URL_FORMAT, self.instance, self.proj_id, denied_ok=True)
+        if variables is None:
+            return None
+        return [(secret['key'], secret['value']) for secret in variables]
+
+    def scan_added_content(self, commit_hash: str, file_path: str, added_content: str):
         """
-        This function gets the cicd variables for the current Project instace.
-        :return:
+        This function looks for secrets in the content that a commit added to a file.
+        :param commit_hash: String. The hash of the commit.
+        :param file_path: String. The path of the file.
+        :param added_content: String. The added content.
+        :return: None
         """
 
-        # Get the cicd variables through gitlab apis
-        r = requests.get(VARIABLES_API_URL_FORMAT.format(self.instance, self.proj_id, private_token),
-                         verify=self.verify_ssl)
-        if r.status_code == 200 and r.content != b'[]':
-            json_cicd_secrets = json.loads(r.content.decode(UTF_8_ENCODING))
-            for secret in json_cicd_secrets:
-                self.cicd_secrets.append((secret['key'], secret['value']))
+        # Diffs from the api are not limited by git, so their size is checked here.
+        if not self.filters.allows_size(len(added_content)):
+            metrics.inc(METRIC_SKIPPED_DIFFS, reason=SKIP_REASON_SIZE)
+            metrics.inc(METRIC_SKIPPED_BYTES, len(added_content), reason=SKIP_REASON_SIZE)
+            return
+
+        metrics.inc(METRIC_SCANNED_DIFFS)
+        metrics.inc(METRIC_SCANNED_BYTES, len(added_content))
 
-    def inspect_code(self):
+        # Only the patterns whose keywords are present in the added content are evaluated.
+        for rule, times_found in self.patterns.scan(added_content):
+            # If secrets were found, add the info about them to the 'self.code_secrets' list of the current instance.
+            location = CODE_SECRET_LOCATION_FORMAT.format(self.proj_name,
+                                                          TREE_PATH_FORMAT.format(commit_hash, file_path))
+            secret_row = rule.metadata + [location, times_found]
+            self.code_secrets.append(secret_row)
+
+    def inspect_code(self, clone_path: str, scanned_tips: list[str] = (), commits: list[str] = None):
         """
         This function enumerates all the commits for each project.
         For each commit, the function will get all the data that was added and look for the presence of secrets in it.
@@ -93,84 +195,406 @@ class Project:
         and is not changed in later commits, it will NOT show up in the results of the later commits.
         This makes our code to miss duplications, but we don't need to get the same secret twice - we just want to find
         all the secrets as fast as possible.
-        :return:
+        :param clone_path: String. The path of the clone of the project. Git runs in it.
+        :param scanned_tips: List<String>. Commits that were already scanned. The commits that are reachable from them
+        are not scanned again. All of them must be present in the clone.
+        :param commits: List<String>. If specified, only these commits are scanned (e.g. a partition of the history),
+        instead of the whole history.
+        :return: Boolean. True if the whole history (except the scanned commits) was scanned, False otherwise.
         """
 
-        # Get all the modifications in the commit.
-        r = subprocess.Popen(GIT_GET_ALL_PROJECT_HISTORY.split(' '), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                             shell=False)
+        # Get all the modifications in the commit. The output is read while git writes it, so only the current diff is
+        # held in memory. The errors are written to a temporary file, so a full stderr pipe can not block git.
+        with tempfile.TemporaryFile() as err_file:
+            # The path filters are passed to git as pathspecs, and the size cap as the threshold above which git treats
+            # files as binary, so git does not produce the diffs that are filtered out.
+            command = GIT_GET_ALL_PROJECT_HISTORY if commits is None else GIT_GET_COMMITS_DIFFS
+            r = subprocess.Popen(self.filters.git_command(command), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                 stderr=err_file, shell=False, cwd=clone_path)
+
+            # Git reads the excluded tips (or the commits to scan) from its stdin before it starts writing the history.
+            revisions = ['^{0}'.format(tip) for tip in scanned_tips] if commits is None else commits
+            with r.stdin:
+                r.stdin.write(''.join('{0}\n'.format(revision) for revision in revisions).encode(UTF_8_ENCODING))
+
+            # From each diff of each commit, extract only its added content and then look for secrets in it. The time
+            # that is not spent on looking for secrets is spent on running git and parsing its output.
+            start_time = time.perf_counter()
+            scan_seconds = 0.0
+            skipped_blobs = []
+            with r.stdout:
+                for commit_hash, file_path, curr_added_content in iter_added_content(r.stdout, skipped_blobs):
+                    scan_start_time = time.perf_counter()
+                    self.scan_added_content(commit_hash, file_path, curr_added_content)
+                    scan_seconds += time.perf_counter() - scan_start_time
+            metrics.observe(METRIC_GIT_LOG_PARSE_SECONDS, time.perf_counter() - start_time - scan_seconds)
+
+            success = r.wait() == 0
+            if not success:
+                err_file.seek(0)
+                print('(-) Error inspecting {0}. Some of its history might not be scanned.'.format(self.proj_name))
+                print(err_file.read().decode(UTF_8_ENCODING, errors='replace'))
+
+        self.count_skipped_blobs(clone_path, skipped_blobs)
+
+        if self.code_secrets:
+            verbose_print(FOUND_CODE_SECRETS_VERBOSE, self.verbose)
+
+        return success
+
+    def inspect_blobs(self, clone_path: str, scanned_tips: list[str] = ()):
+        """
+        This function does the same as 'inspect_code', but it scans every unique blob (the content of a file) in the
+        clone once, instead of the diff of every commit. Content that renames, reverts and cherry picks bring back is
+        not scanned again, so long histories with a lot of churn are scanned much faster.
+        The blobs with secrets are mapped back to the oldest commit that added them, and to the path they were added
+        at, so the secrets are reported like 'inspect_code' reports them. Unlike 'inspect_code', the whole content of
+        the file is scanned, not only the lines that the commit added.
+        :param clone_path: String. The path of the clone of the project. Git runs in it.
+        :param scanned_tips: List<String>. Commits that were already scanned. The blobs that were added by the commits
+        that are reachable from them are not reported again.
+        :return: Boolean. True if all the blobs were scanned and mapped, False otherwise.
+        """
+
+        start_time = time.perf_counter()
+        scan_seconds = 0.0
+
+        # Every line is '<hash> <type> <size>'. The objects are listed in the order of the packs, which is the fastest
+        # order to read them in.
+        r = subprocess.Popen(GIT_LIST_ALL_OBJECTS.split(' '), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                             shell=False, cwd=clone_path)
         out, err = r.communicate()
-        if err:
-            print('(-) Error inspecting {0}. Skipping.'.format(self.proj_name))
-            print(err)
+        success = r.returncode == 0
+        blob_hashes = []
+        for line in out.decode(UTF_8_ENCODING).splitlines():
+            object_hash, object_type, size = line.split(' ')
+            if object_type != GIT_OBJECT_TYPE_BLOB:
+                continue
+            if not self.filters.allows_size(int(size)):
+                metrics.inc(METRIC_SKIPPED_DIFFS, reason=SKIP_REASON_SIZE)
+                metrics.inc(METRIC_SKIPPED_BYTES, int(size), reason=SKIP_REASON_SIZE)
+                continue
+            blob_hashes.append(object_hash)
+
+        # The secrets that were found in every blob, by the hash of the blob. The hashes are passed to git through a
+        # file, so git never waits for its stdin while its stdout is being read.
+        blob_secrets: dict[str, list] = {}
+        with tempfile.TemporaryFile() as hashes_file:
+            hashes_file.write(''.join('{0}\n'.format(h) for h in blob_hashes).encode(UTF_8_ENCODING))
+            hashes_file.seek(0)
+            r = subprocess.Popen(GIT_READ_OBJECTS.split(' '), stdin=hashes_file, stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL, shell=False, cwd=clone_path)
+
+            # Every blob is a '<hash> <type> <size>' line, followed by its content and a line break.
+            with r.stdout:
+                while header := r.stdout.readline().decode(UTF_8_ENCODING).rstrip('\n'):
+                    if header.endswith(GIT_MISSING_OBJECT_SUFFIX):
+                        continue
+                    object_hash, object_type, size = header.split(' ')
+                    content = r.stdout.read(int(size) + 1)[:-1]
+                    if b'\0' in content[:GIT_BINARY_CHECK_BYTES]:
+                        metrics.inc(METRIC_SKIPPED_DIFFS, reason=SKIP_REASON_BINARY)
+                        metrics.inc(METRIC_SKIPPED_BYTES, len(content), reason=SKIP_REASON_BINARY)
+                        continue
+
+                    scan_start_time = time.perf_counter()
+                    metrics.inc(METRIC_SCANNED_BLOBS)
+                    metrics.inc(METRIC_SCANNED_BYTES, len(content))
+                    secrets = self.patterns.scan(content.decode(UTF_8_ENCODING, errors='replace'))
+                    if secrets:
+                        blob_secrets[object_hash] = secrets
+                    scan_seconds += time.perf_counter() - scan_start_time
+            success = r.wait() == 0 and success
+
+        if blob_secrets:
+            success = self.report_blob_secrets(clone_path, blob_secrets, scanned_tips) and success
+        metrics.observe(METRIC_BLOB_READ_SECONDS, time.perf_counter() - start_time - scan_seconds)
+
+        if not success:
+            print('(-) Error inspecting {0}. Some of its blobs might not be scanned.'.format(self.proj_name))
+        if self.code_secrets:
+            verbose_print(FOUND_CODE_SECRETS_VERBOSE, self.verbose)
+
+        return success
+
+    def report_blob_secrets(self, clone_path: str, blob_secrets: dict[str, list], scanned_tips: list[str] = ()):
+        """
+        This function finds the commits that added the blobs with secrets, and reports the secrets in them.
+        :param clone_path: String. The path of the clone of the project.
+        :param blob_secrets: Dictionary. The (rule, times found) tuples of the secrets of every blob, by its hash.
+        :param scanned_tips: List<String>. Commits that were already scanned. The blobs that only the commits that are
+        reachable from them added are not reported.
+        :return: Boolean. True if git listed all the commits, False otherwise.
+        """
+
+        # Only the names of the changed files and their blobs are listed, without their diffs. The path filters are
+        # passed to git as pathspecs, so blobs that were only added at filtered paths are not reported.
+        with tempfile.TemporaryFile() as err_file:
+            r = subprocess.Popen(self.filters.git_command(GIT_GET_INTRODUCED_BLOBS), stdin=subprocess.PIPE,
+                                 stdout=subprocess.PIPE, stderr=err_file, shell=False, cwd=clone_path)
+            with r.stdin:
+                r.stdin.write(''.join('^{0}\n'.format(tip) for tip in scanned_tips).encode(UTF_8_ENCODING))
+
+            # The commits are listed from the newest to the oldest, so the last commit that added a blob is the one
+            # that introduced it. Every changed file is a line below its commit:
+            # ':<old mode> <new mode> <old hash> <new hash> <status>\t<path>'.
+            introduced_at: dict[str, tuple[str, str]] = {}
+            commit_hash = None
+            with r.stdout:
+                for raw_line in r.stdout:
+                    line = raw_line.decode(UTF_8_ENCODING, errors='replace').rstrip('\n')
+                    if line.startswith(GIT_RAW_DIFF_PREFIX):
+                        fields, _, file_path = line.partition('\t')
+                        blob_hash = fields.split(' ')[3]
+                        # A commit that added the blob at a few paths is reported at the first one.
+                        if blob_hash in blob_secrets and introduced_at.get(blob_hash, (None,))[0] != commit_hash:
+                            introduced_at[blob_hash] = (commit_hash, file_path.strip('"'))
+                    elif line:
+                        commit_hash = line
+
+            success = r.wait() == 0
+            if not success:
+                err_file.seek(0)
+                print(err_file.read().decode(UTF_8_ENCODING, errors='replace'))
+
+        for blob_hash, (commit_hash, file_path) in introduced_at.items():
+            location = CODE_SECRET_LOCATION_FORMAT.format(self.proj_name,
+                                                          TREE_PATH_FORMAT.format(commit_hash, file_path))
+            for rule, times_found in blob_secrets[blob_hash]:
+                self.code_secrets.append(rule.metadata + [location, times_found])
+        return success
+
+    def count_skipped_blobs(self, clone_path: str, hashes: list[str]):
+        """
+        This function adds the sizes of the files whose diffs git did not produce, because they are binary or above the
+        size cap, to the metrics of the run.
+        :param clone_path: String. The path of the clone of the project.
+        :param hashes: List<String>. The hashes of the blobs of the skipped diffs.
+        :return: None
+        """
+
+        if not hashes:
             return
-        out = str(out)[2:-1]
-
-        # Split the output of the 'GIT_GET_ALL_PROJECT_HISTORY' command into chunks. Each chunk is a commit.
-        splitted_out = re.split(RE_SPLIT_TO_COMMITS, out)
-        splitted_out = [commit_data for commit_data in splitted_out if commit_data]
-        splitted_tup_out = []
-        for i in range(0, len(splitted_out), 3):
-            splitted_tup_out.append((splitted_out[i], '{0}{1}'.format(splitted_out[i + 1], splitted_out[i + 2])))
-
-        # From each commit, extract only its added content and then look for secrets in it.
-        for commit_hash, commit_data in splitted_tup_out:
-            # Split the output into chunks containing the diffs in each file in the commit.
-            diffs = re.split(RE_SPLIT_TO_DIFFS, commit_data)
-            for diff in diffs:
-                file_path, curr_added_content = extract_added_content(diff)
-                if curr_added_content:
-                    for pattern, metadata in self.patterns.items():
-                        try:
-                            res = re.findall(pattern, curr_added_content)
-                        except re.error:
-                            print('The pattern {0} is invalid. Skipping.'.format(pattern))
-                            continue
-
-                        # If secrets were found, add the info about them to the 'self.code_secrets' list of the current
-                        # instance.
-                        if res:
-                            times_found = len(res)
-                            # This variable is important. Before that line, we tried to use
-                            # metadata += [additional_data], but it destroyed changed the metadata in the patterns
-                            # array, which caused an unexpected behavior in the results.
-                            secret_row = metadata + ['{0}/-/tree/{1}/{2}'.format(self.proj_name, commit_hash,
-                                                                                 file_path), times_found]
-                            self.code_secrets.append(secret_row)
-                            res.clear()
+        r = subprocess.Popen(GIT_CHECK_OBJECTS.split(' '), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, shell=False, cwd=clone_path)
+        out, err = r.communicate(''.join('{0}\n'.format(h) for h in hashes).encode(UTF_8_ENCODING))
+
+        # Every line is either '<hash> <type> <size>' or '<hash> missing'.
+        for line in out.decode(UTF_8_ENCODING).splitlines():
+            if line.endswith(GIT_MISSING_OBJECT_SUFFIX):
+                continue
+            size = int(line.split(' ')[2])
+            reason = SKIP_REASON_BINARY if self.filters.allows_size(size) else SKIP_REASON_SIZE
+            metrics.inc(METRIC_SKIPPED_DIFFS, reason=reason)
+            metrics.inc(METRIC_SKIPPED_BYTES, size, reason=reason)
+
+    async def get_commits_api(self, client: GitlabClient):
+        """
+        This function lists all the commits of the project through the gitlab api.
+        :param client: GitlabClient. The client to send the requests with.
+        :return: List<Dictionary>. The commits, or None if they could not be listed.
+        """
+
+        return await client.get_all_pages(COMMITS_API_URL_FORMAT, self.instance, self.proj_id)
+
+    async def get_commit_diffs_api(self, client: GitlabClient, commit: dict):
+        """
+        This function gets the diffs of a commit through the gitlab api. A commit with a parent is compared to its
+        parent, and a root commit is diffed on its own.
+        :param client: GitlabClient. The client to send the requests with.
+        :param commit: Dictionary. The commit, as returned by the commits api.
+        :return: List<Dictionary>. The diffs, or None if they could not be retrieved completely.
+        """
+
+        if commit[API_COMMIT_PARENT_IDS]:
+            r = await client.get(DIFF_API_URL_FORMAT.format(self.instance, self.proj_id,
+                                                            commit[API_COMMIT_PARENT_IDS][0], commit[API_COMMIT_ID]))
+            if not r.ok or type(r.data) != dict or r.data.get(API_COMPARE_TIMEOUT):
+                return None
+            diffs = r.data[API_COMPARE_DIFFS]
+        else:
+            diffs = await client.get_all_pages(COMMIT_DIFF_API_URL_FORMAT, self.instance, self.proj_id,
+                                               commit[API_COMMIT_ID])
+            if diffs is None:
+                return None
+
+        # Gitlab does not return the content of diffs that are too large. Those can only be scanned in a clone.
+        if any(diff.get(API_DIFF_TOO_LARGE) or diff.get(API_DIFF_COLLAPSED) for diff in diffs):
+            return None
+        return diffs
+
+    async def inspect_code_api(self, client: GitlabClient, commits: list[dict], scanned_commits: set = frozenset()):
+        """
+        This function does the same as 'inspect_code', without cloning the project: it gets the diffs of the commits
+        through the gitlab api. The number of concurrent requests is limited by the client.
+        :param client: GitlabClient. The client to send the requests with.
+        :param commits: List<Dictionary>. All the commits of the project, as returned by 'get_commits_api'.
+        :param scanned_commits: Set<String>. Commits that were already scanned. They are not scanned again.
+        :return: Boolean. True if all the commits were scanned, False if the project can not be scanned through the api
+        (and should be cloned instead).
+        """
+
+        # Merge commits are skipped, like in 'git log -p'.
+        commits = [commit for commit in commits
+                   if commit[API_COMMIT_ID] not in scanned_commits and len(commit[API_COMMIT_PARENT_IDS]) <= 1]
+
+        tasks = [asyncio.ensure_future(self.get_commit_diffs_api(client, commit)) for commit in commits]
+        start_time = time.perf_counter()
+        scan_seconds = 0.0
+        try:
+            # The diffs are scanned in the order of the commits, while the next ones are being downloaded.
+            secrets_count = len(self.code_secrets)
+            for commit, task in zip(commits, tasks):
+                diffs = await task
+                if diffs is None:
+                    # Do not report a part of the secrets, the clone will find all of them.
+                    del self.code_secrets[secrets_count:]
+                    return False
+                scan_start_time = time.perf_counter()
+                for commit_hash, file_path, added_content in iter_added_content(
+                        iter_api_diff_lines(commit[API_COMMIT_ID], diffs, self.filters)):
+                    self.scan_added_content(commit_hash, file_path, added_content)
+                scan_seconds += time.perf_counter() - scan_start_time
+        finally:
+            for task in tasks:
+                task.cancel()
+            # The time that is not spent on looking for secrets is spent on waiting for the diffs.
+            metrics.observe(METRIC_API_DIFFS_SECONDS, time.perf_counter() - start_time - scan_seconds)
 
         if self.code_secrets:
             verbose_print(FOUND_CODE_SECRETS_VERBOSE, self.verbose)
 
-        # Delete all the commit data that we got for better handling the memory, as this data can be quite big.
-        del out
-        del splitted_out
-        del splitted_tup_out
+        return True
 
-    def clone_project(self, username, private_token, temp_folder):
+    def get_ref_tips(self, clone_path: str):
         """
-        This function is responsible of cloning a gitlab project to a predefined location in the file system.
-        :return:
+        This function returns the tips of all the refs in the clone of the project.
+        :param clone_path: String. The path of the clone of the project.
+        :return: List<String>. The hashes of the tips.
+        """
+
+        r = subprocess.Popen(GIT_GET_REF_TIPS.split(' '), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                             shell=False, cwd=clone_path)
+        out, err = r.communicate()
+        return out.decode(UTF_8_ENCODING).split()
+
+    def get_all_commits(self, clone_path: str, scanned_tips: list[str] = ()):
+        """
+        This function lists the commits in the clone of the project that can not be reached from the scanned tips.
+        :param clone_path: String. The path of the clone of the project.
+        :param scanned_tips: List<String>. Tips that were scanned in previous runs.
+        :return: Dictionary. The hashes of the parents of every commit, by the hash of the commit. Every commit comes
+        before its parents.
+        """
+
+        r = subprocess.Popen(GIT_GET_ALL_COMMITS.split(' '), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, shell=False, cwd=clone_path)
+        out, err = r.communicate(''.join('^{0}\n'.format(tip) for tip in scanned_tips).encode(UTF_8_ENCODING))
+        lines = out.decode(UTF_8_ENCODING).splitlines()
+        return {commit_hash: parents for commit_hash, *parents in map(str.split, lines)}
+
+    def get_existing_commits(self, clone_path: str, hashes: list[str]):
+        """
+        This function filters a list of hashes down to the ones that are present in the clone of the project.
+        :param clone_path: String. The path of the clone of the project.
+        :param hashes: List<String>. The hashes to check.
+        :return: List<String>. The hashes that are present in the clone.
+        """
+
+        r = subprocess.Popen(GIT_CHECK_OBJECTS.split(' '), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, shell=False, cwd=clone_path)
+        out, err = r.communicate(''.join('{0}\n'.format(h) for h in hashes).encode(UTF_8_ENCODING))
+
+        # Every line is either '<hash> <type> <size>' or '<hash> missing'.
+        return [line.split(' ')[0] for line in out.decode(UTF_8_ENCODING).splitlines()
+                if not line.endswith(GIT_MISSING_OBJECT_SUFFIX)]
+
+    def get_clone_url(self, username: str, private_token: str):
+        """
+        This function returns the url of the project, with the credentials of the user in it.
+        :param username: String. The username to clone with.
+        :param private_token: String. The private token of the user.
+        :return: String. The url to clone from.
         """
 
         # Add the username and the private token of the username to the url in order to have access to clone the
         # project.
         clone_url = self.proj_name.split(r'://')
         clone_url[1] = r'{0}:{1}@'.format(username, private_token) + clone_url[1]
-        clone_url = r'://'.join(clone_url)
+        return r'://'.join(clone_url)
+
+    def run_git(self, command: str, *args: str, cwd: str = None):
+        """
+        This function runs a git command and waits for it to finish.
+        :param command: String. The git command format (e.g. 'GIT_CLONE').
+        :param args: Strings. The values to format the command with. Every argument of the command is formatted on its
+        own, so spaces in the values do not split them.
+        :param cwd: String. The directory to run git in.
+        :return: Tuple. The exit code and the stderr of git.
+        """
+
+        r = subprocess.Popen([arg.format(*args) for arg in command.split(' ')],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=False, cwd=cwd)
+        out, err = r.communicate()
+        return r.returncode, err.decode(UTF_8_ENCODING, errors='replace')
+
+    def clone_project(self, username: str, private_token: str, clone_path: str, bare: bool = False,
+                      blob_limit: int = 0):
+        """
+        This function is responsible of cloning a gitlab project to a predefined location in the file system.
+        :param username: String. The username to clone with.
+        :param private_token: String. The private token of the user.
+        :param clone_path: String. The path to clone the project into. It must not exist.
+        :param bare: Boolean. Indicates if we should clone without a working tree.
+        :param blob_limit: Integer. If specified (with 'bare'), the blobs above this size in bytes are not downloaded.
+        Git reads them lazily from the project if a command needs them, so only commands that never read them (e.g.
+        the listing of the blobs of the clone) should run in such a clone.
+        :return: Boolean. True if the project was cloned successfully, False otherwise.
+        """
+
+        clone_url = self.get_clone_url(username, private_token)
         verbose_print(CLONE_PROJECT_VERBOSE.format(clone_url), self.verbose)
 
-        # Clone the project into the 'temp_folder' directory. 'temp_folder' is a subdirectory of the current directory.
-        if not self.verify_ssl:
-            r = subprocess.Popen(GIT_CLONE_NOSSL.format(clone_url, temp_folder).split(' '),
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=False)
+        # Clone the project into the 'clone_path' directory.
+        if bare and blob_limit:
+            git_clone = GIT_CLONE_BARE_FILTER if self.verify_ssl else GIT_CLONE_BARE_FILTER_NOSSL
+        elif bare:
+            git_clone = GIT_CLONE_BARE if self.verify_ssl else GIT_CLONE_BARE_NOSSL
         else:
-            r = subprocess.Popen(GIT_CLONE.format(clone_url, temp_folder).split(' '),
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=False)
-        out, err = r.communicate()
+            git_clone = GIT_CLONE if self.verify_ssl else GIT_CLONE_NOSSL
+        with metrics.timer(METRIC_CLONE_SECONDS):
+            returncode, err = self.run_git(git_clone, clone_url, clone_path, str(blob_limit))
 
-        # Make sure there are no errors
-        err = err.decode()
-        if err and 'redirecting to http' not in err:
+        # Make sure there are no errors. Git writes its progress to stderr too, so only the exit code tells if the clone
+        # failed.
+        if returncode != 0:
             print('(+) Error cloning {}. Skipping.'.format(clone_url))
             print(err)
+            return False
+
+        # A bare clone may be kept on disk after the run (in the mirrors cache), so do not leave the private token in
+        # its config.
+        if bare:
+            self.run_git(GIT_SET_ORIGIN_URL, self.proj_name, cwd=clone_path)
+        return True
+
+    def fetch_project(self, username: str, private_token: str, clone_path: str):
+        """
+        This function is responsible of updating an existing bare clone of the project with the commits that were
+        pushed since it was cloned.
+        :param username: String. The username to fetch with.
+        :param private_token: String. The private token of the user.
+        :param clone_path: String. The path of the bare clone.
+        :return: Boolean. True if the clone was updated successfully, False otherwise.
+        """
+
+        verbose_print(FETCH_PROJECT_VERBOSE.format(self.proj_name), self.verbose)
+
+        git_fetch = GIT_FETCH_BARE if self.verify_ssl else GIT_FETCH_BARE_NOSSL
+        with metrics.timer(METRIC_FETCH_SECONDS):
+            returncode, err = self.run_git(git_fetch, self.get_clone_url(username, private_token), cwd=clone_path)
+        if returncode != 0:
+            print('(+) Error fetching {}.'.format(self.proj_name))
+            print(err)
+            return False
+        return True
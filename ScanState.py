@@ -0,0 +1,274 @@
+import json
+import sqlite3
+from constants import *
+
+
+class ScanState:
+    def __init__(self, state_path: str, instance: str):
+        """
+        Initialization method for the 'ScanState' class.
+        The state store remembers, for every project, the tips of the refs that were already scanned, so a rescan only
+        walks the commits that can not be reached from them.
+        :param state_path: String. The path of the sqlite database of the state store.
+        :param instance: String. The URL of the gitlab instance. The same database can hold the state of many instances.
+        """
+
+        self.state_path: str = state_path
+        self.instance: str = instance
+
+        self.connection: sqlite3.Connection = sqlite3.connect(self.state_path)
+        self.connection.execute(SQL_CREATE_SCANNED_TIPS_TABLE)
+        self.connection.commit()
+
+    def get_scanned_tips(self, proj_id: int):
+        """
+        This function returns the tips of the refs of a project that were scanned in previous runs.
+        :param proj_id: Integer. The id of the project.
+        :return: List<String>. The hashes of the scanned tips.
+        """
+
+        rows = self.connection.execute(SQL_SELECT_SCANNED_TIPS, (self.instance, proj_id))
+        return [tip for tip, in rows]
+
+    def set_scanned_tips(self, proj_id: int, tips: list[str]):
+        """
+        This function replaces the scanned tips of a project, after all the commits that are reachable from them were
+        scanned.
+        :param proj_id: Integer. The id of the project.
+        :param tips: List<String>. The hashes of the tips.
+        :return: None
+        """
+
+        with self.connection:
+            self.connection.execute(SQL_DELETE_SCANNED_TIPS, (self.instance, proj_id))
+            self.connection.executemany(SQL_INSERT_SCANNED_TIP, [(self.instance, proj_id, tip) for tip in set(tips)])
+
+    def close(self):
+        self.connection.close()
+
+
+class ProjectCatalog:
+    def __init__(self, catalog_path: str, instance: str):
+        """
+        Initialization method for the 'ProjectCatalog' class.
+        The catalog keeps every project that was ever enumerated (its url, size and last activity) and the time it was
+        last scanned. It lives in the results root directory, so a delta run can enumerate only the projects with
+        activity since the previous enumeration.
+        :param catalog_path: String. The path of the sqlite database of the catalog.
+        :param instance: String. The URL of the gitlab instance. The same database can hold the catalogs of many
+        instances.
+        """
+
+        self.catalog_path: str = catalog_path
+        self.instance: str = instance
+
+        self.connection: sqlite3.Connection = sqlite3.connect(self.catalog_path)
+        self.connection.execute(SQL_ENABLE_WAL)
+        self.connection.execute(SQL_SYNCHRONOUS_NORMAL)
+        for statement in SQL_CREATE_CATALOG_TABLES:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    def add_projects(self, projects: list[tuple]):
+        """
+        This function adds enumerated projects to the catalog, or updates them if they are already in it.
+        :param projects: List<Tuple>. A (project id, url, group id, repository size, last activity, empty repo,
+        archived) tuple for every project.
+        :return: None
+        """
+
+        with self.connection:
+            self.connection.executemany(SQL_UPSERT_CATALOG_PROJECT, [(self.instance, *project) for project in projects])
+
+    def set_last_scanned(self, proj_id: int, scan_time: float):
+        with self.connection:
+            self.connection.execute(SQL_SET_CATALOG_LAST_SCANNED, (scan_time, self.instance, proj_id))
+
+    def get_last_enumerated(self):
+        """
+        This function returns the time that the last complete enumeration of the instance started at.
+        :return: Float. The time as a unix timestamp, or None if the instance was never enumerated completely.
+        """
+
+        row = self.connection.execute(SQL_SELECT_CATALOG_LAST_ENUMERATED, (self.instance,)).fetchone()
+        return row[0] if row else None
+
+    def set_last_enumerated(self, enumeration_time: float):
+        with self.connection:
+            self.connection.execute(SQL_SET_CATALOG_LAST_ENUMERATED, (self.instance, enumeration_time))
+
+    def close(self):
+        self.connection.close()
+
+
+def batches(items: list, size: int = SQL_MAX_VARIABLES):
+    """
+    This function splits a list into batches, so every batch fits into a single sqlite query.
+    :param items: List. The items to split.
+    :param size: Integer. The maximal size of a batch.
+    :return: Generator<List>. The batches.
+    """
+
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class CommitIndex:
+    def __init__(self, index_path: str):
+        """
+        Initialization method for the 'CommitIndex' class.
+        The index holds the hashes of all the commits that were scanned during the current run, and the secrets that
+        were found in them. It is shared by all the scanning processes, so a commit that is shared by a project and its
+        forks is scanned only once.
+        :param index_path: String. The path of the sqlite database of the index.
+        """
+
+        self.index_path: str = index_path
+        self.connection: sqlite3.Connection = None
+
+        connection = self.connect()
+        connection.execute(SQL_ENABLE_WAL)
+        connection.execute(SQL_CREATE_SCANNED_COMMITS_TABLE)
+        connection.execute(SQL_CREATE_COMMIT_FINDINGS_TABLE)
+        connection.commit()
+
+    def __getstate__(self):
+        # Every scanning process opens its own connection to the index.
+        state = self.__dict__.copy()
+        state['connection'] = None
+        return state
+
+    def connect(self):
+        """
+        This function returns the connection of the current process to the index, and opens it if needed.
+        :return: sqlite3.Connection. The connection.
+        """
+
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.index_path, timeout=SQLITE_TIMEOUT_SECONDS)
+        return self.connection
+
+    def get_scanned_commits(self, commits: list[str]):
+        """
+        This function returns the commits out of a list that were already scanned during the current run.
+        :param commits: List<String>. The hashes of the commits to check.
+        :return: Set<String>. The hashes of the commits that were already scanned.
+        """
+
+        connection = self.connect()
+        scanned = set()
+        for batch in batches(commits):
+            rows = connection.execute(SQL_SELECT_SCANNED_COMMITS.format(','.join('?' * len(batch))), batch)
+            scanned.update(commit_hash for commit_hash, in rows)
+        return scanned
+
+    def get_findings(self, commits: list[str]):
+        """
+        This function returns the secrets that were found in a list of scanned commits.
+        :param commits: List<String>. The hashes of the scanned commits.
+        :return: List<Tuple>. A (category, sub category, tree path, times found) tuple for every secret.
+        """
+
+        connection = self.connect()
+        findings = []
+        for batch in batches(commits):
+            findings += connection.execute(SQL_SELECT_COMMIT_FINDINGS.format(','.join('?' * len(batch))), batch)
+        return findings
+
+    def add_scanned_commits(self, commits: list[str], findings: list[tuple]):
+        """
+        This function adds commits that were just scanned to the index, together with the secrets that were found in
+        them. Both are added in a single transaction, so other processes never see a commit without its secrets.
+        :param commits: List<String>. The hashes of the scanned commits.
+        :param findings: List<Tuple>. A (commit hash, category, sub category, tree path, times found) tuple for every
+        secret.
+        :return: None
+        """
+
+        connection = self.connect()
+        with connection:
+            connection.executemany(SQL_INSERT_SCANNED_COMMIT, [(commit_hash,) for commit_hash in commits])
+            connection.executemany(SQL_INSERT_COMMIT_FINDING, findings)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class RunJournal:
+    def __init__(self, journal_path: str):
+        """
+        Initialization method for the 'RunJournal' class.
+        The journal records the progress of a run in its output directory: the enumerated projects, the projects and
+        the groups whose cicd variables were extracted, and the projects that were scanned. An interrupted run can be
+        resumed from it, without doing the finished work again.
+        The records are written by the findings writer, right after it flushes the findings that they depend on, so the
+        journal never tells that a project is done before its findings are in the output files.
+        :param journal_path: String. The path of the sqlite database of the journal.
+        """
+
+        self.journal_path: str = journal_path
+
+        # The connection is used by the thread of the findings writer.
+        self.connection: sqlite3.Connection = sqlite3.connect(self.journal_path, check_same_thread=False)
+        self.connection.execute(SQL_ENABLE_WAL)
+        self.connection.execute(SQL_SYNCHRONOUS_NORMAL)
+        for statement in SQL_CREATE_JOURNAL_TABLES:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    def get_state(self):
+        """
+        This function returns the state of the run (e.g. whether the enumeration was finished).
+        :return: Dictionary. The values of the state, by their keys. The values are json decoded.
+        """
+
+        return {key: json.loads(value) for key, value in self.connection.execute(SQL_SELECT_JOURNAL_STATE)}
+
+    def get_done_groups(self):
+        return {group_id for group_id, in self.connection.execute(SQL_SELECT_JOURNAL_GROUPS)}
+
+    def iter_projects(self):
+        """
+        This function reads the enumerated projects back from the journal. The projects are read in batches, through a
+        connection of their own, so they are never all in memory at once.
+        :return: Generator<Tuple>. A (project id, url, group id, repository size, last activity, empty repo, archived,
+        cicd done, scanned) tuple for every project.
+        """
+
+        connection = sqlite3.connect(self.journal_path)
+        try:
+            cursor = connection.execute(SQL_SELECT_JOURNAL_PROJECTS)
+            while rows := cursor.fetchmany(JOURNAL_READ_BATCH_SIZE):
+                yield from rows
+        finally:
+            connection.close()
+
+    def write(self, records: list[tuple], findings_offsets: dict = None):
+        """
+        This function writes records to the journal, in a single transaction.
+        :param records: List<Tuple>. A (kind, value) tuple for every record: the kind is one of the 'JOURNAL_RECORD_*'
+        constants, and the value is a (project id, url, group id, repository size, last activity, empty repo, archived)
+        tuple for an enumerated project, the id of a project or a group, or a (key, value) tuple of the state.
+        :param findings_offsets: Dictionary. If specified, the sizes of the output files up to which the findings were
+        flushed, by their names.
+        :return: None
+        """
+
+        with self.connection:
+            for kind, value in records:
+                if kind == JOURNAL_RECORD_PROJECT:
+                    self.connection.execute(SQL_INSERT_JOURNAL_PROJECT, value)
+                elif kind in (JOURNAL_RECORD_CICD_DONE, JOURNAL_RECORD_SCANNED):
+                    self.connection.execute(SQL_MARK_JOURNAL_PROJECT.format(kind), (value,))
+                elif kind == JOURNAL_RECORD_GROUP:
+                    self.connection.execute(SQL_INSERT_JOURNAL_GROUP, (value,))
+                elif kind == JOURNAL_RECORD_STATE:
+                    self.connection.execute(SQL_SET_JOURNAL_STATE, (value[0], json.dumps(value[1])))
+            if findings_offsets is not None:
+                self.connection.execute(SQL_SET_JOURNAL_STATE,
+                                        (JOURNAL_STATE_FINDINGS_OFFSETS, json.dumps(findings_offsets)))
+
+    def close(self):
+        self.connection.close()
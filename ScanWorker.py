@@ -0,0 +1,361 @@
+import os
+import asyncio
+import shutil
+from MirrorCache import *
+from ScanState import *
+
+
+# The pattern set of the current scanning process. It is sent once to every process when the pool starts, instead of
+# being sent again with every project.
+worker_patterns: PatternSet = None
+worker_filters: DiffFilters = None
+
+
+def init_scan_worker(patterns: PatternSet, filters: DiffFilters = None):
+    """
+    This function initializes a scanning process of the scanning pool.
+    :param patterns: PatternSet. The compiled secrets' regex patterns.
+    :param filters: DiffFilters. The filters of the scanned diffs.
+    :return: None
+    """
+
+    global worker_patterns, worker_filters
+    worker_patterns = patterns
+    worker_filters = filters
+
+
+class ScanPartitions:
+    def __init__(self, tips: list[str], commits: list[str], shared_commits: set):
+        """
+        Initialization method for the 'ScanPartitions' class.
+        A project whose history is too long to be scanned by one process is returned to the main process as its
+        partitions, instead of its secrets. The main process hands the partitions to the processes of the pool (see
+        'scan_partition'), and then merges their secrets (see 'finish_partitioned_scan').
+        :param tips: List<String>. The tips of the clone, as they were before the scan.
+        :param commits: List<String>. The hashes of the commits to scan. They are written to the commits file and are
+        not sent to the main process.
+        :param shared_commits: Set<String>. The commits that were scanned in other projects during the current run, and
+        are not scanned again.
+        """
+
+        self.tips: list[str] = tips
+        self.commits: list[str] = commits
+        self.commits_count: int = len(commits)
+        self.shared_commits: set = shared_commits
+        self.clone_path: str = None
+        self.commits_path: str = None
+        # The clone is deleted when the scan is finished, unless it is a cached mirror.
+        self.delete_clone: bool = False
+        self.mirror_size: int = None
+
+    def write_commits(self, commits_path: str):
+        with open(commits_path, MODE_WRITE, encoding=UTF_8_ENCODING) as file:
+            file.write(''.join('{0}\n'.format(commit_hash) for commit_hash in self.commits))
+        self.commits_path = commits_path
+        self.commits = None
+
+    def read_commits(self, start: int = 0, end: int = None):
+        with open(self.commits_path, encoding=UTF_8_ENCODING) as file:
+            return file.read().split()[start:end]
+
+
+def record_scanned_commits(project: Project, commit_index: CommitIndex, commits: list[str], shared_commits: set):
+    """
+    This function adds the commits that were just scanned in a project to the run-wide commits index, and reports the
+    secrets of the commits that were scanned in other projects for the current project too.
+    :param project: Project. The scanned project.
+    :param commit_index: CommitIndex. The index of the commits that were scanned during the current run.
+    :param commits: List<String>. The hashes of all the new commits of the project.
+    :param shared_commits: Set<String>. The hashes of the commits that were not scanned, because they were scanned in
+    other projects. All the other commits must have been scanned.
+    :return: None
+    """
+
+    # Add the commits that were scanned now to the index, with the secrets that were found in them.
+    location_prefix = CODE_SECRET_LOCATION_FORMAT.format(project.proj_name, '')
+    findings = [(location[len(location_prefix):].split('/', 1)[0], category, sub_category,
+                 location[len(location_prefix):], times_found)
+                for category, sub_category, location, times_found in project.code_secrets]
+    commit_index.add_scanned_commits([commit_hash for commit_hash in commits if commit_hash not in shared_commits],
+                                     findings)
+
+    # Attribute the secrets of the shared commits to the current project too.
+    for category, sub_category, tree_path, times_found in commit_index.get_findings(list(shared_commits)):
+        project.code_secrets.append([category, sub_category,
+                                     CODE_SECRET_LOCATION_FORMAT.format(project.proj_name, tree_path), times_found])
+
+
+def get_covered_commits(commit_parents: dict, shared_commits: set):
+    """
+    This function finds the shared commits that can be excluded from the scan of a project. Excluding a commit excludes
+    its ancestors too, so a shared commit can be excluded only if all of its ancestors that are to be scanned were
+    scanned in other projects as well (e.g. an ancestor that the other project had excluded by its own scanned tips was
+    not).
+    :param commit_parents: Dictionary. The parents of every commit to scan, by its hash. Every commit comes before its
+    parents.
+    :param shared_commits: Set<String>. The hashes of the commits that were scanned in other projects.
+    :return: Set<String>. The hashes of the shared commits whose ancestors to scan are all shared too.
+    """
+
+    covered = set()
+    for commit_hash, parents in reversed(commit_parents.items()):
+        if commit_hash in shared_commits and \
+                all(parent in covered or parent not in commit_parents for parent in parents):
+            covered.add(commit_hash)
+    return covered
+
+
+def scan_clone(project: Project, clone_path: str, scanned_tips: list[str], commit_index: CommitIndex,
+               scan_engine: str = SCAN_ENGINE_DIFF, partition_min_commits: int = 0):
+    """
+    This function looks for secrets in the commits of a clone that were not scanned yet.
+    :param project: Project. The project of the clone.
+    :param clone_path: String. The path of the clone.
+    :param scanned_tips: List<String>. Tips that were scanned in previous runs.
+    :param commit_index: CommitIndex. The index of the commits that were scanned during the current run (in other
+    projects). If specified, those commits are not scanned again, but their secrets are reported for this project too.
+    :param scan_engine: String. 'diff' to scan the diffs of the commits, or 'blob' to scan every unique blob once.
+    :param partition_min_commits: Integer. If the diffs of at least this many commits are to be scanned, the clone is
+    not scanned, but split into partitions that are scanned by all the processes of the pool (0 to never split it).
+    :return: List<String>. The tips of the clone, if all of its new commits were scanned. None otherwise. Or
+    ScanPartitions, if the clone should be scanned in partitions.
+    """
+
+    inspect = project.inspect_blobs if scan_engine == SCAN_ENGINE_BLOB else project.inspect_code
+
+    # The tips are taken before the scan, so they describe exactly the history that was scanned. Tips that are not in
+    # the clone anymore (e.g. after a force push) can not be excluded by git.
+    tips = project.get_ref_tips(clone_path)
+    scanned_tips = project.get_existing_commits(clone_path, scanned_tips) if scanned_tips else []
+    if not commit_index and not partition_min_commits:
+        return tips if inspect(clone_path, scanned_tips) else None
+
+    # Find the commits that another project (e.g. the project this one was forked from) already scanned. Only the ones
+    # whose ancestors were all scanned too are excluded, since excluding a commit excludes its ancestors. The others are
+    # scanned again.
+    commit_parents = project.get_all_commits(clone_path, scanned_tips)
+    commits = list(commit_parents)
+    shared_commits = get_covered_commits(commit_parents, commit_index.get_scanned_commits(commits)) \
+        if commit_index else set()
+
+    # The blob engine reads every blob once anyway, so only the diffs of the commits are split.
+    if partition_min_commits and scan_engine == SCAN_ENGINE_DIFF and \
+            len(commits) - len(shared_commits) >= partition_min_commits:
+        return ScanPartitions(tips, [commit_hash for commit_hash in commits if commit_hash not in shared_commits],
+                              shared_commits)
+
+    if not inspect(clone_path, scanned_tips + list(shared_commits)):
+        return None
+    if not commit_index:
+        return tips
+
+    record_scanned_commits(project, commit_index, commits, shared_commits)
+    return tips
+
+
+async def scan_api(project: Project, private_token: str, scan_method: str, commit_index: CommitIndex):
+    """
+    This function looks for secrets in the commits of a project through the gitlab api, without cloning it.
+    In the 'auto' scan method, only projects with few commits are scanned this way (the size of their repository is
+    checked before).
+    :param project: Project. The project to scan.
+    :param private_token: String. The private token of the user.
+    :param scan_method: String. The scan method of the run.
+    :param commit_index: CommitIndex. The index of the commits that were scanned during the current run.
+    :return: Boolean. True if the project was scanned, False if it should be cloned instead.
+    """
+
+    async with GitlabClient(instance=project.instance, private_token=private_token, verify_ssl=project.verify_ssl,
+                            max_in_flight=API_SCAN_CONCURRENCY_DEFAULT, verbose=project.verbose) as client:
+        verbose_print(API_SCAN_PROJECT_VERBOSE.format(project.proj_name), project.verbose)
+        commits = await project.get_commits_api(client)
+        if commits is None or (scan_method == SCAN_METHOD_AUTO and len(commits) > API_SCAN_MAX_COMMITS_DEFAULT):
+            verbose_print(API_SCAN_FALLBACK_VERBOSE.format(project.proj_name), project.verbose)
+            return False
+
+        commit_hashes = [commit[API_COMMIT_ID] for commit in commits]
+        shared_commits = commit_index.get_scanned_commits(commit_hashes) if commit_index else set()
+        if not await project.inspect_code_api(client, commits, shared_commits):
+            verbose_print(API_SCAN_FALLBACK_VERBOSE.format(project.proj_name), project.verbose)
+            return False
+
+    if commit_index:
+        record_scanned_commits(project, commit_index, commit_hashes, shared_commits)
+    return True
+
+
+def scan_project_code(proj_name: str, proj_id: int, instance: str, verify_ssl: bool, verbose: bool, username: str,
+                      private_token: str, scratch_path: str, mirror_cache: MirrorCache = None,
+                      scanned_tips: list[str] = (), commit_index: CommitIndex = None,
+                      scan_method: str = SCAN_METHOD_CLONE, scan_engine: str = SCAN_ENGINE_DIFF,
+                      partition_min_commits: int = 0, clone_mode: str = CLONE_MODE_BARE,
+                      clone_blob_filter: bool = False, repository_size: int = None):
+    """
+    This function does the work of 'scan_project' (see its parameters).
+    :return: Tuple. The code secrets that were found in the project, the size of its cached mirror in bytes (None if the
+    mirrors cache is not used), the tips that were scanned (None if there are none to remember), or ScanPartitions if
+    the project should be scanned in partitions, and whether all the new commits of the project were scanned.
+    """
+
+    project = Project(proj_name=proj_name, proj_id=proj_id,
+                      context=ProjectContext(instance=instance, verify_ssl=verify_ssl, patterns=worker_patterns,
+                                             verbose=verbose, filters=worker_filters))
+
+    # The api can not tell which commits are reachable from the tips of the previous runs, so incremental scans of
+    # projects that were already scanned always use a clone. A project that was scanned through the api has no tips
+    # to remember. In the 'auto' scan method, the size of the repository is known from the enumeration, so big projects
+    # (and the ones whose size is unknown) are cloned without any request.
+    small_repository = repository_size is not None and \
+        repository_size <= API_SCAN_MAX_REPOSITORY_SIZE_MB_DEFAULT * BYTES_IN_MB
+    if not scanned_tips and (scan_method == SCAN_METHOD_API or (scan_method == SCAN_METHOD_AUTO and small_repository)):
+        if asyncio.run(scan_api(project, private_token, scan_method, commit_index)):
+            return project.code_secrets, None, None, True
+
+    # The mirror is kept on disk after the scan, so there is nothing to delete.
+    if mirror_cache:
+        mirror_path = mirror_cache.update_mirror(project, username, private_token)
+        if not mirror_path:
+            return project.code_secrets, None, None, False
+        tips = scan_clone(project, mirror_path, scanned_tips, commit_index, scan_engine, partition_min_commits)
+        if isinstance(tips, ScanPartitions):
+            tips.clone_path = mirror_path
+            tips.mirror_size = get_directory_size(mirror_path)
+            tips.write_commits(os.path.join(scratch_path, PARTITION_COMMITS_FILE_NAME_FORMAT.format(proj_id)))
+        return project.code_secrets, get_directory_size(mirror_path), tips, tips is not None
+
+    # Every scanning process has its own scratch directory, so the processes never clone into the same path.
+    clone_path = os.path.join(scratch_path, str(os.getpid()))
+    if os.path.isdir(clone_path):
+        shutil.rmtree(clone_path, onerror=on_error_deleting_clone_path)
+
+    # 'git log -p' reads every blob that it diffs, even to tell that it is too big, so only the blob engine can scan a
+    # clone without the blobs above the size cap.
+    blob_limit = worker_filters.max_diff_size if clone_blob_filter and scan_engine == SCAN_ENGINE_BLOB else 0
+
+    tips = None
+    try:
+        if project.clone_project(username, private_token, clone_path, bare=clone_mode == CLONE_MODE_BARE,
+                                 blob_limit=blob_limit):
+            metrics.inc(METRIC_CLONE_BYTES, get_directory_size(clone_path))
+            tips = scan_clone(project, clone_path, scanned_tips, commit_index, scan_engine, partition_min_commits)
+            if isinstance(tips, ScanPartitions):
+                # The other processes scan the clone after the current process moves on to its next project, so the
+                # clone is moved out of its scratch directory.
+                tips.clone_path = os.path.join(scratch_path, PARTITION_CLONE_DIRECTORY_NAME_FORMAT.format(proj_id))
+                tips.delete_clone = True
+                os.rename(clone_path, tips.clone_path)
+                tips.write_commits(os.path.join(scratch_path, PARTITION_COMMITS_FILE_NAME_FORMAT.format(proj_id)))
+    finally:
+        if os.path.isdir(clone_path):
+            shutil.rmtree(clone_path, onerror=on_error_deleting_clone_path)
+
+    return project.code_secrets, None, tips, tips is not None
+
+
+def scan_project(proj_name: str, proj_id: int, instance: str, verify_ssl: bool, verbose: bool, username: str,
+                 private_token: str, scratch_path: str, mirror_cache: MirrorCache = None, scanned_tips: list[str] = (),
+                 commit_index: CommitIndex = None, scan_method: str = SCAN_METHOD_CLONE,
+                 scan_engine: str = SCAN_ENGINE_DIFF, partition_min_commits: int = 0,
+                 clone_mode: str = CLONE_MODE_BARE, clone_blob_filter: bool = False, repository_size: int = None):
+    """
+    This function clones a project, looks for secrets in its code and deletes the clone. It runs in a process of the
+    scanning pool, so the regex work of different projects is not limited by the GIL.
+    :param proj_name: String. The url of the project.
+    :param proj_id: Integer. The id of the project.
+    :param instance: String. The url of the gitlab instance.
+    :param verify_ssl: Boolean. Indicates if we should use ssl when cloning the project.
+    :param verbose: Boolean. Indicates if we should print status messages or not.
+    :param username: String. The username to clone with.
+    :param private_token: String. The private token of the user.
+    :param scratch_path: String. The directory that contains the scratch directories of the scanning processes.
+    :param mirror_cache: MirrorCache. If specified, the project is fetched into its cached mirror and scanned there,
+    instead of being cloned from scratch.
+    :param scanned_tips: List<String>. Tips that were scanned in previous runs. Only the commits that can not be
+    reached from them are scanned.
+    :param commit_index: CommitIndex. If specified, commits that were scanned in other projects during the current run
+    are not scanned again.
+    :param scan_method: String. 'clone' to always clone the project, 'api' to scan it through the gitlab api whenever
+    possible, or 'auto' to scan only small projects through the api.
+    :param scan_engine: String. 'diff' to scan the diffs of the commits of a clone, or 'blob' to scan every unique blob
+    in it once. The projects that are scanned through the api are always scanned by their diffs.
+    :param partition_min_commits: Integer. The clones with at least this many commits to scan are scanned in
+    partitions, by all the processes of the pool (0 to never split them).
+    :param clone_mode: String. 'bare' to clone the project without a working tree, or 'checkout' to check it out.
+    :param clone_blob_filter: Boolean. Indicates if the blobs above the size cap of the filters should not be downloaded
+    when the project is cloned for the blob engine.
+    :param repository_size: Integer. The size of the repository in bytes, as enumerated, or None if it is unknown. In
+    the 'auto' scan method, only the projects that are known to be small are scanned through the api.
+    :return: Tuple. The code secrets that were found in the project, the size of its cached mirror in bytes (None if the
+    mirrors cache is not used), the tips that were scanned (None if there are none to remember, or ScanPartitions if the
+    project should be scanned in partitions), whether all the new commits of the project were scanned (False if it
+    could not be cloned or fetched) and the metrics that the process collected since its previous project.
+    """
+
+    with metrics.timer(METRIC_PROJECT_SCAN_SECONDS):
+        code_secrets, mirror_size, tips, scanned = scan_project_code(
+            proj_name, proj_id, instance, verify_ssl, verbose, username, private_token, scratch_path, mirror_cache,
+            scanned_tips, commit_index, scan_method, scan_engine, partition_min_commits, clone_mode, clone_blob_filter,
+            repository_size)
+    return code_secrets, mirror_size, tips, scanned, metrics.take()
+
+
+def scan_partition(proj_name: str, proj_id: int, instance: str, verify_ssl: bool, verbose: bool,
+                   partitions: ScanPartitions, start: int, end: int):
+    """
+    This function looks for secrets in a partition of the commits of a project that is scanned in partitions. It runs
+    in a process of the scanning pool, while other processes scan the other partitions of the project.
+    :param proj_name: String. The url of the project.
+    :param proj_id: Integer. The id of the project.
+    :param instance: String. The url of the gitlab instance.
+    :param verify_ssl: Boolean. Indicates if we should use ssl when interacting with the gitlab instance.
+    :param verbose: Boolean. Indicates if we should print status messages or not.
+    :param partitions: ScanPartitions. The partitions of the project.
+    :param start: Integer. The index of the first commit of the partition in the commits file.
+    :param end: Integer. The index after the last commit of the partition.
+    :return: Tuple. The code secrets that were found in the partition, whether all of its commits were scanned, and the
+    metrics that the process collected since its previous task.
+    """
+
+    project = Project(proj_name=proj_name, proj_id=proj_id,
+                      context=ProjectContext(instance=instance, verify_ssl=verify_ssl, patterns=worker_patterns,
+                                             verbose=verbose, filters=worker_filters))
+    with metrics.timer(METRIC_PARTITION_SCAN_SECONDS):
+        success = project.inspect_code(partitions.clone_path, commits=partitions.read_commits(start, end))
+    return project.code_secrets, success, metrics.take()
+
+
+def finish_partitioned_scan(proj_name: str, proj_id: int, instance: str, verify_ssl: bool, verbose: bool,
+                            partitions: ScanPartitions, code_secrets: list[list], commit_index: CommitIndex = None):
+    """
+    This function finishes the scan of a project that was scanned in partitions, once all of its partitions are
+    scanned: it merges their secrets, records the scanned commits and deletes the clone.
+    :param proj_name: String. The url of the project.
+    :param proj_id: Integer. The id of the project.
+    :param instance: String. The url of the gitlab instance.
+    :param verify_ssl: Boolean. Indicates if we should use ssl when interacting with the gitlab instance.
+    :param verbose: Boolean. Indicates if we should print status messages or not.
+    :param partitions: ScanPartitions. The partitions of the project.
+    :param code_secrets: List<List>. The code secrets that were found in all the partitions.
+    :param commit_index: CommitIndex. If specified, the scanned commits are added to it (only if all the partitions
+    were scanned).
+    :return: Tuple. The code secrets of the project and the metrics that the process collected since its previous task.
+    """
+
+    project = Project(proj_name=proj_name, proj_id=proj_id,
+                      context=ProjectContext(instance=instance, verify_ssl=verify_ssl, patterns=worker_patterns,
+                                             verbose=verbose, filters=worker_filters))
+    # Every commit is in a single partition, but a secret that is reported twice is still reported once.
+    seen_secrets = set()
+    for secret_row in code_secrets:
+        if tuple(secret_row) not in seen_secrets:
+            seen_secrets.add(tuple(secret_row))
+            project.code_secrets.append(secret_row)
+
+    try:
+        if commit_index:
+            record_scanned_commits(project, commit_index, partitions.read_commits(), partitions.shared_commits)
+    finally:
+        os.remove(partitions.commits_path)
+        if partitions.delete_clone and os.path.isdir(partitions.clone_path):
+            shutil.rmtree(partitions.clone_path, onerror=on_error_deleting_clone_path)
+    return project.code_secrets, metrics.take()
@@ -0,0 +1,155 @@
+import json
+import time
+import sqlite3
+from constants import *
+
+
+class WorkQueue:
+    def __init__(self, queue_path: str, instance: str):
+        """
+        Initialization method for the 'WorkQueue' class.
+        The work queue shares the code scanning of an instance between many worker processes, on one node or on many.
+        The coordinator adds the enumerated projects to it, and every worker leases a few projects at a time, scans them
+        and reports their secrets back to it. A lease that is not renewed in time expires, so the projects of a worker
+        that died are handed out again.
+        The queue is a sqlite database. It uses the default rollback journal (not a write-ahead log), so it can also be
+        shared through a network filesystem with working file locks.
+        :param queue_path: String. The path of the sqlite database of the queue.
+        :param instance: String. The URL of the gitlab instance. A queue holds the projects of a single instance.
+        """
+
+        self.queue_path: str = queue_path
+        self.instance: str = instance
+
+        # Every statement commits on its own, and the statements that must run together are wrapped in transactions
+        # that take the write lock up front (and are rolled back on errors), so two workers never lease the same
+        # project.
+        self.connection: sqlite3.Connection = sqlite3.connect(self.queue_path, timeout=WORK_QUEUE_BUSY_TIMEOUT_SECONDS,
+                                                              isolation_level=None)
+        for statement in SQL_CREATE_WORK_QUEUE_TABLES:
+            self.connection.execute(statement)
+        self.connection.execute(SQL_INSERT_WORK_STATE, (WORK_STATE_INSTANCE, json.dumps(self.instance)))
+        if self.get_state(WORK_STATE_INSTANCE) != self.instance:
+            raise WORK_QUEUE_INSTANCE_MISMATCH_ERROR
+
+    def get_state(self, key: str):
+        row = self.connection.execute(SQL_SELECT_WORK_STATE, (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_filled(self, filled: bool):
+        """
+        This function tells the workers if more projects may still be added to the queue.
+        :param filled: Boolean. True once the coordinator had added all the projects to scan.
+        :return: None
+        """
+
+        self.connection.execute(SQL_SET_WORK_STATE, (WORK_STATE_FILLED, json.dumps(filled)))
+
+    def clear(self):
+        """
+        This function removes all the projects from the queue, with the secrets that were reported for them, so a new
+        run of the coordinator never merges the reports of a previous run.
+        :return: None
+        """
+
+        with self.connection:
+            self.connection.execute(SQL_BEGIN_IMMEDIATE)
+            self.connection.execute(SQL_DELETE_WORK_ITEMS)
+
+    def add_projects(self, projects: list[tuple]):
+        """
+        This function adds projects to the queue. Projects that are already in it were added by the interrupted run of
+        the coordinator that is resumed: the ones that were scanned keep their reports, so they are merged without
+        being scanned again, and the ones that failed are tried again.
+        :param projects: List<Tuple>. A (project id, url, group id, repository size, last activity, empty repo,
+        archived) tuple for every project.
+        :return: None
+        """
+
+        with self.connection:
+            self.connection.execute(SQL_BEGIN_IMMEDIATE)
+            self.connection.executemany(SQL_INSERT_WORK_ITEM, projects)
+
+    def lease(self, worker_id: str, count: int, lease_seconds: float):
+        """
+        This function leases the biggest projects that are not leased yet, or whose leases expired.
+        :param worker_id: String. The id of the leasing worker.
+        :param count: Integer. The maximal number of projects to lease.
+        :param lease_seconds: Float. The time until the leases expire, unless they are renewed.
+        :return: List<Tuple>. A (project id, url, group id, repository size, last activity, empty repo, archived) tuple
+        for every leased project.
+        """
+
+        now = time.time()
+        with self.connection:
+            self.connection.execute(SQL_BEGIN_IMMEDIATE)
+            # The projects that failed too many times are not handed out again.
+            self.connection.execute(SQL_FAIL_EXPIRED_WORK_ITEMS, (now, WORK_MAX_ATTEMPTS_DEFAULT))
+            rows = self.connection.execute(SQL_SELECT_LEASABLE_WORK_ITEMS, (now, count)).fetchall()
+            self.connection.executemany(SQL_LEASE_WORK_ITEM, [(worker_id, now + lease_seconds, row[0]) for row in rows])
+        return rows
+
+    def renew(self, worker_id: str, proj_ids: list[int], lease_seconds: float):
+        """
+        This function extends the leases of the projects that a worker is still working on.
+        :param worker_id: String. The id of the worker.
+        :param proj_ids: List<Integer>. The ids of the projects.
+        :param lease_seconds: Float. The time until the leases expire, from now.
+        :return: None
+        """
+
+        expires = time.time() + lease_seconds
+        with self.connection:
+            self.connection.execute(SQL_BEGIN_IMMEDIATE)
+            self.connection.executemany(SQL_RENEW_WORK_ITEM, [(expires, proj_id, worker_id) for proj_id in proj_ids])
+
+    def complete(self, worker_id: str, proj_id: int, code_secrets: list[list]):
+        """
+        This function reports the secrets of a scanned project, and marks it as done.
+        :param worker_id: String. The id of the worker.
+        :param proj_id: Integer. The id of the project.
+        :param code_secrets: List<List>. The code secrets that were found in the project.
+        :return: Boolean. False if the lease of the worker was handed to another worker, so its secrets are dropped.
+        """
+
+        cursor = self.connection.execute(SQL_COMPLETE_WORK_ITEM, (json.dumps(code_secrets), proj_id, worker_id))
+        return cursor.rowcount == 1
+
+    def release(self, worker_id: str, proj_id: int):
+        """
+        This function gives up the lease of a project that failed to scan, so another worker can try it (up to
+        'WORK_MAX_ATTEMPTS_DEFAULT' times in total).
+        :param worker_id: String. The id of the worker.
+        :param proj_id: Integer. The id of the project.
+        :return: None
+        """
+
+        self.connection.execute(SQL_RELEASE_WORK_ITEM, (WORK_MAX_ATTEMPTS_DEFAULT, proj_id, worker_id))
+
+    def iter_completed(self, after_sequence: int):
+        """
+        This function reads the reports of the projects that were completed after a point.
+        :param after_sequence: Integer. The sequence number of the last completion that was already read.
+        :return: Generator<Tuple>. A (sequence number, project id, code secrets) tuple for every completed project, in
+        the order they were completed.
+        """
+
+        cursor = self.connection.execute(SQL_SELECT_COMPLETED_WORK_ITEMS, (after_sequence,))
+        while rows := cursor.fetchmany(WORK_QUEUE_BATCH_SIZE):
+            for sequence, proj_id, code_secrets in rows:
+                yield sequence, proj_id, json.loads(code_secrets)
+
+    def get_failed(self):
+        return {proj_id for proj_id, in self.connection.execute(SQL_SELECT_FAILED_WORK_ITEMS)}
+
+    def has_unfinished_work(self):
+        """
+        This function tells if the workers should wait for more work.
+        :return: Boolean. True if projects may still be added to the queue, or some projects are not done yet.
+        """
+
+        return not self.get_state(WORK_STATE_FILLED) or \
+            self.connection.execute(SQL_COUNT_UNFINISHED_WORK_ITEMS).fetchone()[0] > 0
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,278 @@
+"""
+A benchmark of the stages of the tool against a local fake gitlab instance.
+
+Run it from anywhere (e.g. 'python benchmark/Benchmark.py -p 20 -c 200'). It generates synthetic repositories, serves
+them with 'FakeGitlab' and runs every stage in its own process, so the peak memory of every stage is measured on its
+own.
+The results can be saved as json (-o) and compared with a previous run (--baseline).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import resource
+import argparse
+import tempfile
+import threading
+import subprocess
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_ROOT = os.path.dirname(BENCHMARK_DIRECTORY)
+
+# The tool reads its configuration relative to the current working directory.
+os.chdir(REPOSITORY_ROOT)
+sys.path.insert(0, REPOSITORY_ROOT)
+sys.path.insert(0, BENCHMARK_DIRECTORY)
+
+from GitlabInstance import *
+from FakeGitlab import FakeGitlab, FAKE_PRIVATE_TOKEN, GROUPS_COUNT
+from SyntheticRepos import generate_repositories
+
+STAGE_ENUM = 'enum'
+STAGE_CICD = 'cicd'
+STAGE_CODE = 'code'
+STAGES = [STAGE_ENUM, STAGE_CICD, STAGE_CODE]
+RSS_SAMPLE_SECONDS = 0.05
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+RESULT_LINE_PREFIX = 'BENCHMARK_RESULT '
+
+
+def process_tree_rss(root_pid: int):
+    """
+    This function sums the resident memory of a process and all its descendants (e.g. the processes of the scanning
+    pool, which are started by a fork server). It reads '/proc', so it only works on linux.
+    :param root_pid: Integer. The id of the root process.
+    :return: Integer. The resident memory in bytes, or None if '/proc' is not available.
+    """
+
+    if not os.path.isdir('/proc'):
+        return None
+    children, rss = {}, {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{0}/stat'.format(entry)) as file:
+                # The name of the process is in parentheses and may contain spaces.
+                fields = file.read().rpartition(')')[2].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        rss[int(entry)] = int(fields[21]) * PAGE_SIZE
+
+    total, pids = 0, [root_pid]
+    while pids:
+        pid = pids.pop()
+        total += rss.get(pid, 0)
+        pids.extend(children.get(pid, []))
+    return total
+
+
+def run_stage_process(stage: str, config: dict):
+    """
+    This function runs a stage in a new process and samples the memory of its process tree while it runs.
+    :param stage: String. The name of the stage.
+    :param config: Dictionary. The configuration of the stage (see 'run_stage').
+    :return: Dictionary. The results of the stage, with its peak resident memory.
+    """
+
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--run-stage', stage, json.dumps(config)],
+                               stdout=subprocess.PIPE, text=True)
+    peak_rss = [0]
+
+    def sample_rss():
+        while process.poll() is None:
+            peak_rss[0] = max(peak_rss[0], process_tree_rss(process.pid) or 0)
+            time.sleep(RSS_SAMPLE_SECONDS)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    output, _ = process.communicate()
+    sampler.join()
+    if process.returncode != 0:
+        raise RuntimeError('The {0} stage failed with exit code {1}'.format(stage, process.returncode))
+
+    result = json.loads(output.rsplit(RESULT_LINE_PREFIX, 1)[1])
+    # Without '/proc', fall back to the peak of the stage process itself.
+    result['peak_rss_mb'] = (peak_rss[0] or result.pop('self_max_rss_kb') * 1024) / BYTES_IN_MB
+    result.pop('self_max_rss_kb', None)
+    return result
+
+
+def run_stage(stage: str, config: dict):
+    """
+    This function runs a stage of the tool against the fake instance, in the current process.
+    :param stage: String. The name of the stage.
+    :param config: Dictionary. The url of the instance, the names of its repositories, the number of projects and the
+    efficiency settings of the tool.
+    :return: Dictionary. The elapsed time and the counters of the stage.
+    """
+
+    output_path = tempfile.mkdtemp(prefix='kingit-benchmark-output-')
+    gitlab_instance = GitlabInstance(username='benchmark', private_token=FAKE_PRIVATE_TOKEN,
+                                     instance=config['instance'], mode=MODE_ALL, threads_count=config['threads'],
+                                     max_requests=config['max_requests'],
+                                     scan_workers_count=config['scan_workers'], verify_ssl=False, save_projects=False,
+                                     verbose=False, patterns_path=PATTERNS_PATH_DEFAULT, output=output_path)
+    gitlab_instance.output_path = output_path
+    gitlab_instance.scan_method = config['scan_method']
+    gitlab_instance.scan_engine = config.get('engine', SCAN_ENGINE_DIFF)
+    gitlab_instance.partition_min_commits = config.get('partition_min_commits', PARTITION_MIN_COMMITS_DEFAULT)
+
+    # The code stage scans only one project per repository, so every commit is scanned exactly once.
+    projects_count = config['projects'] if stage != STAGE_CODE else len(config['repositories'])
+    projects = [Project(proj_name='{0}/repos/{1}'.format(config['instance'], config['repositories'][i % len(
+        config['repositories'])][:-len('.git')]), proj_id=i + 1, context=gitlab_instance.project_context,
+        group_id=(i + 1) % GROUPS_COUNT + 1) for i in range(projects_count)]
+
+    async def feed(queue: asyncio.Queue):
+        for project in projects:
+            await queue.put(project)
+        await queue.put(None)
+
+    async def run():
+        queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE_DEFAULT)
+        async with gitlab_instance.create_client() as client:
+            if stage == STAGE_ENUM:
+                await gitlab_instance.enum_projects(client)
+            elif stage == STAGE_CICD:
+                await asyncio.gather(feed(queue), gitlab_instance.extract_all_cicd_secrets(client, queue))
+            else:
+                await asyncio.gather(feed(queue), gitlab_instance.extract_code_secrets(queue))
+
+    kinds = {STAGE_CICD: [FINDINGS_KIND_CICD], STAGE_CODE: [FINDINGS_KIND_CODE]}.get(stage, [])
+    gitlab_instance.findings_writer = FindingsWriter(output_path=output_path, sink_names=[FINDINGS_SINK_CSV],
+                                                     kinds=kinds)
+    start_time = time.perf_counter()
+    try:
+        asyncio.run(run())
+    finally:
+        gitlab_instance.findings_writer.close()
+    elapsed_seconds = time.perf_counter() - start_time
+
+    findings_count = 0
+    for kind in kinds:
+        with open(os.path.join(output_path, FINDINGS_FILE_NAMES[kind]), encoding=UTF_8_ENCODING) as file:
+            findings_count += sum(1 for _ in file) - 1
+    shutil.rmtree(output_path, ignore_errors=True)
+
+    return {'seconds': elapsed_seconds,
+            'projects': gitlab_instance.projects_counter if stage == STAGE_ENUM else projects_count,
+            'findings': findings_count, 'self_max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def format_report(results: dict, baseline: dict = None):
+    """
+    This function formats the results of the stages as a table, with the change from a baseline if specified.
+    :param results: Dictionary. The results of every stage.
+    :param baseline: Dictionary. The results of a previous run.
+    :return: String. The report.
+    """
+
+    lines = ['{0:<6} {1:>9} {2:>12} {3:>12} {4:>10} {5:>10} {6:>9}'.format(
+        'Stage', 'Seconds', 'Projects/s', 'Commits/s', 'MB diff/s', 'Peak MB', 'Findings')]
+    for stage, result in results.items():
+        lines.append('{0:<6} {1:>9.2f} {2:>12.1f} {3:>12} {4:>10} {5:>10.1f} {6:>9}'.format(
+            stage, result['seconds'], result['projects_per_second'],
+            '{0:.1f}'.format(result['commits_per_second']) if 'commits_per_second' in result else '-',
+            '{0:.2f}'.format(result['diff_mb_per_second']) if 'diff_mb_per_second' in result else '-',
+            result['peak_rss_mb'], result['findings']))
+        if baseline and stage in baseline:
+            changes = ['{0} {1:+.1f}%'.format(key, (result[key] / baseline[stage][key] - 1) * 100)
+                       for key in ('seconds', 'peak_rss_mb') if baseline[stage].get(key)]
+            lines.append('       vs baseline: ' + ', '.join(changes))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the stages of KinGit against a local fake gitlab instance')
+    parser.add_argument('-p', '--projects', type=int, default=1000,
+                        help='The number of projects of the fake instance (enumeration and cicd stages)')
+    parser.add_argument('-R', '--repositories', type=int, default=20,
+                        help='The number of synthetic repositories (the code stage scans each of them once)')
+    parser.add_argument('-c', '--commits', type=int, default=200, help='The number of commits in every repository')
+    parser.add_argument('-f', '--files-per-commit', type=int, default=2,
+                        help='The number of files that every commit changes')
+    parser.add_argument('-l', '--lines-per-file', type=int, default=50,
+                        help='The number of lines that every commit adds to every changed file')
+    parser.add_argument('--line-length', type=int, default=80, help='The approximate length of every added line')
+    parser.add_argument('--secret-every', type=int, default=10,
+                        help='Plant a secret in every n-th commit (0 to plant no secrets)')
+    parser.add_argument('-L', '--latency', type=float, default=0.0,
+                        help='The latency of every request to the fake instance, in seconds')
+    parser.add_argument('-r', '--rate-limit', type=int, default=0,
+                        help='The number of requests per second that the fake instance serves (0 for no limit)')
+    parser.add_argument('-v', '--variables', type=int, default=5,
+                        help='The number of cicd variables of every project and group')
+    parser.add_argument('-t', '--threads', type=int, default=NUMBER_OF_THREADS_DEFAULT)
+    parser.add_argument('-m', '--max-requests', type=int, default=MAX_REQUESTS_IN_FLIGHT_DEFAULT)
+    parser.add_argument('-w', '--scan-workers', type=int, default=NUMBER_OF_SCAN_WORKERS_DEFAULT)
+    parser.add_argument('-s', '--scan-method', type=str, default=SCAN_METHOD_CLONE,
+                        choices=[SCAN_METHOD_AUTO, SCAN_METHOD_CLONE, SCAN_METHOD_API])
+    parser.add_argument('-e', '--engine', type=str, default=SCAN_ENGINE_DIFF, choices=SCAN_ENGINES,
+                        help='How the clones are scanned (code stage)')
+    parser.add_argument('-P', '--partition-min-commits', type=int, default=PARTITION_MIN_COMMITS_DEFAULT,
+                        help='Scan the repositories with at least this many commits in partitions (0 to never split)')
+    parser.add_argument('--stages', type=str, default=','.join(STAGES),
+                        help='The stages to run, separated by commas ({0})'.format(','.join(STAGES)))
+    parser.add_argument('-o', '--output', type=str, help='Save the results to this json file')
+    parser.add_argument('--baseline', type=str, help='Compare the results with a json file of a previous run')
+    parser.add_argument('--run-stage', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        stage, config = args.run_stage
+        print(RESULT_LINE_PREFIX + json.dumps(run_stage(stage, json.loads(config))))
+        return
+
+    stages = [stage for stage in args.stages.split(',') if stage]
+    if any(stage not in STAGES for stage in stages):
+        parser.error('Unknown stage in {0}'.format(args.stages))
+
+    repositories_root = tempfile.mkdtemp(prefix='kingit-benchmark-repos-')
+    try:
+        print('(+) Generating {0} repositories with {1} commits each'.format(args.repositories, args.commits))
+        repositories, repositories_stats = generate_repositories(
+            repositories_root, args.repositories, args.commits, args.files_per_commit, args.lines_per_file,
+            args.line_length, args.secret_every)
+
+        with FakeGitlab(repositories=repositories, projects_count=args.projects, variables_per_project=args.variables,
+                        latency_seconds=args.latency, rate_limit=args.rate_limit) as fake_gitlab:
+            config = {'instance': fake_gitlab.url, 'repositories': [os.path.basename(path) for path in repositories],
+                      'projects': args.projects, 'threads': args.threads, 'max_requests': args.max_requests,
+                      'scan_workers': args.scan_workers, 'scan_method': args.scan_method, 'engine': args.engine,
+                      'partition_min_commits': args.partition_min_commits}
+
+            results = {}
+            for stage in stages:
+                print('(+) Running the {0} stage'.format(stage))
+                result = run_stage_process(stage, config)
+                result['projects_per_second'] = result['projects'] / result['seconds']
+                if stage == STAGE_CODE:
+                    result['commits_per_second'] = repositories_stats['commits'] / result['seconds']
+                    result['diff_mb_per_second'] = repositories_stats['diff_bytes'] / BYTES_IN_MB / result['seconds']
+                    result['planted_secrets'] = repositories_stats['secrets']
+                results[stage] = result
+            requests_count, throttled_count = fake_gitlab.requests_count, fake_gitlab.throttled_count
+    finally:
+        shutil.rmtree(repositories_root, ignore_errors=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding=UTF_8_ENCODING) as file:
+            baseline = json.load(file)
+    print(format_report(results, baseline))
+    print('(+) The fake instance served {0} requests ({1} throttled)'.format(requests_count, throttled_count))
+    if STAGE_CODE in results:
+        print('(+) Planted {0} secrets, found {1}'.format(results[STAGE_CODE]['planted_secrets'],
+                                                          results[STAGE_CODE]['findings']))
+
+    if args.output:
+        with open(args.output, MODE_WRITE, encoding=UTF_8_ENCODING) as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+import os
+import re
+import json
+import time
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+FAKE_PRIVATE_TOKEN = 'benchmark-token'
+GROUPS_COUNT = 100
+DEFAULT_PER_PAGE = 20
+MAX_OFFSET_PAGINATION_PROJECTS = 10000
+REPOSITORIES_PATH_PREFIX = '/repos/'
+RE_PROJECT_PATH = re.compile(r'^/api/v4/projects/(\d+)(/.*)?$')
+RE_GROUP_PATH = re.compile(r'^/api/v4/groups/(\d+)(/variables)?$')
+RE_COMMIT_DIFF_PATH = re.compile(r'^/repository/commits/([0-9a-f]+)/diff$')
+
+
+def git_output(repository_path: str, *args: str):
+    return subprocess.run(['git', '-C', repository_path, *args], capture_output=True, text=True,
+                          errors='replace').stdout
+
+
+def git_diffs(repository_path: str, from_commit: str, to_commit: str):
+    """
+    This function returns the diffs between two commits (or of a single commit) in the format of the gitlab api.
+    :param repository_path: String. The path of the repository.
+    :param from_commit: String. The commit to compare from, or None to get the diffs of 'to_commit' itself.
+    :param to_commit: String. The commit to compare to.
+    :return: List<Dictionary>. The diffs.
+    """
+
+    if from_commit:
+        output = git_output(repository_path, 'diff', '--no-renames', from_commit, to_commit)
+    else:
+        output = git_output(repository_path, 'show', '--format=', '--no-renames', to_commit)
+
+    diffs = []
+    for chunk in re.split(r'^diff --git ', output, flags=re.M)[1:]:
+        header, _, body = chunk.partition('\n@@')
+        new_path = None
+        for line in header.split('\n'):
+            if line.startswith('+++ b/'):
+                new_path = line[len('+++ b/'):]
+            elif line.startswith('--- a/') and not new_path:
+                new_path = line[len('--- a/'):]
+        diffs.append({'new_path': new_path, 'diff': '@@' + body if body else '', 'new_file': 'new file' in header,
+                      'deleted_file': 'deleted file' in header, 'renamed_file': False})
+    return diffs
+
+
+class FakeGitlab:
+    def __init__(self, repositories: list[str], projects_count: int, variables_per_project: int = 1,
+                 latency_seconds: float = 0.0, rate_limit: int = 0, port: int = 0):
+        """
+        Initialization method for the 'FakeGitlab' class.
+        The fake serves the parts of the gitlab api that the tool uses, and the repositories over the dumb http
+        protocol, from a background thread. Every request waits 'latency_seconds' before it is answered, and requests
+        beyond 'rate_limit' per second are answered with 429, like a rate limited gitlab instance.
+        :param repositories: List<String>. The paths of the bare repositories. Project 'n' is the repository
+        'n - 1' (modulo their number).
+        :param projects_count: Integer. The number of projects of the instance.
+        :param variables_per_project: Integer. The number of cicd variables of every project and group.
+        :param latency_seconds: Float. The latency of every request.
+        :param rate_limit: Integer. The number of requests per second that are served (0 for no limit).
+        :param port: Integer. The port to listen on (0 for any free port).
+        """
+
+        self.repositories: list[str] = repositories
+        self.projects_count: int = projects_count
+        self.variables_per_project: int = variables_per_project
+        self.latency_seconds: float = latency_seconds
+        self.rate_limit: int = rate_limit
+
+        # The window of the rate limit: its second and the number of requests in it.
+        self.window: list = [0, 0]
+        self.lock: threading.Lock = threading.Lock()
+        self.requests_count: int = 0
+        self.throttled_count: int = 0
+
+        fake = self
+
+        class Handler(FakeGitlabHandler):
+            gitlab = fake
+
+        self.server: ThreadingHTTPServer = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.thread: threading.Thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+
+    def repository_of(self, proj_id: int):
+        return self.repositories[(proj_id - 1) % len(self.repositories)]
+
+    def clone_url_of(self, proj_id: int):
+        return self.url + REPOSITORIES_PATH_PREFIX + os.path.basename(self.repository_of(proj_id))
+
+    def throttle(self):
+        """
+        This function counts a request in the window of the rate limit.
+        :return: Tuple. The number of requests that are left in the window (negative if it is exceeded), and the second
+        that the window resets at.
+        """
+
+        with self.lock:
+            self.requests_count += 1
+            now = int(time.time())
+            if self.window[0] != now:
+                self.window = [now, 0]
+            self.window[1] += 1
+            remaining = self.rate_limit - self.window[1]
+            if self.rate_limit and remaining < 0:
+                self.throttled_count += 1
+            return remaining, now + 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeGitlabHandler(BaseHTTPRequestHandler):
+    # Keep the connections of the clients open, like gitlab does.
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    gitlab: FakeGitlab = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, headers: dict = None, content_type: str = 'application/json'):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, headers: dict = None):
+        self.send_body(200, json.dumps(data).encode(), headers)
+
+    def send_page(self, items: list, query: dict, headers: dict = None):
+        per_page = int(query.get('per_page', [DEFAULT_PER_PAGE])[0])
+        page = int(query.get('page', ['1'])[0])
+        headers = dict(headers or {})
+        if page * per_page < len(items):
+            headers['X-Next-Page'] = str(page + 1)
+        self.send_json(items[(page - 1) * per_page:page * per_page], headers)
+
+    def do_GET(self):
+        gitlab = self.gitlab
+        if gitlab.latency_seconds:
+            time.sleep(gitlab.latency_seconds)
+
+        headers = {}
+        if gitlab.rate_limit:
+            remaining, reset_time = gitlab.throttle()
+            if remaining < 0:
+                return self.send_body(429, b'', {'Retry-After': '1', 'RateLimit-Remaining': '0',
+                                                 'RateLimit-Reset': str(reset_time)})
+            headers = {'RateLimit-Remaining': str(remaining), 'RateLimit-Reset': str(reset_time)}
+        else:
+            gitlab.throttle()
+
+        url = urlparse(self.path)
+        if url.path.startswith(REPOSITORIES_PATH_PREFIX):
+            return self.send_repository_file(url.path[len(REPOSITORIES_PATH_PREFIX):])
+        if self.headers.get('PRIVATE-TOKEN') != FAKE_PRIVATE_TOKEN:
+            return self.send_body(401, b'{"message": "401 Unauthorized"}')
+
+        query = parse_qs(url.query)
+        if url.path == '/api/v4/projects':
+            return self.send_projects(query, headers)
+        if url.path == '/api/v4/admin/ci/variables':
+            return self.send_page([{'key': 'INSTANCE_{0}'.format(i), 'value': 'value'} for i in range(3)], query,
+                                  headers)
+
+        match = RE_GROUP_PATH.match(url.path)
+        if match:
+            group_id = int(match[1])
+            if match[2]:
+                return self.send_page(self.variables('GROUP_{0}'.format(group_id)), query, headers)
+            return self.send_json({'id': group_id, 'web_url': '{0}/groups/g{1}'.format(gitlab.url, group_id),
+                                   'parent_id': None}, headers)
+
+        match = RE_PROJECT_PATH.match(url.path)
+        if match and int(match[1]) <= gitlab.projects_count:
+            return self.send_project_path(int(match[1]), match[2] or '', query, headers)
+
+        self.send_body(404, b'{"message": "404 Not Found"}', headers)
+
+    def variables(self, prefix: str):
+        return [{'key': '{0}_{1}'.format(prefix, i), 'value': 'secret-value-{0}'.format(i)}
+                for i in range(self.gitlab.variables_per_project)]
+
+    def project(self, proj_id: int):
+        return {'id': proj_id, 'http_url_to_repo': self.gitlab.clone_url_of(proj_id),
+                'namespace': {'id': proj_id % GROUPS_COUNT + 1, 'kind': 'group'}}
+
+    def send_projects(self, query: dict, headers: dict):
+        """
+        This function serves the list of the projects, with offset pagination (which tells the total number of pages for
+        up to 10,000 projects) or with keyset pagination (which links to the next page).
+        """
+
+        per_page = int(query.get('per_page', [DEFAULT_PER_PAGE])[0])
+        if query.get('pagination') == ['keyset']:
+            id_after = int(query.get('id_after', ['0'])[0])
+            ids = range(id_after + 1, min(id_after + per_page, self.gitlab.projects_count) + 1)
+            if ids and ids[-1] < self.gitlab.projects_count:
+                headers['Link'] = '<{0}/api/v4/projects?pagination=keyset&statistics=true&order_by=id&sort=asc' \
+                                  '&per_page={1}&id_after={2}>; rel="next"'.format(self.gitlab.url, per_page, ids[-1])
+            return self.send_json([self.project(proj_id) for proj_id in ids], headers)
+
+        page = int(query.get('page', ['1'])[0])
+        ids = range((page - 1) * per_page + 1, min(page * per_page, self.gitlab.projects_count) + 1)
+        if self.gitlab.projects_count <= MAX_OFFSET_PAGINATION_PROJECTS:
+            headers['X-Total-Pages'] = str(-(-self.gitlab.projects_count // per_page))
+        self.send_json([self.project(proj_id) for proj_id in ids], headers)
+
+    def send_project_path(self, proj_id: int, path: str, query: dict, headers: dict):
+        repository_path = self.gitlab.repository_of(proj_id)
+        if not path:
+            project = self.project(proj_id)
+            project['statistics'] = {
+                'commit_count': int(git_output(repository_path, 'rev-list', '--all', '--count') or 0),
+                'repository_size': sum(os.path.getsize(os.path.join(root, name))
+                                       for root, _, names in os.walk(repository_path) for name in names)}
+            return self.send_json(project, headers)
+        if path == '/variables':
+            return self.send_page(self.variables('PROJECT_{0}'.format(proj_id)), query, headers)
+        if path == '/repository/commits':
+            commits = [{'id': line.split()[0], 'parent_ids': line.split()[1:]}
+                       for line in git_output(repository_path, 'rev-list', '--all', '--parents').splitlines()]
+            return self.send_page(commits, query, headers)
+        if path == '/repository/compare':
+            return self.send_json({'diffs': git_diffs(repository_path, query['from'][0], query['to'][0]),
+                                   'compare_timeout': False}, headers)
+        match = RE_COMMIT_DIFF_PATH.match(path)
+        if match:
+            return self.send_page(git_diffs(repository_path, None, match[1]), query, headers)
+        self.send_body(404, b'{"message": "404 Not Found"}', headers)
+
+    def send_repository_file(self, path: str):
+        """
+        This function serves a file of a repository over the dumb http protocol, which git clones from without a git
+        server.
+        """
+
+        name, _, file_path = path.partition('/')
+        repositories = {os.path.basename(repository): repository for repository in self.gitlab.repositories}
+        repository_path = repositories.get(name) or repositories.get(name + '.git')
+        full_path = os.path.realpath(os.path.join(repository_path or '', file_path))
+        if not repository_path or not full_path.startswith(os.path.realpath(repository_path)) or \
+                not os.path.isfile(full_path):
+            return self.send_body(404, b'')
+        with open(full_path, 'rb') as file:
+            self.send_body(200, file.read(), content_type='application/octet-stream')
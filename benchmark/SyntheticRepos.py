@@ -0,0 +1,116 @@
+import os
+import random
+import string
+import subprocess
+
+
+# Tokens that the generated lines are made of, so the content looks like code and not like random bytes.
+CODE_TOKENS = ['def', 'return', 'self', 'value', 'item', 'index', 'count', 'result', 'config', 'client', 'request',
+               'response', 'import', 'from', 'class', 'for', 'in', 'if', 'else', 'None', 'True', 'False', '=', '==',
+               '(', ')', '[', ']', '{', '}', ':', ',', '+', '-', '0', '1', '42', "'name'", '"path"', 'os.path.join',
+               'print', 'len', 'range', 'list', 'dict', 'append', 'update', 'logger.info', 'data', 'payload']
+FILES_PER_REPOSITORY = 10
+GIT_FAST_IMPORT = ['git', 'fast-import', '--quiet']
+GIT_INIT_BARE = ['git', 'init', '--bare', '--quiet', '--initial-branch=main']
+GIT_UPDATE_SERVER_INFO = ['git', 'update-server-info']
+COMMITTER = 'Benchmark <benchmark@example.com>'
+FIRST_COMMIT_TIME = 1600000000
+
+
+def planted_secret(rng: random.Random):
+    """
+    This function generates a fake secret that the default patterns find (a GitHub personal access token).
+    :param rng: random.Random. The random generator.
+    :return: String. The secret.
+    """
+
+    return 'ghp_' + ''.join(rng.choices(string.ascii_letters + string.digits, k=36))
+
+
+def generate_lines(rng: random.Random, count: int, line_length: int):
+    """
+    This function generates lines of code-like content.
+    :param rng: random.Random. The random generator.
+    :param count: Integer. The number of lines.
+    :param line_length: Integer. The approximate length of every line.
+    :return: List<String>. The lines.
+    """
+
+    tokens_per_line = max(1, line_length // 6)
+    return [' '.join(rng.choices(CODE_TOKENS, k=tokens_per_line)) for _ in range(count)]
+
+
+def generate_repository(path: str, commits: int, files_per_commit: int, lines_per_file: int, line_length: int,
+                        secret_every: int, seed: int):
+    """
+    This function generates a bare git repository with a linear history. Every commit rewrites some of the files of the
+    repository, so every diff adds 'lines_per_file' lines to every changed file.
+    The repository can be served over the dumb HTTP protocol (e.g. by 'FakeGitlab').
+    :param path: String. The path of the repository. It must not exist.
+    :param commits: Integer. The number of commits.
+    :param files_per_commit: Integer. The number of files that every commit changes.
+    :param lines_per_file: Integer. The number of lines that every commit adds to every changed file.
+    :param line_length: Integer. The approximate length of every added line.
+    :param secret_every: Integer. A secret is planted in every 'secret_every'-th commit (0 to plant no secrets).
+    :param seed: Integer. The seed of the random generator, so the same repository is generated every time.
+    :return: Dictionary. The number of commits, the number of bytes that the diffs added and the number of planted
+    secrets.
+    """
+
+    rng = random.Random(seed)
+    subprocess.run(GIT_INIT_BARE + [path], check=True)
+
+    stats = {'commits': commits, 'diff_bytes': 0, 'secrets': 0}
+    fast_import = subprocess.Popen(GIT_FAST_IMPORT, stdin=subprocess.PIPE, cwd=path)
+    with fast_import.stdin as stream:
+        for commit_index in range(commits):
+            changed_files = []
+            for file_index in range(files_per_commit):
+                lines = generate_lines(rng, lines_per_file, line_length)
+                if secret_every and commit_index % secret_every == 0 and file_index == 0:
+                    lines[rng.randrange(len(lines))] = "token = '{0}'".format(planted_secret(rng))
+                    stats['secrets'] += 1
+                content = ('\n'.join(lines) + '\n').encode()
+                stats['diff_bytes'] += len(content)
+                changed_files.append(('src/file_{0}.py'.format((commit_index * files_per_commit + file_index) %
+                                                               FILES_PER_REPOSITORY), content))
+
+            message = 'Commit {0}\n'.format(commit_index).encode()
+            stream.write('commit refs/heads/main\ncommitter {0} {1} +0000\ndata {2}\n'.format(
+                COMMITTER, FIRST_COMMIT_TIME + commit_index, len(message)).encode() + message)
+            for file_path, content in changed_files:
+                stream.write('M 100644 inline {0}\ndata {1}\n'.format(file_path, len(content)).encode() + content)
+            stream.write(b'\n')
+
+    if fast_import.wait() != 0:
+        raise RuntimeError('git fast-import failed for {0}'.format(path))
+    subprocess.run(GIT_UPDATE_SERVER_INFO, check=True, cwd=path)
+    return stats
+
+
+def generate_repositories(root: str, count: int, commits: int, files_per_commit: int, lines_per_file: int,
+                          line_length: int, secret_every: int, seed: int = 0):
+    """
+    This function generates a set of bare repositories, named 'repo_<index>.git'.
+    :param root: String. The directory of the repositories.
+    :param count: Integer. The number of repositories.
+    :param commits: Integer. The number of commits in every repository.
+    :param files_per_commit: Integer. The number of files that every commit changes.
+    :param lines_per_file: Integer. The number of lines that every commit adds to every changed file.
+    :param line_length: Integer. The approximate length of every added line.
+    :param secret_every: Integer. A secret is planted in every 'secret_every'-th commit (0 to plant no secrets).
+    :param seed: Integer. The base seed of the random generator.
+    :return: Tuple. The paths of the repositories, and their total stats (like 'generate_repository').
+    """
+
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    total_stats = {'commits': 0, 'diff_bytes': 0, 'secrets': 0}
+    for index in range(count):
+        path = os.path.join(root, 'repo_{0}.git'.format(index))
+        stats = generate_repository(path, commits, files_per_commit, lines_per_file, line_length, secret_every,
+                                    seed + index)
+        for key, value in stats.items():
+            total_stats[key] += value
+        paths.append(path)
+    return paths, total_stats
@@ -8,28 +8,136 @@ config.read('config.conf')
 # ------------------------------
 PATTERNS_PATH_DEFAULT = config['PATHS']['PATTERNS_PATH_CONF']
 TEMP_FOLDER_NAME_DEFAULT = config['PATHS']['TEMP_FOLDER_NAME_CONF']
+SCRATCH_PATH_DEFAULT = config['PATHS']['SCRATCH_PATH_CONF']
 RESULTS_FOLDER_NAME_DEFAULT = config['PATHS']['RESULTS_FOLDER_NAME_CONF']
 SECRETS_FILE_NAME_DEFAULT = config['PATHS']['SECERTS_FILENAME_CONF']
 CICD_VARS_FILE_NAME_DEFAULT = config['PATHS']['CICD_VARS_FILENAME_CONF']
 MAX_SECRETS_BEFORE_SAVING_DEFAULT = int(config['EFFICIENCY']['MAX_SECRETS_BEFORE_SAVING_CONF'])
 NUMBER_OF_THREADS_DEFAULT = int(config['EFFICIENCY']['NUMBER_OF_THREADS_CONF'])
+NUMBER_OF_SCAN_WORKERS_DEFAULT = int(config['EFFICIENCY']['NUMBER_OF_SCAN_WORKERS_CONF'])
+MIRROR_CACHE_PATH_DEFAULT = config['EFFICIENCY']['MIRROR_CACHE_PATH_CONF']
+MIRROR_CACHE_MAX_SIZE_MB_DEFAULT = int(config['EFFICIENCY']['MIRROR_CACHE_MAX_SIZE_MB_CONF'])
 SAVE_PROJECTS_URLS_FILE_NAME_DEFAULT = config['PATHS']['SAVE_PROJECTS_URLS_FILE_NAME_CONF']
+SCAN_STATE_FILE_NAME_DEFAULT = config['PATHS']['SCAN_STATE_FILENAME_CONF']
+CATALOG_FILE_NAME_DEFAULT = config['PATHS']['CATALOG_FILENAME_CONF']
+INCREMENTAL_SCAN_DEFAULT = config['EFFICIENCY'].getboolean('INCREMENTAL_SCAN_CONF')
+DEDUPLICATE_COMMITS_DEFAULT = config['EFFICIENCY'].getboolean('DEDUPLICATE_COMMITS_CONF')
+SCAN_METHOD_DEFAULT = config['EFFICIENCY']['SCAN_METHOD_CONF']
+SCAN_ENGINE_DEFAULT = config['EFFICIENCY']['SCAN_ENGINE_CONF']
+PARTITION_MIN_COMMITS_DEFAULT = int(config['EFFICIENCY']['PARTITION_MIN_COMMITS_CONF'])
+SCAN_ORDER_DEFAULT = config['EFFICIENCY']['SCAN_ORDER_CONF']
+SCAN_SCHEDULE_WINDOW_DEFAULT = int(config['EFFICIENCY']['SCAN_SCHEDULE_WINDOW_CONF'])
+SKIP_ARCHIVED_DEFAULT = config['EFFICIENCY'].getboolean('SKIP_ARCHIVED_CONF')
+LAST_ACTIVITY_AFTER_DEFAULT = config['EFFICIENCY']['LAST_ACTIVITY_AFTER_CONF']
+CLONE_MODE_DEFAULT = config['EFFICIENCY']['CLONE_MODE_CONF']
+CLONE_BLOB_FILTER_DEFAULT = config['EFFICIENCY'].getboolean('CLONE_BLOB_FILTER_CONF')
+WORK_LEASE_SECONDS_DEFAULT = int(config['EFFICIENCY']['WORK_LEASE_SECONDS_CONF'])
+WORK_QUEUE_POLL_SECONDS_DEFAULT = float(config['EFFICIENCY']['WORK_QUEUE_POLL_SECONDS_CONF'])
+WORK_MAX_ATTEMPTS_DEFAULT = int(config['EFFICIENCY']['WORK_MAX_ATTEMPTS_CONF'])
+API_SCAN_MAX_COMMITS_DEFAULT = int(config['EFFICIENCY']['API_SCAN_MAX_COMMITS_CONF'])
+API_SCAN_MAX_REPOSITORY_SIZE_MB_DEFAULT = int(config['EFFICIENCY']['API_SCAN_MAX_REPOSITORY_SIZE_MB_CONF'])
+API_SCAN_CONCURRENCY_DEFAULT = int(config['EFFICIENCY']['API_SCAN_CONCURRENCY_CONF'])
+MAX_REQUESTS_IN_FLIGHT_DEFAULT = int(config['EFFICIENCY']['MAX_REQUESTS_IN_FLIGHT_CONF'])
+HTTP_TIMEOUT_SECONDS = int(config['EFFICIENCY']['HTTP_TIMEOUT_SECONDS_CONF'])
+HTTP_MAX_RETRIES_DEFAULT = int(config['EFFICIENCY']['HTTP_MAX_RETRIES_CONF'])
+CICD_WORKERS_DEFAULT = int(config['EFFICIENCY']['CICD_WORKERS_CONF'])
+PIPELINE_QUEUE_SIZE_DEFAULT = int(config['EFFICIENCY']['PIPELINE_QUEUE_SIZE_CONF'])
 OUTPUT_FOLDER_PATH_DEFAULT = config['PATHS']['OUTPUT_FOLDER_PATH']
+FINDINGS_SINKS_DEFAULT = [sink_name.strip().lower() for sink_name in config['PATHS']['FINDINGS_SINKS_CONF'].split(',')]
+FINDINGS_DB_FILE_NAME_DEFAULT = config['PATHS']['FINDINGS_DB_FILENAME_CONF']
+FINDINGS_FLUSH_SECONDS_DEFAULT = int(config['EFFICIENCY']['FINDINGS_FLUSH_SECONDS_CONF'])
+STATS_FILE_NAME_DEFAULT = config['PATHS']['STATS_FILENAME_CONF']
+METRICS_FILE_NAME_DEFAULT = config['PATHS']['METRICS_FILENAME_CONF']
+SUMMARY_FILE_NAME_DEFAULT = config['PATHS']['SUMMARY_FILENAME_CONF']
+JOURNAL_FILE_NAME_DEFAULT = config['PATHS']['JOURNAL_FILENAME_CONF']
+STATS_INTERVAL_SECONDS_DEFAULT = int(config['EFFICIENCY']['STATS_INTERVAL_SECONDS_CONF'])
+INCLUDE_PATHS_DEFAULT = config['EFFICIENCY']['INCLUDE_PATHS_CONF']
+EXCLUDE_PATHS_DEFAULT = config['EFFICIENCY']['EXCLUDE_PATHS_CONF']
+MAX_DIFF_SIZE_KB_DEFAULT = int(config['EFFICIENCY']['MAX_DIFF_SIZE_KB_CONF'])
 
 # ------------------------------
 # Gitlab API Constants
 # ------------------------------
-PROJECTS_API_URL_FORMAT = '{0}/api/v4/projects?private_token={1}&per_page=100&page={2}'
-VARIABLES_API_URL_FORMAT = '{0}/api/v4/projects/{1}/variables?private_token={2}'
-COMMITS_API_URL_FORMAT = '{0}/api/v4/projects/{1}/repository/commits?all=true'
+PROJECTS_API_URL_FORMAT = '{0}/api/v4/projects?statistics=true&order_by=id&sort=asc&per_page=100&page={1}'
+# Appended to the urls of the projects, to enumerate only the projects with activity since the specified time.
+PROJECTS_LAST_ACTIVITY_AFTER_QUERY = '&last_activity_after={0}'
+PROJECTS_KEYSET_API_URL_FORMAT = '{0}/api/v4/projects?statistics=true&pagination=keyset&order_by=id&sort=asc' \
+                                 '&per_page=100'
+VARIABLES_API_URL_FORMAT = '{0}/api/v4/projects/{1}/variables?per_page=100&page={2}'
+GROUP_API_URL_FORMAT = '{0}/api/v4/groups/{1}?with_projects=false'
+GROUP_VARIABLES_API_URL_FORMAT = '{0}/api/v4/groups/{1}/variables?per_page=100&page={2}'
+INSTANCE_VARIABLES_API_URL_FORMAT = '{0}/api/v4/admin/ci/variables?per_page=100&page={1}'
+COMMITS_API_URL_FORMAT = '{0}/api/v4/projects/{1}/repository/commits?all=true&per_page=100&page={2}'
 DIFF_API_URL_FORMAT = '{0}/api/v4/projects/{1}/repository/compare?from={2}&to={3}'
+COMMIT_DIFF_API_URL_FORMAT = '{0}/api/v4/projects/{1}/repository/commits/{2}/diff?per_page=100&page={3}'
+PRIVATE_TOKEN_HEADER = 'PRIVATE-TOKEN'
+API_NEXT_PAGE_HEADER = 'X-Next-Page'
+API_TOTAL_PAGES_HEADER = 'X-Total-Pages'
+API_LINK_HEADER = 'Link'
+API_RETRY_AFTER_HEADER = 'Retry-After'
+API_RATE_LIMIT_REMAINING_HEADER = 'RateLimit-Remaining'
+API_RATE_LIMIT_RESET_HEADER = 'RateLimit-Reset'
+API_PROJECT_STATISTICS = 'statistics'
+API_PROJECT_NAMESPACE = 'namespace'
+API_PROJECT_EMPTY_REPO = 'empty_repo'
+API_PROJECT_ARCHIVED = 'archived'
+API_PROJECT_LAST_ACTIVITY_AT = 'last_activity_at'
+API_NAMESPACE_KIND = 'kind'
+API_NAMESPACE_KIND_GROUP = 'group'
+API_GROUP_PARENT_ID = 'parent_id'
+API_GROUP_WEB_URL = 'web_url'
+API_STATISTICS_REPOSITORY_SIZE = 'repository_size'
+API_COMMIT_ID = 'id'
+API_COMMIT_PARENT_IDS = 'parent_ids'
+API_COMPARE_DIFFS = 'diffs'
+API_COMPARE_TIMEOUT = 'compare_timeout'
+API_DIFF_CONTENT = 'diff'
+API_DIFF_NEW_PATH = 'new_path'
+API_DIFF_DELETED_FILE = 'deleted_file'
+API_DIFF_RENAMED_FILE = 'renamed_file'
+API_DIFF_TOO_LARGE = 'too_large'
+API_DIFF_COLLAPSED = 'collapsed'
+
+# ------------------------------
+# HTTP requests
+# ------------------------------
+HTTP_THROTTLED_STATUSES = (429, 503)
+HTTP_RETRY_STATUSES = (0, 429, 500, 502, 503, 504)
+# The user is not allowed to get the resource. Asking again will not change the answer.
+HTTP_DENIED_STATUSES = (401, 403, 404)
+HTTP_INITIAL_REQUESTS_IN_FLIGHT = 10
+HTTP_BACKOFF_BASE_SECONDS = 1
+HTTP_BACKOFF_MAX_SECONDS = 60
 
 # ------------------------------
 # Git CLI commands
 # ------------------------------
 GIT_CLONE = 'git clone {0} {1}'
 GIT_CLONE_NOSSL = 'git clone -c http.sslVerify=false {0} {1}'
-GIT_GET_ALL_PROJECT_HISTORY = 'git log -p -U0 --full-history --all --diff-filter=AM'
+GIT_CLONE_BARE = 'git clone --bare {0} {1}'
+GIT_CLONE_BARE_NOSSL = 'git clone --bare -c http.sslVerify=false {0} {1}'
+# A partial clone, without the blobs that are bigger than the size limit ({2} bytes).
+GIT_CLONE_BARE_FILTER = 'git clone --bare --filter=blob:limit={2} {0} {1}'
+GIT_CLONE_BARE_FILTER_NOSSL = 'git clone --bare --filter=blob:limit={2} -c http.sslVerify=false {0} {1}'
+GIT_FETCH_BARE = 'git fetch --prune --tags {0} +refs/heads/*:refs/heads/*'
+GIT_FETCH_BARE_NOSSL = 'git -c http.sslVerify=false fetch --prune --tags {0} +refs/heads/*:refs/heads/*'
+GIT_SET_ORIGIN_URL = 'git remote set-url origin {0}'
+GIT_GET_ALL_PROJECT_HISTORY = 'git log -p -U0 --full-history --all --diff-filter=AM --full-index --stdin'
+# The diffs of the commits that are listed in the stdin, and of them only.
+GIT_GET_COMMITS_DIFFS = 'git log -p -U0 --full-history --no-walk=unsorted --diff-filter=AM --full-index --stdin'
+GIT_GET_REF_TIPS = 'git rev-parse --all'
+# Every line is a commit followed by its parents. A commit is never listed after its parents.
+GIT_GET_ALL_COMMITS = 'git rev-list --all --topo-order --parents --stdin'
+GIT_CHECK_OBJECTS = 'git cat-file --batch-check'
+GIT_LIST_ALL_OBJECTS = 'git cat-file --batch-all-objects --unordered --batch-check'
+GIT_READ_OBJECTS = 'git cat-file --batch'
+GIT_GET_INTRODUCED_BLOBS = 'git log --format=%H --raw --no-abbrev --no-renames --full-history --all --diff-filter=AM ' \
+                           '--stdin'
+GIT_OBJECT_TYPE_BLOB = 'blob'
+GIT_RAW_DIFF_PREFIX = ':'
+# Git treats a file as binary if there is a null byte in its first 8000 bytes.
+GIT_BINARY_CHECK_BYTES = 8000
+GIT_MISSING_OBJECT_SUFFIX = ' missing'
 
 # ------------------------------
 # Modes Options
@@ -38,11 +146,321 @@ MODE_CICD_VARIABLES = 'C'
 MODE_CODE_SECRETS = 'S'
 MODE_ALL = 'A'
 
+# ------------------------------
+# Scan methods Options
+# ------------------------------
+SCAN_METHOD_AUTO = 'auto'
+SCAN_METHOD_CLONE = 'clone'
+SCAN_METHOD_API = 'api'
+SCAN_ENGINE_DIFF = 'diff'
+SCAN_ENGINE_BLOB = 'blob'
+SCAN_ENGINES = [SCAN_ENGINE_DIFF, SCAN_ENGINE_BLOB]
+# The orders that the enumerated projects are scanned in: the biggest repositories first, the most recently active
+# projects first, or the order of the api.
+SCAN_ORDER_SIZE = 'size'
+SCAN_ORDER_ACTIVITY = 'activity'
+SCAN_ORDER_API = 'api'
+SCAN_ORDERS = [SCAN_ORDER_SIZE, SCAN_ORDER_ACTIVITY, SCAN_ORDER_API]
+# How the projects are cloned for scanning: without a working tree (nothing reads it), or with a checked out one.
+CLONE_MODE_BARE = 'bare'
+CLONE_MODE_CHECKOUT = 'checkout'
+CLONE_MODES = [CLONE_MODE_BARE, CLONE_MODE_CHECKOUT]
+
 # ------------------------------
 # Regex patterns
 # ------------------------------
-RE_SPLIT_TO_COMMITS = 'commit ([a-z0-9]{40})(\\\\nAuthor:)'
-RE_SPLIT_TO_DIFFS = '\\\\ndiff --git'
+RE_LINK_HEADER_NEXT_URL = '<([^>]+)>; *rel="next"'
+RE_HUNK_HEADER = '@@ -\\d+(?:,(\\d+))? \\+(\\d+)(?:,(\\d+))? @@'
+
+# ------------------------------
+# Git output parsing
+# ------------------------------
+CODE_SECRET_LOCATION_FORMAT = '{0}/-/tree/{1}'
+TREE_PATH_FORMAT = '{0}/{1}'
+GIT_LOG_COMMIT_PREFIX = 'commit '
+GIT_DIFF_HEADER_PREFIX = 'diff --git '
+GIT_DIFF_NEW_FILE_PREFIX = '+++ '
+GIT_DIFF_NEW_FILE_PATH_PREFIX = 'b/'
+GIT_DIFF_INDEX_PREFIX = 'index '
+GIT_DIFF_BINARY_PREFIX = 'Binary files '
+GIT_CONFIG_OPTION = '-c'
+GIT_BIG_FILE_THRESHOLD_CONFIG = 'core.bigFileThreshold={0}'
+GIT_PATHSPEC_SEPARATOR = '--'
+GIT_PATHSPEC_INCLUDE_FORMAT = ':(glob){0}'
+GIT_PATHSPEC_EXCLUDE_FORMAT = ':(exclude,glob,icase){0}'
+GIT_PATHSPEC_ALL = ':(glob)**'
+# Files with these extensions are always binary, so they are never scanned.
+BINARY_FILE_EXTENSIONS = ['png', 'jpg', 'jpeg', 'gif', 'bmp', 'ico', 'webp', 'tif', 'tiff', 'psd', 'pdf', 'zip', 'gz',
+                          'tgz', 'bz2', 'xz', '7z', 'rar', 'jar', 'war', 'ear', 'class', 'so', 'dll', 'dylib', 'exe',
+                          'pyc', 'woff', 'woff2', 'ttf', 'otf', 'eot', 'mp3', 'mp4', 'wav', 'ogg', 'avi', 'mov', 'mkv',
+                          'flac', 'iso', 'dmg']
+SKIP_REASON_BINARY = 'binary'
+SKIP_REASON_SIZE = 'size'
+SKIP_REASON_EMPTY = 'empty'
+SKIP_REASON_ARCHIVED = 'archived'
+SKIP_REASON_INACTIVE = 'inactive'
+NULLED_FILE_PATH = 'nulled_file_path'
+
+# ------------------------------
+# Scan state
+# ------------------------------
+SQL_CREATE_SCANNED_TIPS_TABLE = 'CREATE TABLE IF NOT EXISTS scanned_tips (instance TEXT NOT NULL, ' \
+                                'project_id INTEGER NOT NULL, tip TEXT NOT NULL, ' \
+                                'PRIMARY KEY (instance, project_id, tip))'
+SQL_SELECT_SCANNED_TIPS = 'SELECT tip FROM scanned_tips WHERE instance = ? AND project_id = ?'
+SQL_DELETE_SCANNED_TIPS = 'DELETE FROM scanned_tips WHERE instance = ? AND project_id = ?'
+SQL_INSERT_SCANNED_TIP = 'INSERT INTO scanned_tips (instance, project_id, tip) VALUES (?, ?, ?)'
+SQL_ENABLE_WAL = 'PRAGMA journal_mode=WAL'
+SQL_CREATE_SCANNED_COMMITS_TABLE = 'CREATE TABLE IF NOT EXISTS scanned_commits (hash TEXT PRIMARY KEY) WITHOUT ROWID'
+SQL_CREATE_COMMIT_FINDINGS_TABLE = 'CREATE TABLE IF NOT EXISTS commit_findings (hash TEXT NOT NULL, ' \
+                                   'category TEXT NOT NULL, sub_category TEXT NOT NULL, tree_path TEXT NOT NULL, ' \
+                                   'times_found INTEGER NOT NULL, ' \
+                                   'PRIMARY KEY (hash, category, sub_category, tree_path))'
+SQL_SELECT_SCANNED_COMMITS = 'SELECT hash FROM scanned_commits WHERE hash IN ({0})'
+SQL_SELECT_COMMIT_FINDINGS = 'SELECT category, sub_category, tree_path, times_found FROM commit_findings ' \
+                             'WHERE hash IN ({0})'
+SQL_INSERT_SCANNED_COMMIT = 'INSERT OR IGNORE INTO scanned_commits (hash) VALUES (?)'
+SQL_INSERT_COMMIT_FINDING = 'INSERT OR IGNORE INTO commit_findings (hash, category, sub_category, tree_path, ' \
+                            'times_found) VALUES (?, ?, ?, ?, ?)'
+SQL_MAX_VARIABLES = 500
+SQLITE_TIMEOUT_SECONDS = 60
+COMMIT_INDEX_FILE_NAME = 'commits_index.db'
+
+# ------------------------------
+# Project catalog
+# ------------------------------
+SQL_CREATE_CATALOG_TABLES = [
+    'CREATE TABLE IF NOT EXISTS catalog_projects (instance TEXT NOT NULL, project_id INTEGER NOT NULL, '
+    'url TEXT NOT NULL, group_id INTEGER, repository_size INTEGER, last_activity REAL, '
+    'empty_repo INTEGER NOT NULL DEFAULT 0, archived INTEGER NOT NULL DEFAULT 0, last_scanned REAL, '
+    'PRIMARY KEY (instance, project_id)) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS catalog_enumerations (instance TEXT PRIMARY KEY, last_enumerated REAL NOT NULL)',
+]
+SQL_UPSERT_CATALOG_PROJECT = 'INSERT INTO catalog_projects (instance, project_id, url, group_id, repository_size, ' \
+                             'last_activity, empty_repo, archived) VALUES (?, ?, ?, ?, ?, ?, ?, ?) ' \
+                             'ON CONFLICT (instance, project_id) DO UPDATE SET url = excluded.url, ' \
+                             'group_id = excluded.group_id, repository_size = excluded.repository_size, ' \
+                             'last_activity = excluded.last_activity, empty_repo = excluded.empty_repo, ' \
+                             'archived = excluded.archived'
+SQL_SET_CATALOG_LAST_SCANNED = 'UPDATE catalog_projects SET last_scanned = ? WHERE instance = ? AND project_id = ?'
+SQL_SELECT_CATALOG_LAST_ENUMERATED = 'SELECT last_enumerated FROM catalog_enumerations WHERE instance = ?'
+SQL_SET_CATALOG_LAST_ENUMERATED = 'INSERT OR REPLACE INTO catalog_enumerations (instance, last_enumerated) ' \
+                                  'VALUES (?, ?)'
+# Gitlab updates the last activity of a project at most once an hour, so a delta enumeration starts this long before
+# the previous enumeration did.
+DELTA_OVERLAP_SECONDS = 2 * 60 * 60
+API_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# ------------------------------
+# Work queue
+# ------------------------------
+WORK_ROLE_COORDINATOR = 'coordinator'
+WORK_ROLE_WORKER = 'worker'
+WORK_STATE_INSTANCE = 'instance'
+WORK_STATE_FILLED = 'filled'
+WORK_QUEUE_BATCH_SIZE = 1000
+WORK_QUEUE_BUSY_TIMEOUT_SECONDS = 60
+# The leases are renewed this many times before they would expire, so a slow renewal does not lose them.
+WORK_LEASE_RENEWALS_PER_LEASE = 3
+WORKER_ID_FORMAT = '{0}-{1}'
+WORKER_OUTPUT_FOLDER_FORMAT = '{0}-{1}'
+SQL_BEGIN_IMMEDIATE = 'BEGIN IMMEDIATE'
+SQL_CREATE_WORK_QUEUE_TABLES = [
+    'CREATE TABLE IF NOT EXISTS work_items (project_id INTEGER PRIMARY KEY, url TEXT NOT NULL, group_id INTEGER, '
+    'repository_size INTEGER, last_activity REAL, empty_repo INTEGER NOT NULL DEFAULT 0, '
+    'archived INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL DEFAULT \'pending\', worker TEXT, lease_expires REAL, '
+    'attempts INTEGER NOT NULL DEFAULT 0, findings TEXT, done_sequence INTEGER)',
+    'CREATE INDEX IF NOT EXISTS work_items_status ON work_items (status, repository_size)',
+    'CREATE INDEX IF NOT EXISTS work_items_done_sequence ON work_items (done_sequence)',
+    'CREATE TABLE IF NOT EXISTS work_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+]
+SQL_INSERT_WORK_STATE = 'INSERT OR IGNORE INTO work_state (key, value) VALUES (?, ?)'
+SQL_SET_WORK_STATE = 'INSERT OR REPLACE INTO work_state (key, value) VALUES (?, ?)'
+SQL_SELECT_WORK_STATE = 'SELECT value FROM work_state WHERE key = ?'
+SQL_DELETE_WORK_ITEMS = 'DELETE FROM work_items'
+# A project that is already in the queue keeps its status, unless it failed. Failed projects are tried again.
+SQL_INSERT_WORK_ITEM = 'INSERT INTO work_items (project_id, url, group_id, repository_size, last_activity, ' \
+                       'empty_repo, archived) VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (project_id) DO UPDATE SET ' \
+                       'status = \'pending\', attempts = 0 WHERE work_items.status = \'failed\''
+SQL_FAIL_EXPIRED_WORK_ITEMS = 'UPDATE work_items SET status = \'failed\', worker = NULL, lease_expires = NULL ' \
+                              'WHERE status = \'leased\' AND lease_expires < ? AND attempts >= ?'
+# The biggest repositories are handed out first, so they do not start last and keep the run waiting for them.
+SQL_SELECT_LEASABLE_WORK_ITEMS = 'SELECT project_id, url, group_id, repository_size, last_activity, empty_repo, ' \
+                                 'archived FROM work_items WHERE status = \'pending\' OR (status = \'leased\' AND ' \
+                                 'lease_expires < ?) ORDER BY repository_size DESC, project_id LIMIT ?'
+SQL_LEASE_WORK_ITEM = 'UPDATE work_items SET status = \'leased\', worker = ?, lease_expires = ?, ' \
+                      'attempts = attempts + 1 WHERE project_id = ?'
+SQL_RENEW_WORK_ITEM = 'UPDATE work_items SET lease_expires = ? WHERE project_id = ? AND worker = ? AND ' \
+                      'status = \'leased\''
+SQL_COMPLETE_WORK_ITEM = 'UPDATE work_items SET status = \'done\', findings = ?, lease_expires = NULL, ' \
+                         'done_sequence = (SELECT COALESCE(MAX(done_sequence), 0) + 1 FROM work_items) ' \
+                         'WHERE project_id = ? AND worker = ? AND status = \'leased\''
+SQL_RELEASE_WORK_ITEM = 'UPDATE work_items SET status = CASE WHEN attempts >= ? THEN \'failed\' ' \
+                        'ELSE \'pending\' END, worker = NULL, lease_expires = NULL ' \
+                        'WHERE project_id = ? AND worker = ? AND status = \'leased\''
+SQL_SELECT_COMPLETED_WORK_ITEMS = 'SELECT done_sequence, project_id, findings FROM work_items ' \
+                                  'WHERE done_sequence > ? ORDER BY done_sequence'
+SQL_SELECT_FAILED_WORK_ITEMS = 'SELECT project_id FROM work_items WHERE status = \'failed\''
+SQL_COUNT_UNFINISHED_WORK_ITEMS = 'SELECT COUNT(*) FROM work_items WHERE status IN (\'pending\', \'leased\')'
+
+# ------------------------------
+# Run journal
+# ------------------------------
+SQL_CREATE_JOURNAL_TABLES = [
+    'CREATE TABLE IF NOT EXISTS journal_projects (project_id INTEGER PRIMARY KEY, url TEXT NOT NULL, '
+    'group_id INTEGER, repository_size INTEGER, last_activity REAL, empty_repo INTEGER NOT NULL DEFAULT 0, '
+    'archived INTEGER NOT NULL DEFAULT 0, cicd_done INTEGER NOT NULL DEFAULT 0, scanned INTEGER NOT NULL DEFAULT 0)',
+    'CREATE TABLE IF NOT EXISTS journal_groups (group_id INTEGER PRIMARY KEY)',
+    'CREATE TABLE IF NOT EXISTS journal_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+]
+SQL_INSERT_JOURNAL_PROJECT = 'INSERT OR IGNORE INTO journal_projects (project_id, url, group_id, repository_size, ' \
+                             'last_activity, empty_repo, archived) VALUES (?, ?, ?, ?, ?, ?, ?)'
+SQL_MARK_JOURNAL_PROJECT = 'UPDATE journal_projects SET {0} = 1 WHERE project_id = ?'
+SQL_INSERT_JOURNAL_GROUP = 'INSERT OR IGNORE INTO journal_groups (group_id) VALUES (?)'
+SQL_SET_JOURNAL_STATE = 'INSERT OR REPLACE INTO journal_state (key, value) VALUES (?, ?)'
+SQL_SELECT_JOURNAL_STATE = 'SELECT key, value FROM journal_state'
+SQL_SELECT_JOURNAL_PROJECTS = 'SELECT project_id, url, group_id, repository_size, last_activity, empty_repo, ' \
+                              'archived, cicd_done, scanned FROM journal_projects ORDER BY project_id'
+SQL_SELECT_JOURNAL_GROUPS = 'SELECT group_id FROM journal_groups'
+# The kinds of the records of the journal.
+JOURNAL_RECORD_PROJECT = 'project'
+JOURNAL_RECORD_CICD_DONE = 'cicd_done'
+JOURNAL_RECORD_SCANNED = 'scanned'
+JOURNAL_RECORD_GROUP = 'group'
+JOURNAL_RECORD_STATE = 'state'
+JOURNAL_STATE_INSTANCE = 'instance'
+JOURNAL_STATE_ENUMERATION_DONE = 'enumeration_done'
+JOURNAL_STATE_INSTANCE_CICD_DONE = 'instance_cicd_done'
+JOURNAL_STATE_FINDINGS_OFFSETS = 'findings_offsets'
+JOURNAL_READ_BATCH_SIZE = 1000
+
+# ------------------------------
+# Findings sinks
+# ------------------------------
+FINDINGS_SINK_CSV = 'csv'
+FINDINGS_SINK_JSONL = 'jsonl'
+FINDINGS_SINK_SQLITE = 'sqlite'
+FINDINGS_KIND_CODE = 'code'
+FINDINGS_KIND_CICD = 'cicd'
+JSONL_FILE_EXTENSION = '.jsonl'
+SQL_SYNCHRONOUS_NORMAL = 'PRAGMA synchronous=NORMAL'
+SQL_CHECKPOINT_WAL = 'PRAGMA wal_checkpoint(TRUNCATE)'
+SQL_CREATE_FINDINGS_TABLES = [
+    'CREATE TABLE IF NOT EXISTS code_secrets (project TEXT NOT NULL, commit_hash TEXT NOT NULL, '
+    'file_path TEXT NOT NULL, category TEXT NOT NULL, sub_category TEXT NOT NULL, location TEXT NOT NULL, '
+    'times_found INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS code_secrets_project ON code_secrets (project)',
+    'CREATE INDEX IF NOT EXISTS code_secrets_category ON code_secrets (category, sub_category)',
+    'CREATE INDEX IF NOT EXISTS code_secrets_commit ON code_secrets (commit_hash)',
+    'CREATE TABLE IF NOT EXISTS cicd_variables (scope TEXT NOT NULL, owner_id TEXT NOT NULL, url TEXT NOT NULL, '
+    'name TEXT NOT NULL, value TEXT)',
+    'CREATE INDEX IF NOT EXISTS cicd_variables_owner ON cicd_variables (scope, owner_id)',
+]
+SQL_INSERT_CODE_SECRET = 'INSERT INTO code_secrets (project, commit_hash, file_path, category, sub_category, ' \
+                         'location, times_found) VALUES (?, ?, ?, ?, ?, ?, ?)'
+SQL_INSERT_CICD_VARIABLE = 'INSERT INTO cicd_variables (scope, owner_id, url, name, value) VALUES (?, ?, ?, ?, ?)'
+FINDINGS_TABLE_NAMES = {FINDINGS_KIND_CODE: 'code_secrets', FINDINGS_KIND_CICD: 'cicd_variables'}
+SQL_DELETE_FINDINGS_AFTER_FORMAT = 'DELETE FROM {0} WHERE rowid > ?'
+SQL_SELECT_MAX_ROWID_FORMAT = 'SELECT MAX(rowid) FROM {0}'
+
+# ------------------------------
+# Mirrors cache
+# ------------------------------
+MIRROR_DIRECTORY_NAME_FORMAT = '{0}.git'
+MIRROR_CACHE_INSTANCE_FILE_NAME = 'instance'
+BYTES_IN_MB = 1024 * 1024
+BYTES_IN_KB = 1024
+
+# ------------------------------
+# Pipeline
+# ------------------------------
+PIPELINE_SCAN_BACKLOG_PER_WORKER = 2
+# A partitioned project is split into up to this many partitions per scanning process, so the processes that get the
+# smaller partitions can take more of them. A partition has at least PARTITION_MIN_SIZE_COMMITS commits.
+PARTITIONS_PER_WORKER = 2
+PARTITION_MIN_SIZE_COMMITS = 1000
+PARTITION_CLONE_DIRECTORY_NAME_FORMAT = 'partitioned-{0}'
+PARTITION_COMMITS_FILE_NAME_FORMAT = 'partitioned-{0}.commits'
+MULTIPROCESSING_FORKSERVER = 'forkserver'
+
+# ------------------------------
+# Metrics
+# ------------------------------
+METRICS_PREFIX = 'kingit_'
+# The upper bounds (in seconds) of the buckets of the timing histograms.
+METRICS_HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+METRIC_API_REQUESTS = 'api_requests_total'
+METRIC_API_REQUEST_SECONDS = 'api_request_seconds'
+METRIC_API_THROTTLED = 'api_throttled_total'
+METRIC_API_RETRIES = 'api_retries_total'
+METRIC_API_REQUESTS_IN_FLIGHT = 'api_requests_in_flight'
+METRIC_API_CONCURRENCY_LIMIT = 'api_concurrency_limit'
+METRIC_PROJECTS_ENUMERATED = 'projects_enumerated_total'
+METRIC_PROJECTS_SCANNED = 'projects_scanned_total'
+METRIC_PROJECTS_SCAN_FAILED = 'projects_scan_failed_total'
+METRIC_PROJECTS_SKIPPED = 'projects_skipped_total'
+METRIC_PROJECT_SCAN_SECONDS = 'project_scan_seconds'
+METRIC_PARTITION_SCAN_SECONDS = 'partition_scan_seconds'
+METRIC_PARTITIONED_PROJECTS = 'partitioned_projects_total'
+METRIC_CICD_VARIABLES = 'cicd_variables_total'
+METRIC_CODE_SECRETS = 'code_secrets_total'
+METRIC_CLONE_SECONDS = 'clone_seconds'
+METRIC_CLONE_BYTES = 'clone_bytes_total'
+METRIC_FETCH_SECONDS = 'fetch_seconds'
+METRIC_GIT_LOG_PARSE_SECONDS = 'git_log_parse_seconds'
+METRIC_API_DIFFS_SECONDS = 'api_diffs_seconds'
+METRIC_SCANNED_BYTES = 'scanned_bytes_total'
+METRIC_SCANNED_DIFFS = 'scanned_diffs_total'
+METRIC_SCANNED_BLOBS = 'scanned_blobs_total'
+METRIC_BLOB_READ_SECONDS = 'blob_read_seconds'
+METRIC_SKIPPED_BYTES = 'skipped_bytes_total'
+METRIC_SKIPPED_DIFFS = 'skipped_diffs_total'
+METRIC_PATTERN_MATCH_SECONDS = 'pattern_match_seconds_total'
+METRIC_PATTERN_EVALUATIONS = 'pattern_evaluations_total'
+METRIC_PATTERN_HITS = 'pattern_hits_total'
+METRIC_QUEUE_SIZE = 'stage_queue_size'
+METRIC_SCAN_BACKLOG = 'scan_backlog'
+METRIC_UPTIME_SECONDS = 'uptime_seconds'
+METRIC_LABEL_STATUS = 'status'
+METRIC_LABEL_PATTERN = 'pattern'
+METRIC_LABEL_STAGE = 'stage'
+METRIC_LABEL_METHOD = 'method'
+METRIC_LABEL_REASON = 'reason'
+METRICS_SUMMARY_TOP_PATTERNS = 10
+STAGE_NAME_CICD = 'cicd'
+STAGE_NAME_CODE = 'code'
+TEMP_FILE_SUFFIX = '.tmp'
+
+# ------------------------------
+# Pattern profiler
+# ------------------------------
+# The sizes (in characters) of the adversarial inputs. The growth of the matching time is measured between them.
+PROFILER_INPUT_SIZES = (1000, 4000, 16000)
+PROFILER_REPETITIONS = 3
+PROFILER_DEFAULT_KEYWORD = 'key'
+PROFILER_MINIFIED_TOKENS = ['var ', 'a=', 'b.c', '(', ')', '{', '}', ';', ',', '"x"', "'y'", '0', '!1', '&&', '||',
+                            'function', 'return ', 'key:', 'token=', ' ', '\t', '|', '.', '-', '_']
+PROFILER_CORPUS_INPUT_NAME = 'corpus'
+PROFILER_CORPUS_MAX_MB = 20
+# A rule is flagged when its matching time grows faster than 'size ** PROFILER_SUPER_LINEAR_EXPONENT' and takes more
+# than 'PROFILER_MIN_FLAGGED_SECONDS' on the largest input.
+PROFILER_SUPER_LINEAR_EXPONENT = 1.5
+PROFILER_MIN_FLAGGED_SECONDS = 0.005
+PROFILER_MIN_MEASURABLE_SECONDS = 0.00005
+PROFILER_TOP_DEFAULT = 15
+PROFILER_RULE_TIMEOUT_SECONDS_DEFAULT = 30.0
+PROFILER_TIMEOUT_SECONDS_TEXT = 'timeout'
+MULTIPROCESSING_FORK = 'fork'
+PROFILER_START = '(+) Profiling {0} patterns from {1}'
+PROFILER_CORPUS_LOADED = '(+) Loaded {0} diffs ({1:.1f} MB) from {2}'
+PROFILER_SLOWEST_RULES_TITLE = '(+) The {0} slowest patterns (seconds on the worst input of {1} characters, and MB/s ' \
+                               'on the corpus):'
+PROFILER_RULE_LINE_FORMAT = '\t{0:>8}  {1:<20} {2:>8}  {3}: {4}'
+PROFILER_NO_FLAGGED_RULES = '(+) No pattern backtracks super-linearly.'
+PROFILER_FLAGGED_RULES_TITLE = '(-) {0} patterns backtrack super-linearly:'
+PROFILER_FLAGGED_RULE_FORMAT = '\t{0}: {1}\n\t\t{2}'
+PROFILER_TIMED_OUT_FORMAT = '\t\tTimed out on the {0} input ({1} characters)'
+PROFILER_GROWTH_FORMAT = '\t\t{0}: time ~ size ** {1:.2f} ({2})'
 
 # ------------------------------
 # File system constants
@@ -57,31 +475,69 @@ UTF_8_ENCODING = 'utf-8'
 # ------------------------------
 PATTERNS_VALUE_SUB_CATEGORY_NAME = 'sub_category_name'
 PATTERNS_VALUE_REGEX = 'regex'
+PATTERNS_VALUE_KEYWORDS = 'keywords'
+PATTERNS_MIN_KEYWORD_LENGTH = 3
 PATTERNS_INCOMPLETE_PATTERN_IN_TOML_FILE = '(-) A sub_category_name and regex variables must be present for every ' \
                                            'sub category in the toml file. Skipping.'
 PATTERNS_INVALID_REGEX_IN_TOML_FILE = '(-) Invalid regex at {0}[{1}]. Skipping.'
+PATTERNS_UNCOMPILABLE_REGEX_IN_TOML_FILE = '(-) The pattern {0} of {1}[{2}] is invalid ({3}). Skipping.'
+PATTERNS_INVALID_KEYWORDS_IN_TOML_FILE = '(-) Invalid keywords at {0}[{1}]. Extracting them from the regex instead.'
 
 # ------------------------------
 # Errors Raising
 # ------------------------------
 PATTERNS_FILE_NOT_FOUND_ERROR = '(-) Patterns file not found!'
+RESUME_JOURNAL_NOT_FOUND_ERROR = '(-) The directory to resume does not contain the journal of a run!'
+RESUME_INSTANCE_MISMATCH_ERROR = '(-) The run to resume was run against another instance!'
 INVALID_MODE_ERROR = '(-) Invalid mode'
+INVALID_SCAN_METHOD_ERROR = '(-) Invalid scan method'
+INVALID_SCAN_ENGINE_ERROR = '(-) Invalid scan engine'
+INVALID_SCAN_ORDER_ERROR = '(-) Invalid scan order'
+INVALID_CLONE_MODE_ERROR = '(-) Invalid clone mode'
+MIRROR_CACHE_INSTANCE_MISMATCH_ERROR = '(-) The mirrors cache holds the projects of another instance!'
+WORK_QUEUE_INSTANCE_MISMATCH_ERROR = '(-) The work queue holds the projects of another instance!'
+WORK_ROLE_CONFLICT_ERROR = '(-) A run can not be both the coordinator and a worker of a work queue'
+INVALID_LAST_ACTIVITY_AFTER_ERROR = '(-) Invalid last activity date (expected an ISO date, e.g. 2024-01-31)'
+SCAN_PROJECT_ERROR = '(-) Error scanning a project: {0}. Skipping.'
+PROJECT_CICD_ERROR = '(-) Error extracting the CICD variables of the project {0}.'
+GROUP_CICD_ERROR = '(-) Error extracting the CICD variables of the group {0}.'
+INSTANCE_CICD_ERROR = '(-) Error extracting the CICD variables of the instance {0}.'
+INVALID_FINDINGS_SINK_ERROR = '(-) Invalid findings sink'
+FINDINGS_WRITE_ERROR = '(-) Error writing findings to the {0}: {1}'
+HTTP_REQUEST_ERROR = '(-) Error requesting {0}: {1}'
+HTTP_STATUS_ERROR = 'status {0}'
+ENUM_PROJECTS_PAGE_ERROR = '(-) Could not get a page of projects from {0} (status {1}). Skipping.'
 
 # ------------------------------
 # Verbose
 # ------------------------------
 ENUM_PROJECTS_START_VERBOSE = '(+) Starting to enumerate the projects in {0}'
-ENUM_PROJECTS_STATUS_VERBOSE = '\tScanned +{0} pages (Total: {1} pages, {2} projects - before removing duplicates)'
+ENUM_PROJECTS_STATUS_VERBOSE = '\tScanned {0} pages (Total: {1} projects)'
 ENUM_PROJECTS_FINISH_VERBOSE = '(+) Successfully enumerated all the projects in {0}'
 EXTRACT_PROJECTS_URLS_FINISH = '(+) Successfully extracted all the projects urls to {0}'
+WORKER_START_VERBOSE = '(+) Scanning the projects of the work queue {0} as worker {1}'
+WORK_QUEUE_FILLED_VERBOSE = '(+) All the projects were added to the work queue. Waiting for the workers to scan them'
+WORK_LEASE_LOST_VERBOSE = '\tThe lease of the project {0} expired before its scan was reported, so its secrets ' \
+                          'were dropped'
+DELTA_ENUMERATION_VERBOSE = '(+) Enumerating only the projects with activity since {0}'
+DELTA_NO_CATALOG_VERBOSE = '(+) {0} was never enumerated before, so all its projects are enumerated'
+RESUME_PROJECTS_VERBOSE = '(+) Resumed {0} projects from the journal ({1} with their cicd variables extracted, {2} ' \
+                          'scanned)'
 EXTRACT_CICD_START_VERBOSE = '(+) Extracting the CICD secrets of every project.'
 EXTRACT_CICD_FINISH_VERBOSE = '(+) Successfully extracted the CICD secrets of every project.'
-EXPORT_CICD_START_VERBOSE = '(+) Exporting the CICD secrets to a csv file'
-EXPORT_CICD_FINISH_VERBOSE = '(+) Done Exporting'
 EXTRACT_CODE_SECRETS_START_VERBOSE = '(+) Starting to extract all the code secrets of each project'
 EXTRACT_CODE_SECRETS_FINISH_VERBOSE = '(+) Successfully extracted all the code secrets of each project'
 LOAD_PATTERNS_FINISH_VERBOSE = '(+) Successfully loaded all the regex patterns from {}'
+LOAD_PATTERNS_SUMMARY_VERBOSE = '\t{0} patterns loaded, {1} of them are prefiltered by keywords'
 CLONE_PROJECT_VERBOSE = '\tCloning {}'
+API_SCAN_PROJECT_VERBOSE = '\tScanning {} through the api'
+SKIP_PROJECT_SCAN_VERBOSE = '\tNot scanning {0}: the project is {1}'
+SCAN_PARTITIONS_VERBOSE = '\tScanning the {1} commits of {0} in {2} partitions'
+API_SCAN_FALLBACK_VERBOSE = '\tCould not scan {} through the api. Cloning it instead'
+FETCH_PROJECT_VERBOSE = '\tFetching {} into its cached mirror'
+EVICT_MIRROR_VERBOSE = '\tEvicting the cached mirror of project {0} ({1} MB)'
+HTTP_THROTTLED_VERBOSE = '\tThe instance is throttling the requests. Lowering the requests in flight to {0}'
+STATS_SUMMARY_VERBOSE = '(+) The statistics of the run were saved to {0}'
 FOUND_CODE_SECRETS_VERBOSE = '\t\tSecrets were found in the current project\'s code!'
 
 # ------------------------------
@@ -108,7 +564,18 @@ INSTANCE_PARAM_ARGPARSE = [
 THREADS_PARAM_ARGPARSE = [
     '-t',
     '--threads',
-    'Number of threads for enumerating the projects.'
+    'Number of pages to request at the same time when enumerating the projects (if the instance reports the total '
+    'number of pages).'
+]
+MAX_REQUESTS_PARAM_ARGPARSE = [
+    '-r',
+    '--max-requests',
+    'Maximal number of requests to the gitlab api that are in flight at the same time.'
+]
+SCAN_WORKERS_PARAM_ARGPARSE = [
+    '-w',
+    '--scan-workers',
+    'Number of processes for cloning and scanning the projects\' code (0 means the number of CPUs).'
 ]
 SSL_PARAM_ARGPARSE = [
     '-s',
@@ -131,6 +598,70 @@ MODE_PARAM_ARGPARSE = [
     'Do a specific task(/s): C (CICD): Get only the cicd secrets. S (Code Secrets): Get the code secrets. A (All) '
     'Get all the secrets.'
 ]
+COORDINATOR_PARAM_ARGPARSE = [
+    '-C',
+    '--coordinator',
+    'The path of a work queue to fill with the enumerated projects. Worker runs scan them, and their secrets are '
+    'merged into the output of this run.'
+]
+WORKER_PARAM_ARGPARSE = [
+    '-W',
+    '--worker',
+    'The path of a work queue to scan projects from, until the coordinator is done with it. Nothing is enumerated.'
+]
+DELTA_PARAM_ARGPARSE = [
+    '-D',
+    '--delta',
+    'Enumerate only the projects with activity since the previous enumeration of the same instance.'
+]
+INCREMENTAL_PARAM_ARGPARSE = [
+    '-n',
+    '--incremental',
+    'Scan only the commits that were not scanned in previous runs against the same instance.'
+]
+INCLUDE_PATHS_PARAM_ARGPARSE = [
+    '-I',
+    '--include-paths',
+    'Comma separated path globs (e.g. "src/**,*.yml"). Only the files that match one of them are scanned.'
+]
+EXCLUDE_PATHS_PARAM_ARGPARSE = [
+    '-X',
+    '--exclude-paths',
+    'Comma separated path globs (e.g. "vendor/**,*.min.js"). The files that match one of them are not scanned.'
+]
+MAX_DIFF_SIZE_PARAM_ARGPARSE = [
+    '-S',
+    '--max-diff-size',
+    'Files and diffs above this size in KB are not scanned (0 means no limit).'
+]
+RESUME_PARAM_ARGPARSE = [
+    '-R',
+    '--resume',
+    'The output directory of an interrupted run to resume. The work that it had finished is not done again.'
+]
+ENGINE_PARAM_ARGPARSE = [
+    '-E',
+    '--engine',
+    'How the cloned projects are scanned: diff scans the content that every commit added (git log -p), blob scans '
+    'every unique file content once and reports the commit that introduced it.'
+]
+PROFILER_DESCRIPTION_ARGPARSE = 'Profile the regex patterns of a patterns file, and find the patterns whose matching ' \
+                                'time grows super-linearly with the size of the content (catastrophic backtracking).'
+PROFILER_REPOSITORY_PARAM_ARGPARSE = [
+    '-r',
+    '--repository',
+    'The path of a sample git repository. The content that its commits added is used as a corpus.'
+]
+PROFILER_TOP_PARAM_ARGPARSE = [
+    '-t',
+    '--top',
+    'The number of the slowest patterns to show.'
+]
+PROFILER_TIMEOUT_PARAM_ARGPARSE = [
+    '-T',
+    '--timeout',
+    'The number of seconds after which the profiling of a pattern is stopped, and the pattern is flagged.'
+]
 EXPORT_PROJECTS_PARAM_ARGPARSE = [
     '-e',
     '--export-projects',
@@ -140,8 +671,14 @@ EXPORT_PROJECTS_PARAM_ARGPARSE = [
 # ------------------------------
 # Misc
 # ------------------------------
-COLUMNS_HEADERS_CICD_VARIABLES = ['Project ID', 'Project URL', 'Variable Name', 'Variable Value']
+COLUMNS_HEADERS_CICD_VARIABLES = ['Scope', 'ID', 'URL', 'Variable Name', 'Variable Value']
+CICD_SCOPE_PROJECT = 'project'
+CICD_SCOPE_GROUP = 'group'
+CICD_SCOPE_INSTANCE = 'instance'
 COLUMNS_HEADERS_CODE_SECRETS = ['Category', 'Sub Category', 'Location', 'Times Found']
+FINDINGS_FILE_NAMES = {FINDINGS_KIND_CODE: SECRETS_FILE_NAME_DEFAULT, FINDINGS_KIND_CICD: CICD_VARS_FILE_NAME_DEFAULT}
+FINDINGS_COLUMNS_HEADERS = {FINDINGS_KIND_CODE: COLUMNS_HEADERS_CODE_SECRETS,
+                            FINDINGS_KIND_CICD: COLUMNS_HEADERS_CICD_VARIABLES}
 
 # ------------------------------
 # Banner
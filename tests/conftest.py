@@ -0,0 +1,9 @@
+import os
+import sys
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_ROOT = os.path.dirname(TESTS_DIRECTORY)
+
+# The tool reads its configuration relative to the current working directory.
+os.chdir(REPOSITORY_ROOT)
+sys.path.insert(0, REPOSITORY_ROOT)
@@ -0,0 +1,87 @@
+"""
+Tests of the parsing of 'git log -p' outputs. The fixture is the output of the log command of the tool (with '-M', so
+the rename is shown) on a small repository with every kind of diff that the parser has to tell apart.
+"""
+import os
+from DiffParser import *
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'git_log.diff')
+
+COMMIT_PLUS = 'ea6d4638c3a82dd0bd7fb0bf26a78239ac304ac0'
+COMMIT_RENAME = 'c6b520ed7878de6aae7804a1a6da1f0ebd5a45d3'
+COMMIT_BINARY = '051639e717067841cdf83ca7b86aefa22b13779f'
+COMMIT_NO_NEWLINE = 'ac016c68f926f5c727e037df5a902f5dddd67f3d'
+COMMIT_HUNKS = 'e20dc40b417691e31a6e7bcfc429cd062fdee40d'
+COMMIT_ROOT = '6d8ccb876d26a1f875e65bcc45b08b01dafaf863'
+BINARY_BLOB = 'd186a24a0630cd0af222b6d52209798fb4bfaf27'
+
+
+def read_fixture():
+    with open(FIXTURE_PATH, 'rb') as file:
+        return file.read()
+
+
+def added_content(data: bytes, skipped_blobs: list = None):
+    return {(commit_hash, file_path): content for commit_hash, file_path, content in
+            iter_added_content(data.splitlines(keepends=True), skipped_blobs)}
+
+
+def test_every_diff_with_added_lines_is_yielded_once():
+    data = read_fixture()
+    diffs = list(iter_added_content(data.splitlines(keepends=True)))
+    assert [(commit_hash, file_path) for commit_hash, file_path, content in diffs] == [
+        (COMMIT_PLUS, 'tricky.txt'), (COMMIT_RENAME, 'settings.py'), (COMMIT_NO_NEWLINE, 'last.txt'),
+        (COMMIT_HUNKS, 'config.py'), (COMMIT_ROOT, 'config.py')]
+
+
+def test_hunks_of_a_file_are_joined():
+    assert added_content(read_fixture())[(COMMIT_HUNKS, 'config.py')] == 'TOKEN = "first"\nPASSWORD = "second"'
+
+
+def test_hunk_line_numbers():
+    lines = [(file_path, line_no, line) for commit_hash, file_path, line_no, line in
+             iter_added_lines(read_fixture().splitlines(keepends=True)) if commit_hash == COMMIT_HUNKS]
+    assert lines == [('config.py', 2, 'TOKEN = "first"'), ('config.py', 10, 'PASSWORD = "second"')]
+
+
+def test_no_newline_marker_is_not_content():
+    assert added_content(read_fixture())[(COMMIT_NO_NEWLINE, 'last.txt')] == 'no newline at the end'
+
+
+def test_binary_files_have_no_content_and_are_reported():
+    skipped_blobs = []
+    content = added_content(read_fixture(), skipped_blobs)
+    assert not any(commit_hash == COMMIT_BINARY for commit_hash, file_path in content)
+    assert skipped_blobs == [BINARY_BLOB]
+
+
+def test_renamed_files_are_reported_by_their_new_path():
+    content = added_content(read_fixture())
+    assert content[(COMMIT_RENAME, 'settings.py')] == 'RENAMED = "third"'
+    assert (COMMIT_RENAME, 'config.py') not in content
+
+
+def test_added_lines_that_look_like_headers():
+    # The added lines '++ b/not/a/header' and '+++ b/neither' show up as '+++ b/...' and '++++ b/...' in the diff.
+    assert added_content(read_fixture())[(COMMIT_PLUS, 'tricky.txt')] == \
+        '++ b/not/a/header\n+++ b/neither\nkey = "fourth"'
+
+
+def test_missing_trailing_newline_of_the_output():
+    data = read_fixture()
+    assert data.endswith(b'\n')
+    assert added_content(data.rstrip(b'\n')) == added_content(data)
+
+
+def test_decoded_lines_are_accepted():
+    data = read_fixture()
+    assert added_content(data.decode(UTF_8_ENCODING)) == added_content(data)
+
+
+def test_api_diffs_are_parsed_like_git_diffs():
+    diffs = [{'new_path': 'a.txt', 'diff': '@@ -1 +1,2 @@\n-old\n+new\n++++ b/a.txt\n', 'new_file': False,
+              'deleted_file': False, 'renamed_file': False},
+             {'new_path': 'gone.txt', 'diff': '@@ -1 +0,0 @@\n-gone\n', 'new_file': False, 'deleted_file': True,
+              'renamed_file': False}]
+    assert list(iter_added_content(iter_api_diff_lines(COMMIT_ROOT, diffs))) == \
+        [(COMMIT_ROOT, 'a.txt', 'new\n+++ b/a.txt')]
@@ -0,0 +1,126 @@
+"""
+Tests of the adaptive limit of the requests in flight: it grows additively while the requests succeed, and is halved
+(once per burst) when the instance throttles them.
+"""
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import unused_port
+from GitlabClient import *
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def send_requests(limiter: AdaptiveLimiter, throttled: list[bool]):
+    """
+    This function sends a request for every item of 'throttled' at the same time, and then releases them in order.
+    """
+
+    sent_times = [await limiter.acquire() for _ in throttled]
+    for sent_time, is_throttled in zip(sent_times, throttled):
+        await limiter.release(sent_time, is_throttled)
+
+
+def test_slow_start_grows_by_one_per_response():
+    async def test():
+        limiter = AdaptiveLimiter(max_in_flight=100)
+        assert limiter.concurrency == HTTP_INITIAL_REQUESTS_IN_FLIGHT
+        await send_requests(limiter, [False] * 5)
+        assert limiter.concurrency == HTTP_INITIAL_REQUESTS_IN_FLIGHT + 5
+        assert limiter.slow_start
+    run(test())
+
+
+def test_throttled_response_halves_the_limit_and_ends_slow_start():
+    async def test():
+        limiter = AdaptiveLimiter(max_in_flight=100)
+        await send_requests(limiter, [False] * 6)
+        await send_requests(limiter, [True])
+        assert limiter.concurrency == 8
+        assert not limiter.slow_start
+
+        # After the slow start, the limit grows by one request per round trip (a full limit of responses).
+        await send_requests(limiter, [False] * 8)
+        assert 8.9 < limiter.concurrency < 9.0
+    run(test())
+
+
+def test_burst_of_throttled_responses_halves_the_limit_once():
+    async def test():
+        limiter = AdaptiveLimiter(max_in_flight=100)
+        await send_requests(limiter, [True] * 6)
+        assert limiter.concurrency == HTTP_INITIAL_REQUESTS_IN_FLIGHT / 2
+
+        # A request that is sent after the decrease decreases the limit again.
+        await send_requests(limiter, [True])
+        assert limiter.concurrency == HTTP_INITIAL_REQUESTS_IN_FLIGHT / 4
+    run(test())
+
+
+def test_limit_stays_between_one_and_the_maximum():
+    async def test():
+        limiter = AdaptiveLimiter(max_in_flight=12)
+        await send_requests(limiter, [False] * 10)
+        assert limiter.concurrency == 12
+        for _ in range(10):
+            await send_requests(limiter, [True])
+        assert limiter.concurrency == 1
+    run(test())
+
+
+def test_acquire_waits_for_a_free_slot():
+    async def test():
+        limiter = AdaptiveLimiter(max_in_flight=2)
+        sent_times = [await limiter.acquire(), await limiter.acquire()]
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        await limiter.release(sent_times[0], False)
+        await asyncio.wait_for(waiting, 1)
+        assert limiter.in_flight == 2
+    run(test())
+
+
+def test_pause_holds_the_new_requests():
+    async def test():
+        limiter = AdaptiveLimiter(max_in_flight=10)
+        await limiter.pause(0.2)
+        start_time = asyncio.get_running_loop().time()
+        await limiter.acquire()
+        assert asyncio.get_running_loop().time() - start_time >= 0.15
+    run(test())
+
+
+@pytest.mark.parametrize('throttled_count', [1, 3])
+def test_client_retries_throttled_requests_and_slows_down(throttled_count):
+    async def test():
+        responses = []
+
+        async def handler(request):
+            responses.append(request.path)
+            if len(responses) <= throttled_count:
+                return web.Response(status=429, headers={API_RETRY_AFTER_HEADER: '0'})
+            return web.json_response([{'id': 1}])
+
+        app = web.Application()
+        app.router.add_get('/api/v4/projects', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        port = unused_port()
+        await web.TCPSite(runner, '127.0.0.1', port).start()
+        instance = 'http://127.0.0.1:{0}'.format(port)
+        try:
+            async with GitlabClient(instance=instance, private_token='token', verify_ssl=False,
+                                    max_in_flight=100) as client:
+                r = await client.get(instance + '/api/v4/projects')
+                assert r.status == 200
+                assert r.data == [{'id': 1}]
+                assert len(responses) == throttled_count + 1
+                # Every retry is sent after the previous decrease, so every throttled response halves the limit.
+                assert client.limiter.concurrency < HTTP_INITIAL_REQUESTS_IN_FLIGHT / 2 ** throttled_count + 1
+                assert not client.limiter.slow_start
+        finally:
+            await runner.cleanup()
+    run(test())
@@ -0,0 +1,166 @@
+"""
+Tests of the keywords prefilter of 'PatternSet'. A keyword that the prefilter misses drops findings silently, so every
+scan is compared with evaluating every rule with 're.findall'.
+"""
+import re
+import random
+from PatternSet import *
+
+PATTERNS_PATH = 'patterns.toml'
+
+
+def generate_match(parsed, generator: random.Random):
+    """
+    This function generates a random string that the parsed regex is likely to match (lookarounds and backreferences
+    are not supported, and anchors are ignored).
+    """
+
+    text = ''
+    for op, value in parsed:
+        name = str(op)
+        if name == 'LITERAL':
+            text += chr(value)
+        elif name == 'NOT_LITERAL':
+            text += 'x' if value != ord('x') else 'y'
+        elif name == 'ANY':
+            text += 'a'
+        elif name == 'IN':
+            text += generate_in(value, generator)
+        elif name in ('MAX_REPEAT', 'MIN_REPEAT'):
+            low, high, sub_pattern = value
+            for _ in range(generator.randint(low, min(high, low + 3))):
+                text += generate_match(sub_pattern, generator)
+        elif name == 'SUBPATTERN':
+            text += generate_match(value[-1], generator)
+        elif name == 'BRANCH':
+            text += generate_match(generator.choice(value[1]), generator)
+        elif name == 'CATEGORY':
+            text += generate_category(value)
+        elif name != 'AT':
+            raise ValueError(name)
+    return text
+
+
+def generate_category(category):
+    name = str(category)
+    if name == 'CATEGORY_DIGIT':
+        return '7'
+    if name == 'CATEGORY_SPACE':
+        return ' '
+    if name == 'CATEGORY_WORD':
+        return 'k'
+    if name == 'CATEGORY_NOT_SPACE':
+        return 'q'
+    raise ValueError(name)
+
+
+def generate_in(items, generator: random.Random):
+    if str(items[0][0]) == 'NEGATE':
+        raise ValueError('NEGATE')
+    op, value = generator.choice(items)
+    name = str(op)
+    if name == 'LITERAL':
+        return chr(value)
+    if name == 'RANGE':
+        return chr(generator.randint(*value))
+    if name == 'CATEGORY':
+        return generate_category(value)
+    raise ValueError(name)
+
+
+def findall_counts(patterns: PatternSet, content: str):
+    counts = {}
+    for regex, rule in patterns.rules.items():
+        times_found = len(rule.compiled.findall(content))
+        if times_found:
+            counts[regex] = times_found
+    return counts
+
+
+def scan_counts(patterns: PatternSet, content: str):
+    return {rule.regex: times_found for rule, times_found in patterns.scan(content)}
+
+
+def make_patterns(*regexes: str):
+    patterns = PatternSet()
+    for index, regex in enumerate(regexes):
+        patterns.add_rule(regex=regex, category='test', sub_category=str(index))
+    return patterns
+
+
+def test_extract_required_keywords_of_alternation():
+    parsed = sre_parse.parse('(?:atlassian|confluence|jira)[a-z]{4}')
+    assert extract_required_keywords(parsed) == {'atlassian', 'confluence', 'jira'}
+
+
+def test_extract_required_keywords_of_case_insensitive_regex():
+    parsed = sre_parse.parse('(?i)AKIA[0-9A-Z]{16}')
+    assert extract_required_keywords(parsed) == {'akia'}
+
+
+def test_extract_required_keywords_without_literal():
+    assert extract_required_keywords(sre_parse.parse('[a-f0-9]{32}')) is None
+
+
+def test_build_trie_regex_prefers_the_longest_keyword():
+    keywords = {'ab', 'abc', 'abd', 'b'}
+    regex = re.compile(build_trie_regex(keywords))
+    for keyword in keywords:
+        assert regex.fullmatch(keyword)
+    assert regex.match('abcd').group() == 'abc'
+    assert regex.match('abx').group() == 'ab'
+
+
+def test_overlapping_keywords_are_all_found():
+    # 'bcde' starts inside 'abcd', and 'key' is contained in 'apikey'.
+    patterns = make_patterns('abcd[0-9]', 'bcde[0-9]', 'apikey=[0-9]+', 'key=[0-9]+')
+    for content in ('abcde1', 'xabcd1 bcde2', 'apikey=123', 'key=4 apikey=5'):
+        assert scan_counts(patterns, content) == findall_counts(patterns, content)
+    assert {rule.regex for rule in patterns.candidate_rules('apikey=1')} == {'apikey=[0-9]+', 'key=[0-9]+'}
+
+
+def test_keywords_are_case_folded():
+    patterns = make_patterns('(?i)secret_[a-z]{4}', 'TOKEN_[0-9]{4}', '(?i:glpat)-[a-z0-9]{20}')
+    for content in ('SECRET_abcd', 'SeCrEt_WXYZ', 'TOKEN_1234', 'token_1234', 'GLPAT-abcdefghij0123456789'):
+        assert scan_counts(patterns, content) == findall_counts(patterns, content)
+    assert scan_counts(patterns, 'SeCrEt_WXYZ')
+    assert scan_counts(patterns, 'GLPAT-abcdefghij0123456789')
+
+
+def test_alternations_find_every_branch():
+    patterns = make_patterns('(?:atlassian|confluence|jira)_[a-z]{4}', 'x(?:oxb|oxp)-[0-9]{3}')
+    for content in ('jira_abcd', 'confluence_abcd atlassian_wxyz', 'xoxb-123 xoxp-456', 'xoxa-789'):
+        assert scan_counts(patterns, content) == findall_counts(patterns, content)
+
+
+def test_rules_without_keywords_are_always_evaluated():
+    patterns = make_patterns('[a-f0-9]{32}', 'ghp_[A-Za-z0-9]{36}')
+    content = '0123456789abcdef0123456789abcdef'
+    assert scan_counts(patterns, content) == findall_counts(patterns, content) == {'[a-f0-9]{32}': 1}
+
+
+def test_scan_agrees_with_findall_on_the_patterns_file():
+    patterns = PatternSet()
+    patterns.load_toml(PATTERNS_PATH)
+
+    # A random match of every rule is planted in a few casings and surroundings, so the prefilter is checked with
+    # content that the rules match, and with content that only has their keywords.
+    generator = random.Random(0)
+    alphabet = 'abcdefABCDEF0123456789_-=:"\' '
+    samples = hits = 0
+    for rule in patterns.rules.values():
+        for _ in range(5):
+            try:
+                match = generate_match(sre_parse.parse(rule.regex), generator)
+            except ValueError:
+                match = ''
+            for planted in [match, match.upper(), match.swapcase()] + [keyword.upper() for keyword in rule.keywords]:
+                filler = ''.join(generator.choice(alphabet) for _ in range(40))
+                content = '{0} {1}{2}\n{1}\n'.format(filler[:20], planted, filler[20:])
+                counts = findall_counts(patterns, content)
+                assert scan_counts(patterns, content) == counts, (rule.regex, content)
+                samples += 1
+                hits += bool(counts)
+
+    # Most of the samples match a rule, otherwise the comparison proves little.
+    assert hits > samples // 2
@@ -0,0 +1,100 @@
+"""
+Tests of the deduplication of the commits that are shared by forks. A shared commit is excluded from a scan with all of
+its ancestors, so it may be excluded only if its ancestors were scanned too.
+"""
+import os
+import subprocess
+import pytest
+from ScanWorker import *
+
+SECRET_REGEX = 'SECRET_[0-9]{4}'
+
+
+def git(repo_path: str, *args: str):
+    env = {**os.environ, 'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@test', 'GIT_COMMITTER_NAME': 'test',
+           'GIT_COMMITTER_EMAIL': 'test@test'}
+    return subprocess.run(['git', '-C', repo_path, *args], check=True, capture_output=True, text=True,
+                          env=env).stdout.strip()
+
+
+def commit_file(repo_path: str, file_name: str, content: str):
+    with open(os.path.join(repo_path, file_name), MODE_WRITE) as file:
+        file.write(content)
+    git(repo_path, 'add', file_name)
+    git(repo_path, 'commit', '-q', '-m', file_name)
+    return git(repo_path, 'rev-parse', 'HEAD')
+
+
+@pytest.fixture
+def patterns():
+    patterns = PatternSet()
+    patterns.add_rule(regex=SECRET_REGEX, category='test', sub_category='secret')
+    patterns.build_prefilter()
+    init_scan_worker(patterns, DiffFilters())
+    return patterns
+
+
+def make_project(proj_name: str, proj_id: int, patterns: PatternSet):
+    return Project(proj_name=proj_name, proj_id=proj_id,
+                   context=ProjectContext(instance='https://gitlab.test', verify_ssl=False, patterns=patterns,
+                                          verbose=False, filters=DiffFilters()))
+
+
+def secret_commits(project: Project):
+    return sorted(location.split('/-/tree/')[1].split('/')[0] for category, sub_category, location, times_found in
+                  project.code_secrets)
+
+
+def test_shared_commit_with_unscanned_ancestor_is_not_covered():
+    # 'a' <- 's': 's' was scanned in another project, but 'a' was not.
+    commit_parents = {'s': ['a'], 'a': []}
+    assert get_covered_commits(commit_parents, {'s'}) == set()
+    assert get_covered_commits(commit_parents, {'s', 'a'}) == {'s', 'a'}
+
+
+def test_parents_outside_of_the_scan_do_not_matter():
+    # 'o' was scanned by a previous run of the project, so it is not to be scanned.
+    assert get_covered_commits({'s': ['o']}, {'s'}) == {'s'}
+
+
+def test_merge_is_covered_only_if_both_sides_are():
+    commit_parents = {'m': ['x', 'y'], 'x': ['r'], 'y': ['r'], 'r': []}
+    assert get_covered_commits(commit_parents, {'m', 'x', 'r'}) == {'x', 'r'}
+    assert get_covered_commits(commit_parents, {'m', 'x', 'y', 'r'}) == {'m', 'x', 'y', 'r'}
+
+
+@pytest.mark.parametrize('scan_engine', [SCAN_ENGINE_DIFF, SCAN_ENGINE_BLOB])
+@pytest.mark.parametrize('partition_min_commits', [0, 1])
+def test_fork_reports_ancestor_that_was_excluded_by_scanned_tips(tmp_path, patterns, scan_engine,
+                                                                 partition_min_commits):
+    repo_path = str(tmp_path / 'repo')
+    os.makedirs(repo_path)
+    git(repo_path, 'init', '-q')
+    ancestor = commit_file(repo_path, 'a.txt', 'SECRET_1111\n')
+    shared = commit_file(repo_path, 's.txt', 'SECRET_2222\n')
+    commit_index = CommitIndex(index_path=str(tmp_path / 'index.db'))
+
+    # The project scanned the ancestor in a previous run, so it scans only the shared commit now.
+    project = make_project('https://gitlab.test/group/project', 1, patterns)
+    assert scan_clone(project, repo_path, [ancestor], commit_index, scan_engine, 0) is not None
+    assert secret_commits(project) == [shared]
+
+    # The fork was never scanned, so it must report the secrets of both commits.
+    fork = make_project('https://gitlab.test/group/fork', 2, patterns)
+    tips = scan_clone(fork, repo_path, [], commit_index, scan_engine, partition_min_commits)
+    if isinstance(tips, ScanPartitions):
+        tips.clone_path = repo_path
+        tips.write_commits(str(tmp_path / 'commits'))
+        code_secrets, success, worker_metrics = scan_partition(fork.proj_name, fork.proj_id, fork.instance, False,
+                                                               False, tips, 0, tips.commits_count)
+        assert success
+        fork.code_secrets, worker_metrics = finish_partitioned_scan(fork.proj_name, fork.proj_id, fork.instance,
+                                                                    False, False, tips, code_secrets, commit_index)
+    assert secret_commits(fork) == sorted([ancestor, shared])
+
+    # Both commits are scanned now, so another fork reports both without scanning them again.
+    assert commit_index.get_scanned_commits([ancestor, shared]) == {ancestor, shared}
+    other_fork = make_project('https://gitlab.test/group/other-fork', 3, patterns)
+    assert scan_clone(other_fork, repo_path, [], commit_index, scan_engine, 0) is not None
+    assert secret_commits(other_fork) == sorted([ancestor, shared])
+    commit_index.close()
@@ -0,0 +1,123 @@
+"""
+Tests of the leases of the work queue: expiry, renewal, the cap on the attempts of a project, and the reports of a
+previous run of the coordinator.
+"""
+import pytest
+from WorkQueue import *
+
+INSTANCE = 'https://gitlab.test'
+LEASE_SECONDS = 600
+# A lease that was already expired when it was given.
+EXPIRED_LEASE_SECONDS = -1
+
+
+def make_project(proj_id: int, repository_size: int = 0):
+    return proj_id, 'https://gitlab.test/group/project-{0}'.format(proj_id), None, repository_size, None, False, False
+
+
+@pytest.fixture
+def work_queue(tmp_path):
+    work_queue = WorkQueue(queue_path=str(tmp_path / 'queue.db'), instance=INSTANCE)
+    yield work_queue
+    work_queue.close()
+
+
+def leased_ids(rows: list[tuple]):
+    return [row[0] for row in rows]
+
+
+def get_status(work_queue: WorkQueue, proj_id: int):
+    return work_queue.connection.execute('SELECT status, attempts FROM work_items WHERE project_id = ?',
+                                         (proj_id,)).fetchone()
+
+
+def test_biggest_projects_are_leased_first_and_only_once(work_queue):
+    work_queue.add_projects([make_project(1, 10), make_project(2, 30), make_project(3, 20)])
+    assert leased_ids(work_queue.lease('worker-1', 2, LEASE_SECONDS)) == [2, 3]
+    assert leased_ids(work_queue.lease('worker-2', 2, LEASE_SECONDS)) == [1]
+    assert work_queue.lease('worker-2', 2, LEASE_SECONDS) == []
+
+
+def test_expired_lease_is_handed_to_another_worker(work_queue):
+    work_queue.add_projects([make_project(1)])
+    assert leased_ids(work_queue.lease('worker-1', 1, EXPIRED_LEASE_SECONDS)) == [1]
+    assert leased_ids(work_queue.lease('worker-2', 1, LEASE_SECONDS)) == [1]
+    assert get_status(work_queue, 1) == ('leased', 2)
+
+    # The first worker lost its lease, so its report is dropped.
+    assert not work_queue.complete('worker-1', 1, [['a', 'b', 'c', 1]])
+    assert work_queue.complete('worker-2', 1, [['d', 'e', 'f', 1]])
+    assert [(proj_id, code_secrets) for sequence, proj_id, code_secrets in work_queue.iter_completed(0)] == \
+        [(1, [['d', 'e', 'f', 1]])]
+
+
+def test_renewed_lease_does_not_expire(work_queue):
+    work_queue.add_projects([make_project(1)])
+    work_queue.lease('worker-1', 1, EXPIRED_LEASE_SECONDS)
+    work_queue.renew('worker-1', [1], LEASE_SECONDS)
+    assert work_queue.lease('worker-2', 1, LEASE_SECONDS) == []
+
+    # Only the worker that holds a lease can renew it.
+    work_queue.renew('worker-2', [1], EXPIRED_LEASE_SECONDS)
+    assert work_queue.lease('worker-2', 1, LEASE_SECONDS) == []
+
+
+def test_project_fails_after_the_maximal_attempts_of_expired_leases(work_queue):
+    work_queue.add_projects([make_project(1)])
+    work_queue.set_filled(True)
+    for attempt in range(WORK_MAX_ATTEMPTS_DEFAULT):
+        assert leased_ids(work_queue.lease('worker-{0}'.format(attempt), 1, EXPIRED_LEASE_SECONDS)) == [1]
+    assert work_queue.lease('worker-last', 1, LEASE_SECONDS) == []
+    assert get_status(work_queue, 1) == ('failed', WORK_MAX_ATTEMPTS_DEFAULT)
+    assert work_queue.get_failed() == {1}
+    assert not work_queue.has_unfinished_work()
+
+
+def test_released_project_is_retried_until_the_maximal_attempts(work_queue):
+    work_queue.add_projects([make_project(1)])
+    for attempt in range(1, WORK_MAX_ATTEMPTS_DEFAULT + 1):
+        assert leased_ids(work_queue.lease('worker-1', 1, LEASE_SECONDS)) == [1]
+        work_queue.release('worker-1', 1)
+        expected_status = 'failed' if attempt == WORK_MAX_ATTEMPTS_DEFAULT else 'pending'
+        assert get_status(work_queue, 1) == (expected_status, attempt)
+    assert work_queue.lease('worker-1', 1, LEASE_SECONDS) == []
+
+
+def test_unfinished_work_until_the_queue_is_filled_and_done(work_queue):
+    assert work_queue.has_unfinished_work()
+    work_queue.add_projects([make_project(1)])
+    work_queue.set_filled(True)
+    assert work_queue.has_unfinished_work()
+    work_queue.lease('worker-1', 1, LEASE_SECONDS)
+    work_queue.complete('worker-1', 1, [])
+    assert not work_queue.has_unfinished_work()
+
+
+def test_reports_of_a_previous_run_are_not_merged(work_queue):
+    work_queue.add_projects([make_project(1), make_project(2)])
+    work_queue.lease('worker-1', 2, LEASE_SECONDS)
+    work_queue.complete('worker-1', 1, [['a', 'b', 'c', 1]])
+
+    # A new run of the coordinator empties the queue, so the same projects are scanned again.
+    work_queue.clear()
+    work_queue.add_projects([make_project(1), make_project(2)])
+    assert list(work_queue.iter_completed(0)) == []
+    assert get_status(work_queue, 1) == ('pending', 0)
+    assert leased_ids(work_queue.lease('worker-2', 2, LEASE_SECONDS)) == [1, 2]
+
+
+def test_resumed_run_keeps_the_reports_and_retries_the_failures(work_queue):
+    work_queue.add_projects([make_project(1), make_project(2)])
+    work_queue.lease('worker-1', 2, LEASE_SECONDS)
+    work_queue.complete('worker-1', 1, [['a', 'b', 'c', 1]])
+    for _ in range(WORK_MAX_ATTEMPTS_DEFAULT - 1):
+        work_queue.release('worker-1', 2)
+        assert leased_ids(work_queue.lease('worker-1', 1, LEASE_SECONDS)) == [2]
+    work_queue.release('worker-1', 2)
+    assert get_status(work_queue, 2)[0] == 'failed'
+
+    # The resumed run adds the same projects again, without emptying the queue.
+    work_queue.add_projects([make_project(1), make_project(2)])
+    assert [proj_id for sequence, proj_id, code_secrets in work_queue.iter_completed(0)] == [1]
+    assert get_status(work_queue, 1) == ('done', 1)
+    assert get_status(work_queue, 2) == ('pending', 0)